@@ -1,3 +1,9 @@
+import os
+
+# Lambda freezes the process between invocations, so the audit log's background
+# flusher cannot be relied on: write and fsync each learn/unlearn before it returns.
+os.environ.setdefault("AUDIT_LOG_FSYNC", "batch")
+
 from app.main import app
 from mangum import Mangum
 
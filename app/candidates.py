@@ -0,0 +1,219 @@
+from __future__ import annotations
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import heapq, re
+
+from app.data.code_systems import get_registry, vocabulary
+from app.data.code_index import _load_loinc_displays
+from app.data.tenants import TenantOverlay
+from app.learning import learned_snapshot, _ns_key
+from app.utils.fuzzy import fuzzy_matches
+from app.utils.profiling import StageTimer
+
+VARIANT_SCORE = 95
+_FUZZY_MAX = 99  # a fuzzy match never outranks an exact one
+
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+class Candidate:
+    """One (system, code) answer for a query, with the term that matched it."""
+    __slots__ = ("system", "code", "display", "term", "score", "source", "rank")
+
+    def __init__(self, system: str, code: str, display: Optional[str], term: str,
+                 score: int, source: str, rank: int):
+        self.system = system
+        self.code = code
+        self.display = display
+        self.term = term
+        self.score = score
+        self.source = source
+        self.rank = rank  # source priority; ties on score go to the earlier source
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.system, self.code
+
+    def order(self) -> Tuple[int, int]:
+        return -self.score, self.rank
+
+
+def term_variants(term: str) -> List[str]:
+    """Cheap normalizations of an already lower-cased term: punctuation and whitespace
+    collapsed, naive singular, sorted word order. Excludes the term itself."""
+    base = _SPACES.sub(" ", _PUNCT.sub(" ", term)).strip()
+    out: List[str] = []
+    for v in (base,
+              " ".join(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+                       for w in base.split()),
+              " ".join(sorted(base.split()))):
+        if v and v != term and v not in out:
+            out.append(v)
+    return out
+
+
+class CandidatePipeline:
+    """Ranked candidates for one query, pulled lazily from sources in priority order:
+
+        learned (100) -> exact (100) -> variants (95) -> fuzzy (<=99) -> technical (<=99)
+
+    Each source has an upper bound on the scores it can produce. Candidates at or above
+    score_cutoff go into a top_k min-heap; before running a source, if the heap is full
+    and its weakest score already reaches the source's bound, nothing later can enter the
+    top_k and the remaining sources are skipped. A learned or exact hit ranks first but
+    does not settle the query by itself: the later sources still fill the other top_k
+    slots. learned/exact/variants are dict lookups
+    (cheap); fuzzy and technical scan vocabularies (expensive), so run(cheap_only=True)
+    lets callers stop before them and finish off the event loop.
+    """
+
+    def __init__(self, term: str, systems, overlay: Optional[TenantOverlay] = None,
+                 context: Optional[str] = None, top_k: int = 5, score_cutoff: int = 70,
+                 include_technical: bool = False, tech_top_k: int = 8, tech_score_cutoff: int = 60,
+                 timer: Optional[StageTimer] = None):
+        reg = get_registry()
+        self.term = term
+        self.overlay = overlay
+        self.context = context
+        self.top_k = max(1, top_k)
+        self.score_cutoff = score_cutoff
+        self.tech_top_k = tech_top_k
+        self.tech_score_cutoff = tech_score_cutoff
+        self.timer = timer
+        self.clinical = [n for n in systems if not reg.system(n).technical]
+        self.technical = [n for n in systems if reg.system(n).technical] if include_technical else []
+        self.exact_systems = list(systems)
+        # (name, score bound, expensive, producer)
+        self.sources = [
+            ("learned", 100, False, self._learned),
+            ("exact", 100, False, self._exact),
+            ("variants", VARIANT_SCORE, False, self._variants),
+            ("fuzzy", _FUZZY_MAX, True, self._fuzzy),
+            ("technical", _FUZZY_MAX, True, self._technical),
+        ]
+        self.pos = 0
+        self.best: Dict[Tuple[str, str], Candidate] = {}
+        self._heap: List[Tuple[int, int, Tuple[str, str]]] = []  # (score, -rank, key), weakest first
+        self.stopped_early = False
+
+    # ---- sources ----------------------------------------------------------------
+
+    def _learned(self, rank: int) -> Iterator[Candidate]:
+        data = learned_snapshot()
+        keys = [_ns_key(self.context, self.term)]
+        if self.context and self.context.strip().lower() != "global":
+            keys.append(_ns_key(None, self.term))
+        for k in keys:
+            e = data.get(k)
+            if e and e.get("snomed_code"):
+                yield Candidate("snomed", e["snomed_code"], e.get("snomed_display"), self.term, 100, "learned", rank)
+                return
+
+    def _resolve(self, name: str, term: str, score: int, source: str, rank: int) -> Optional[Candidate]:
+        hit = get_registry().resolve(name, term, self.overlay)
+        if not hit:
+            return None
+        display = hit["display"]
+        if display is None and name == "loinc":
+            display = _load_loinc_displays().get(hit["code"]) or term
+        return Candidate(name, hit["code"], display, term, score, source, rank)
+
+    def _exact(self, rank: int) -> Iterator[Candidate]:
+        for name in self.exact_systems:
+            c = self._resolve(name, self.term, 100, "exact", rank)
+            if c:
+                yield c
+
+    def _variants(self, rank: int) -> Iterator[Candidate]:
+        for v in term_variants(self.term):
+            for name in self.exact_systems:
+                c = self._resolve(name, v, VARIANT_SCORE, "variants", rank)
+                if c:
+                    yield c
+
+    def _vocabularies(self, name: str) -> List[List[str]]:
+        out = [vocabulary(name)]
+        ov = self.overlay
+        if ov is not None:
+            if name == "snomed" and ov.snomed_alias:
+                out.append(list(ov.snomed_alias))
+            elif name == "loinc" and (ov.loinc_aliases or ov.loinc_canonical):
+                out.append(list(set(ov.loinc_aliases) | set(ov.loinc_canonical)))
+        return out
+
+    def _scan(self, names: List[str], limit: int, cutoff: int, source: str, rank: int) -> Iterator[Candidate]:
+        for name in names:
+            for choices in self._vocabularies(name):
+                for choice, score in fuzzy_matches(self.term, choices, limit, cutoff):
+                    if choice == self.term:
+                        continue  # already an exact hit (or its resolution failed)
+                    c = self._resolve(name, choice, min(score, _FUZZY_MAX), source, rank)
+                    if c:
+                        yield c
+
+    def _fuzzy(self, rank: int) -> Iterator[Candidate]:
+        return self._scan(self.clinical, 2 * self.top_k, self.score_cutoff, "fuzzy", rank)  # aliases share codes
+
+    def _technical(self, rank: int) -> Iterator[Candidate]:
+        return self._scan(self.technical, self.tech_top_k, self.tech_score_cutoff, "technical", rank)
+
+    # ---- merge ------------------------------------------------------------------
+
+    def _offer(self, c: Candidate):
+        prev = self.best.get(c.key)
+        if prev is not None and prev.order() <= c.order():
+            return
+        self.best[c.key] = c
+        cutoff = self.tech_score_cutoff if c.source == "technical" else self.score_cutoff
+        if c.score < cutoff:
+            return
+        if prev is not None:
+            # Upgraded duplicate: drop its old heap entry (the heap holds at most top_k).
+            self._heap = [e for e in self._heap if e[2] != c.key]
+            heapq.heapify(self._heap)
+        entry = (c.score, -c.rank, c.key)
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def _guaranteed(self, bound: int) -> bool:
+        """True when no candidate scoring <= bound can displace the current top_k."""
+        return len(self._heap) >= self.top_k and self._heap[0][0] >= bound
+
+    def run(self, cheap_only: bool = False) -> bool:
+        """Pull sources until top_k is guaranteed or all have run. With cheap_only, stop
+        before the first expensive source. Returns True once the pipeline is complete."""
+        while self.pos < len(self.sources):
+            name, bound, expensive, produce = self.sources[self.pos]
+            if self._guaranteed(bound):
+                self.stopped_early = True
+                self.pos = len(self.sources)
+                break
+            if cheap_only and expensive:
+                return False
+            for c in produce(self.pos):
+                self._offer(c)
+            self.pos += 1
+            if self.timer:
+                self.timer.mark(name)
+        return True
+
+    @property
+    def complete(self) -> bool:
+        return self.pos >= len(self.sources)
+
+    def ranked(self) -> List[Candidate]:
+        """The top_k candidates, best first."""
+        keys = {e[2] for e in self._heap}
+        return sorted((self.best[k] for k in keys), key=Candidate.order)
+
+    def by_system(self) -> Dict[str, List[Candidate]]:
+        """Every candidate seen (including those under the cutoff), grouped per system, best first."""
+        out: Dict[str, List[Candidate]] = {}
+        for c in sorted(self.best.values(), key=Candidate.order):
+            out.setdefault(c.system, []).append(c)
+        return out
+
+    def exact_hit(self) -> bool:
+        return any(c.source in ("learned", "exact") and c.score == 100 for c in self.best.values())
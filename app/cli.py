@@ -0,0 +1,269 @@
+"""Akashic command-line tools.
+
+    python -m app map -i terms.csv -o mapped.ndjson --jobs 8
+    python -m app export conceptmap -o conceptmap.ndjson --format ndjson
+    python -m app replay logs/*.log.gz --b /data/next/ -o report.json
+
+`map` resolves a file of terms offline through the same code path as /lookup,
+without running the API. `export` writes the same FHIR Bundles as /api/export/*.
+`replay` diffs the answers logged /lookup traffic would get from two datasets.
+"""
+from __future__ import annotations
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse, csv, json, os, sys, time
+
+os.environ["MISS_TRACKER_PERSIST_S"] = "0"  # offline runs must not write miss snapshots
+
+from app.resolver import lookup_response, warm_indexes
+from app.data.code_systems import get_registry
+from app.data.tenants import get_tenant_cache, valid_tenant
+from app.utils.fhir_export import iter_resources, stream_bundle
+
+
+def _guess_format(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return "text"
+
+def _iter_queries(f, fmt: str, column: Optional[str]) -> Iterator[str]:
+    if fmt == "csv":
+        rdr = csv.DictReader(f)
+        col = column or (rdr.fieldnames[0] if rdr.fieldnames else None)
+        if col is None:
+            return
+        if col not in (rdr.fieldnames or []):
+            sys.exit(f"CSV is missing column '{col}'.")
+        for row in rdr:
+            yield row.get(col) or ""
+    elif fmt == "ndjson":
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                yield ""
+                continue
+            if isinstance(obj, dict):
+                yield str(obj.get(column or "query") or obj.get("term") or "")
+            else:
+                yield str(obj)
+    else:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+def _chunks(it: Iterator[str], size: int) -> Iterator[Tuple[int, List[str]]]:
+    start, buf = 1, []
+    for q in it:
+        buf.append(q)
+        if len(buf) >= size:
+            yield start, buf
+            start += len(buf)
+            buf = []
+    if buf:
+        yield start, buf
+
+_MAP_FIELDS = frozenset(("snomed", "loinc", "score", "source", "codeable_concept"))
+
+def map_chunk(queries: List[str], tenant: Optional[str] = None,
+              options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Resolve one chunk through lookup_response() with /lookup's options (domain,
+    context, top_k, score_cutoff, include_technical); returns flat rows of the top
+    result (query, snomed, snomed_display, loinc, score, source, count)."""
+    overlay = get_tenant_cache().get(tenant) if tenant else None
+    snomed_uri = get_registry().system("snomed").uri
+    out: List[Dict[str, Any]] = []
+    for q in queries:
+        term = (q or "").strip().lower()
+        body = lookup_response(term, overlay=overlay, fields=_MAP_FIELDS, **(options or {}))
+        top = body["results"][0]
+        coding = (top.get("codeable_concept") or {}).get("coding") or []
+        out.append({
+            "query": term,
+            "snomed": top.get("snomed"),
+            "snomed_display": next((c["display"] for c in coding if c["system"] == snomed_uri), None),
+            "loinc": top.get("loinc"),
+            "score": top.get("score") or 0,
+            "source": top.get("source"),
+            "count": body["count"],
+        })
+    return out
+
+def _mapped(chunks: Iterator[Tuple[int, List[str]]], jobs: int, tenant: Optional[str] = None,
+            options: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Yield (first_line, rows) in input order with at most 2*jobs chunks in flight."""
+    if jobs <= 1:
+        for start, qs in chunks:
+            yield start, map_chunk(qs, tenant, options)
+        return
+    # warm_indexes() already ran in the parent, so forked workers share the pages
+    # copy-on-write; under spawn the initializer loads them once per worker.
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_indexes) as ex:
+        window: deque = deque()
+        for start, qs in chunks:
+            window.append((start, ex.submit(map_chunk, qs, tenant, options)))
+            if len(window) >= jobs * 2:
+                s, fut = window.popleft()
+                yield s, fut.result()
+        while window:
+            s, fut = window.popleft()
+            yield s, fut.result()
+
+_FIELDS = ["line", "query", "snomed", "snomed_display", "loinc", "score", "source", "count"]
+
+def cmd_map(args) -> int:
+    fmt_in = _guess_format(args.input, args.input_format)
+    fmt_out = args.output_format or ("csv" if args.output and args.output.lower().endswith(".csv") else "ndjson")
+    warm_indexes()
+    tenant = valid_tenant(args.tenant) if args.tenant else None
+    if args.tenant and tenant is None:
+        sys.exit(f"Invalid tenant id '{args.tenant}'.")
+    if tenant:
+        get_tenant_cache().get(tenant)
+    options = {"domain": args.domain, "context": args.context, "top_k": args.top_k,
+               "score_cutoff": args.score_cutoff, "include_technical": args.include_technical}
+
+    inp = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8-sig", newline="")
+    out = sys.stdout if not args.output or args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    writer = csv.DictWriter(out, fieldnames=_FIELDS) if fmt_out == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    rows = hits = 0
+    t0 = last = time.perf_counter()
+    try:
+        for start, mapped in _mapped(_chunks(_iter_queries(inp, fmt_in, args.column), args.chunk_size), args.jobs, tenant, options):
+            for i, row in enumerate(mapped):
+                row = {"line": start + i, **row}
+                if writer:
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                hits += 1 if row["count"] else 0
+            rows += len(mapped)
+            now = time.perf_counter()
+            if not args.quiet and now - last >= 5:
+                last = now
+                print(f"mapped {rows} rows ({rows / (now - t0):.0f}/s)", file=sys.stderr)
+    finally:
+        if inp is not sys.stdin:
+            inp.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "rows": rows,
+        "matched": hits,
+        "unmatched": rows - hits,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "jobs": args.jobs,
+        "chunk_size": args.chunk_size,
+    }
+    print(json.dumps(stats), file=sys.stderr)
+    return 0
+
+def cmd_export(args) -> int:
+    try:
+        resources = iter_resources(args.kind, context=args.context, cursor=args.cursor, limit=args.limit)
+    except ValueError as e:
+        sys.exit(str(e))
+    nxt: List[Optional[str]] = [None]
+
+    def next_url(c: str) -> str:
+        nxt[0] = c
+        return f"?cursor={c}"
+
+    out = sys.stdout if not args.output or args.output == "-" else open(args.output, "w", encoding="utf-8")
+    written = 0
+    t0 = time.perf_counter()
+    try:
+        for part in stream_bundle(resources, args.format, next_url):
+            out.write(part)
+            written += len(part)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps({"kind": args.kind, "format": args.format, "chars": written,
+                      "elapsed_s": round(time.perf_counter() - t0, 3), "next_cursor": nxt[0]}), file=sys.stderr)
+    return 0
+
+def cmd_replay(args) -> int:
+    from app.replay import replay
+    diff_out = open(args.diff_out, "w", encoding="utf-8") if args.diff_out else None
+    try:
+        report = replay(args.logs, args.a, args.b, jobs=args.jobs, chunk_size=args.chunk_size,
+                        examples=args.examples, diff_out=diff_out)
+    except FileNotFoundError as e:
+        sys.exit(f"Snapshot not found: {e}")
+    finally:
+        if diff_out:
+            diff_out.close()
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        d = report["diff"]
+        print(json.dumps({k: d[k]["traffic_pct"] for k in ("gained", "lost", "changed")}), file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="akashic")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    mp = sub.add_parser("map", help="Map a file of terms to SNOMED/LOINC offline")
+    mp.add_argument("-i", "--input", required=True, help="CSV, NDJSON or one-term-per-line text ('-' for stdin)")
+    mp.add_argument("-o", "--output", default=None, help="Output path (default stdout); .csv selects CSV")
+    mp.add_argument("--input-format", choices=["csv", "ndjson", "text"], default=None)
+    mp.add_argument("--output-format", choices=["csv", "ndjson"], default=None)
+    mp.add_argument("--column", default=None, help="CSV column / NDJSON key holding the term")
+    mp.add_argument("--tenant", default=None, help="Resolve through data/tenants/<id>/ overlays")
+    mp.add_argument("--domain", default="auto", help="As /lookup's domain")
+    mp.add_argument("--context", default=None, help="As /lookup's context (learned namespace, domain profile)")
+    mp.add_argument("--top-k", type=int, default=5, help="As /lookup's top_k")
+    mp.add_argument("--score-cutoff", type=int, default=70, help="As /lookup's score_cutoff")
+    mp.add_argument("--include-technical", action="store_true", help="Also rank LOINC, as /lookup's include_technical")
+    mp.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes (1 = inline)")
+    mp.add_argument("--chunk-size", type=int, default=5000)
+    mp.add_argument("-q", "--quiet", action="store_true", help="No periodic progress on stderr")
+    mp.set_defaults(func=cmd_map)
+
+    ep = sub.add_parser("export", help="Export mappings as FHIR ConceptMap/ValueSet Bundles")
+    ep.add_argument("kind", choices=["conceptmap", "valueset"])
+    ep.add_argument("-o", "--output", default=None, help="Output path (default stdout)")
+    ep.add_argument("--format", choices=["json", "ndjson"], default="ndjson")
+    ep.add_argument("--context", default=None, help="Only this learned namespace / its domain_profile systems")
+    ep.add_argument("--cursor", default=None, help="Resume after a previous page's next_cursor")
+    ep.add_argument("--limit", type=int, default=0, help="Rows per page (0 = everything)")
+    ep.set_defaults(func=cmd_export)
+
+    rp = sub.add_parser("replay", help="Diff /lookup answers for logged traffic between two dataset snapshots")
+    rp.add_argument("logs", nargs="+", help="JSONLogMiddleware log files (.gz ok)")
+    rp.add_argument("--a", default=None, help="Baseline snapshot dir or manifest.json (default: current config)")
+    rp.add_argument("--b", default=None, help="Candidate snapshot dir or manifest.json (default: current config)")
+    rp.add_argument("-o", "--output", default=None, help="Report path (default stdout)")
+    rp.add_argument("--diff-out", default=None, help="NDJSON of every query whose answer differs")
+    rp.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                    help="Worker processes per snapshot")
+    rp.add_argument("--chunk-size", type=int, default=2000)
+    rp.add_argument("--examples", type=int, default=20, help="Heaviest examples per change kind in the report")
+    rp.set_defaults(func=cmd_replay)
+    return ap
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
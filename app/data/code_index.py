@@ -0,0 +1,136 @@
+from __future__ import annotations
+from typing import Dict, Any, Optional, List
+import os, json
+from functools import lru_cache
+
+from app.data.snomed_loader import get_snomed_db
+from app.data.loinc_loader import _load_alias_map
+from app.extensions.canonical_loinc import _load_canonical
+from app.utils.single_flight import coalesced
+
+SNOMED_SYSTEM = "http://snomed.info/sct"
+LOINC_SYSTEM = "http://loinc.org"
+
+_SYSTEMS = {
+    "snomed": SNOMED_SYSTEM,
+    "sct": SNOMED_SYSTEM,
+    SNOMED_SYSTEM: SNOMED_SYSTEM,
+    "loinc": LOINC_SYSTEM,
+    LOINC_SYSTEM: LOINC_SYSTEM,
+}
+
+def resolve_system(system: Optional[str]) -> Optional[str]:
+    """Map 'snomed' / 'loinc' / FHIR system URIs to the canonical URI (None if unknown)."""
+    return _SYSTEMS.get((system or "").strip().lower().rstrip("/"))
+
+def _add_unique(seq: List[str], items) -> None:
+    for s in items:
+        if s and s not in seq:
+            seq.append(s)
+
+@lru_cache(maxsize=1)
+@coalesced("snomed_code_index")
+def get_snomed_code_index() -> Dict[str, Dict[str, Any]]:
+    """Reverse index code -> {code, display, term, aliases}, built once from get_snomed_db().
+    When several primary terms share a code, the first wins and the rest become aliases."""
+    db, _ = get_snomed_db()
+    idx: Dict[str, Dict[str, Any]] = {}
+    for primary, v in db.items():
+        rec = idx.get(v["code"])
+        if rec is None:
+            idx[v["code"]] = {
+                "code": v["code"],
+                "display": v["display"],
+                "term": primary,
+                "aliases": [a for a in v["aliases"] if a != primary],
+            }
+        else:
+            _add_unique(rec["aliases"], [primary] + list(v["aliases"]))
+    return idx
+
+@lru_cache(maxsize=1)
+@coalesced("loinc_displays")
+def _load_loinc_displays() -> Dict[str, str]:
+    """Optional LOINC code -> display from data/loinc.json (scripts/build_loinc.py output).
+    Returns {} when the file is absent or malformed."""
+    path = os.getenv("LOINC_JSON", "data/loinc.json")
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            raw = json.load(f)
+        out: Dict[str, str] = {}
+        if isinstance(raw, list):
+            for row in raw:
+                if isinstance(row, dict) and row.get("code") and row.get("display"):
+                    out[str(row["code"]).strip()] = str(row["display"]).strip()
+        elif isinstance(raw, dict):
+            for k, v in raw.items():
+                if isinstance(v, str) and v.strip():
+                    out[str(k).strip()] = v.strip()
+        return out
+    except Exception:
+        return {}
+
+@lru_cache(maxsize=1)
+@coalesced("loinc_code_index")
+def get_loinc_code_index() -> Dict[str, Dict[str, Any]]:
+    """Reverse index code -> {code, display, term, aliases}, built once from the canonical
+    and alias maps. Display falls back to the canonical key without data/loinc.json."""
+    canonical = _load_canonical()
+    displays = _load_loinc_displays()
+    by_key: Dict[str, List[str]] = {}
+    for alias, key in _load_alias_map().items():
+        if alias != key:
+            by_key.setdefault(key, []).append(alias)
+    idx: Dict[str, Dict[str, Any]] = {}
+    for key, code in canonical.items():
+        rec = idx.get(code)
+        if rec is None:
+            idx[code] = {
+                "code": code,
+                "display": displays.get(code) or key,
+                "term": key,
+                "aliases": list(by_key.get(key, [])),
+            }
+        else:
+            _add_unique(rec["aliases"], [key] + by_key.get(key, []))
+    return idx
+
+def get_code_index(system: Optional[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    uri = resolve_system(system)
+    if uri == SNOMED_SYSTEM:
+        return get_snomed_code_index()
+    if uri == LOINC_SYSTEM:
+        return get_loinc_code_index()
+    return None
+
+def lookup_code(system: Optional[str], code: str) -> Optional[Dict[str, Any]]:
+    """O(1) code -> concept record, or None if the system or code is unknown."""
+    idx = get_code_index(system)
+    if idx is None:
+        return None
+    return idx.get((code or "").strip())
+
+def validate_code(system: Optional[str], code: str, display: Optional[str] = None) -> Dict[str, Any]:
+    """FHIR $validate-code semantics: result is False for unknown system/code, or when a
+    supplied display matches neither the display, primary term nor any alias."""
+    uri = resolve_system(system)
+    code = (code or "").strip()
+    out: Dict[str, Any] = {"system": uri or system, "code": code, "result": False}
+    if uri is None:
+        out["message"] = f"Unknown code system '{system}'"
+        return out
+    rec = lookup_code(uri, code)
+    if rec is None:
+        out["message"] = f"Unknown code '{code}' in {uri}"
+        return out
+    out["display"] = rec["display"]
+    if display:
+        d = display.strip().lower()
+        names = [rec["display"].lower(), rec["term"]] + rec["aliases"]
+        if d not in names:
+            out["message"] = f"Display '{display}' does not match '{rec['display']}'"
+            return out
+    out["result"] = True
+    return out
@@ -0,0 +1,263 @@
+from __future__ import annotations
+from typing import Dict, Any, Callable, Iterable, List, Optional
+from functools import lru_cache
+import os, threading, time
+
+from app.data.snomed_loader import get_snomed_db, read_snomed_file, _alias_index
+from app.data.loinc_loader import _load_alias_map, normalize_loinc_term
+from app.extensions.canonical_loinc import _load_canonical, choose as choose_loinc
+from app.data import code_index
+from app.utils.domain_profile import load_domain_profile, resolve_allowed_systems
+from app.data.live_index import journal_position
+
+_IDLE_S = float(os.getenv("CODE_SYSTEM_IDLE_S", "0"))  # 0 = never unload
+_SWEEP_EVERY_S = 30.0
+DEFAULT_SYSTEMS = ("snomed", "loinc")
+
+
+class CodeSystem:
+    """One terminology: where its data lives, how to index it, how to resolve a term.
+
+    - sources: env var -> default path, read when the index is built.
+    - build(paths) -> index. Must not throw; an empty index means "no data".
+    - resolve(index, term, overlay) -> {"code", "display"} or None.
+    - unload(): optional, for systems whose index lives in module-level caches.
+    - vocabulary(index) -> iterable of resolvable terms, for fuzzy/technical search.
+    - technical: the result carries only the code (like LOINC), no patient/practitioner views.
+    """
+
+    def __init__(self, name: str, uri: str, sources: Dict[str, str],
+                 build: Callable[[Dict[str, str]], Any],
+                 resolve: Callable[[Any, str, Any], Optional[Dict[str, str]]],
+                 unload: Optional[Callable[[], None]] = None, technical: bool = False,
+                 vocabulary: Optional[Callable[[Any], Iterable[str]]] = None):
+        self.name = name
+        self.uri = uri
+        self.sources = sources
+        self.build = build
+        self.resolve = resolve
+        self.unload = unload
+        self.technical = technical
+        self.vocabulary = vocabulary
+
+    def paths(self) -> Dict[str, str]:
+        return {env: os.getenv(env, default) for env, default in self.sources.items()}
+
+
+class CodeSystemRegistry:
+    """Registered systems (registration order = resolution order) with lazily built,
+    idle-unloaded indexes. Loads are single-flight per system; callers on the event
+    loop should warm through resolver.ensure_indexes() so the build runs off-loop."""
+
+    def __init__(self, idle_s: float = _IDLE_S):
+        self.idle_s = idle_s
+        self._systems: Dict[str, CodeSystem] = {}
+        self._index: Dict[str, Any] = {}
+        self._last_used: Dict[str, float] = {}
+        self._load_ms: Dict[str, float] = {}
+        self._loads: Dict[str, int] = {}
+        self._unloads: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.generation = 0  # bumped on every build/unload; part of resolver.data_version()
+
+    def register(self, system: CodeSystem):
+        with self._lock:
+            self._systems[system.name] = system
+            self._locks.setdefault(system.name, threading.Lock())
+
+    def names(self) -> List[str]:
+        return list(self._systems)
+
+    def system(self, name: str) -> Optional[CodeSystem]:
+        return self._systems.get(name)
+
+    def loaded(self, name: str) -> bool:
+        return name in self._index
+
+    def index(self, name: str) -> Any:
+        """The system's index, building it (blocking) on first use after start or unload."""
+        now = time.monotonic()
+        if name in self._index:
+            self._last_used[name] = now
+            idx = self._index[name]
+        else:
+            system = self._systems[name]
+            with self._locks[name]:
+                if name not in self._index:
+                    t0 = time.perf_counter()
+                    self._index[name] = system.build(system.paths())
+                    self._load_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+                    self._loads[name] = self._loads.get(name, 0) + 1
+                    self.generation += 1
+                self._last_used[name] = now
+                idx = self._index[name]
+        if self.idle_s > 0 and now - self._last_sweep >= _SWEEP_EVERY_S:
+            self.sweep(now)
+        return idx
+
+    def resolve(self, name: str, term: str, overlay: Any = None) -> Optional[Dict[str, str]]:
+        return self._systems[name].resolve(self.index(name), term, overlay)
+
+    def unload(self, name: str):
+        system = self._systems[name]
+        with self._locks[name]:
+            if self._index.pop(name, None) is None and name not in self._last_used:
+                return
+            self._last_used.pop(name, None)
+            if system.unload:
+                system.unload()
+            self._unloads[name] = self._unloads.get(name, 0) + 1
+            self.generation += 1
+
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Unload every system unused for CODE_SYSTEM_IDLE_S seconds."""
+        now = now or time.monotonic()
+        self._last_sweep = now
+        if self.idle_s <= 0:
+            return []
+        idle = [n for n, t in list(self._last_used.items()) if n in self._index and now - t >= self.idle_s]
+        for n in idle:
+            self.unload(n)
+        return idle
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        out = {}
+        for name, system in self._systems.items():
+            last = self._last_used.get(name)
+            out[name] = {
+                "uri": system.uri,
+                "loaded": name in self._index,
+                "idle_s": round(now - last, 1) if last is not None and name in self._index else None,
+                "load_ms": self._load_ms.get(name),
+                "loads": self._loads.get(name, 0),
+                "unloads": self._unloads.get(name, 0),
+            }
+        return {"idle_unload_s": self.idle_s, "systems": out}
+
+
+# ---- Built-in systems -----------------------------------------------------------
+#
+# SNOMED and LOINC keep their lru_cache loaders: journal replay, live edits, tenant
+# overlays and fold reloads all go through them. Their registry index is only the
+# "loaded" marker; resolve() reads the (cached) loader so it never sees a stale copy.
+
+def _snomed_resolve(_idx, term: str, overlay) -> Optional[Dict[str, str]]:
+    if overlay is not None:
+        entry = overlay.snomed_entry(term)
+    else:
+        db, alias_index = get_snomed_db()
+        pk = alias_index.get(term)
+        entry = db[pk] if pk else None
+    return {"code": entry["code"], "display": entry["display"]} if entry else None
+
+def _snomed_unload():
+    get_snomed_db.cache_clear()
+    code_index.get_snomed_code_index.cache_clear()
+
+def _loinc_build(_paths):
+    _load_alias_map()
+    _load_canonical()
+    code_index._load_loinc_displays()
+    return True
+
+def _loinc_resolve(_idx, term: str, overlay) -> Optional[Dict[str, str]]:
+    if overlay is not None:
+        code = overlay.loinc_code(overlay.loinc_key(term))
+    else:
+        code = choose_loinc(normalize_loinc_term(term))
+    return {"code": code, "display": None} if code else None
+
+def _loinc_unload():
+    _load_alias_map.cache_clear()
+    _load_canonical.cache_clear()
+    code_index.get_loinc_code_index.cache_clear()
+    code_index._load_loinc_displays.cache_clear()
+
+# RxNorm, CVX: snomed.json-shaped files ({term: {code, display, aliases}}), indexed
+# here only. Missing or unreadable files give an empty index.
+
+def _concept_file_build(env: str):
+    def build(paths):
+        path = paths[env]
+        if not os.path.exists(path):
+            return {}, {}
+        try:
+            db = read_snomed_file(path)
+            return db, _alias_index(db)
+        except Exception:
+            return {}, {}
+    return build
+
+def _concept_file_resolve(idx, term: str, _overlay) -> Optional[Dict[str, str]]:
+    db, alias_index = idx
+    pk = alias_index.get(term)
+    return {"code": db[pk]["code"], "display": db[pk]["display"]} if pk else None
+
+_registry: Optional[CodeSystemRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> CodeSystemRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                reg = CodeSystemRegistry()
+                reg.register(CodeSystem(
+                    "snomed", code_index.SNOMED_SYSTEM, {"SNOMED_JSON": "data/snomed.json"},
+                    lambda paths: bool(get_snomed_db()), _snomed_resolve, _snomed_unload,
+                    vocabulary=lambda _idx: get_snomed_db()[1].keys(),
+                ))
+                reg.register(CodeSystem(
+                    "loinc", code_index.LOINC_SYSTEM,
+                    {"LOINC_ALIASES_JSON": "data/loinc_aliases.json",
+                     "LOINC_CANONICAL_JSON": "data/loinc_canonical.json"},
+                    _loinc_build, _loinc_resolve, _loinc_unload, technical=True,
+                    vocabulary=lambda _idx: set(_load_alias_map()) | set(_load_canonical()),
+                ))
+                reg.register(CodeSystem(
+                    "rxnorm", "http://www.nlm.nih.gov/research/umls/rxnorm", {"RXNORM_JSON": "data/rxnorm.json"},
+                    _concept_file_build("RXNORM_JSON"), _concept_file_resolve,
+                    vocabulary=lambda idx: idx[1].keys(),
+                ))
+                reg.register(CodeSystem(
+                    "cvx", "http://hl7.org/fhir/sid/cvx", {"CVX_JSON": "data/cvx.json"},
+                    _concept_file_build("CVX_JSON"), _concept_file_resolve,
+                    vocabulary=lambda idx: idx[1].keys(),
+                ))
+                _registry = reg
+    return _registry
+
+def data_version() -> tuple:
+    """Changes whenever resolution input can: a live edit or fold (journal position)
+    or a code-system build/unload (registry generation)."""
+    return (get_registry().generation, journal_position())
+
+_vocab_cache: Dict[str, tuple] = {}
+
+def vocabulary(name: str) -> List[str]:
+    """A system's resolvable terms as a list (for fuzzy matching), rebuilt only when
+    data_version() changes."""
+    reg = get_registry()
+    system = reg.system(name)
+    if system is None or system.vocabulary is None:
+        return []
+    idx = reg.index(name)
+    version = data_version()
+    hit = _vocab_cache.get(name)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    terms = list(system.vocabulary(idx))
+    _vocab_cache[name] = (version, terms)
+    return terms
+
+@lru_cache(maxsize=1)
+def _domain_profile() -> Dict[str, Any]:
+    return load_domain_profile()
+
+def allowed_systems(context: Optional[str] = None, domain: Optional[str] = "auto") -> tuple:
+    """Registered systems the domain profile allows for (context, domain), in resolution order."""
+    allowed = resolve_allowed_systems(_domain_profile(), context, domain)
+    return tuple(n for n in get_registry().names() if n in allowed)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+from typing import Dict, Any, List, Iterator, Optional
+from contextlib import contextmanager
+import os, json
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes run a single worker
+    fcntl = None
+
+_JOURNAL_PATH = os.getenv("DATASET_JOURNAL", "data/dataset_journal.jsonl")
+
+SNOMED_OPS = ("snomed.upsert_concept", "snomed.remove_concept", "snomed.add_alias", "snomed.remove_alias")
+LOINC_OPS = ("loinc.set_canonical", "loinc.remove_canonical", "loinc.add_alias", "loinc.remove_alias")
+
+_REQUIRED = {
+    "snomed.upsert_concept": ("term", "code", "display"),
+    "snomed.remove_concept": ("term",),
+    "snomed.add_alias": ("alias", "term"),
+    "snomed.remove_alias": ("alias",),
+    "loinc.set_canonical": ("key", "code"),
+    "loinc.remove_canonical": ("key",),
+    "loinc.add_alias": ("alias", "key"),
+    "loinc.remove_alias": ("alias",),
+}
+
+def _norm(s: str) -> str:
+    return (s or "").strip().lower()
+
+def journal_path() -> str:
+    return _JOURNAL_PATH
+
+def validate_op(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one op; raises ValueError on unknown op or missing fields.
+    Terms, aliases and keys are lower-cased like the loaders; codes/displays kept."""
+    if not isinstance(raw, dict):
+        raise ValueError("op must be an object")
+    kind = raw.get("op")
+    if kind not in _REQUIRED:
+        raise ValueError(f"unknown op '{kind}'")
+    op: Dict[str, Any] = {"op": kind}
+    for f in _REQUIRED[kind]:
+        v = raw.get(f)
+        if not isinstance(v, str) or not v.strip():
+            raise ValueError(f"{kind}: '{f}' is required")
+        op[f] = v.strip() if f in ("code", "display") else _norm(v)
+    if kind == "snomed.upsert_concept":
+        op["aliases"] = [_norm(a) for a in (raw.get("aliases") or []) if isinstance(a, str) and a.strip()]
+    return op
+
+def read_journal(kinds: Optional[tuple] = None, path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield journal ops in order (optionally only `kinds`); skips torn/bad lines."""
+    p = path or _JOURNAL_PATH
+    if not os.path.exists(p):
+        return
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                op = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(op, dict) and (kinds is None or op.get("op") in kinds):
+                yield op
+
+@contextmanager
+def journal_lock(path: Optional[str] = None):
+    """Exclusive cross-process lock for journal writers (append, fold), held with flock
+    on `<journal>.lock`. A separate file because a fold replaces the journal itself,
+    which would orphan a lock taken on the old inode."""
+    p = (path or _JOURNAL_PATH) + ".lock"
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+    fd = os.open(p, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the flock
+
+def append_ops(ops: List[Dict[str, Any]], path: Optional[str] = None):
+    """Durably append ops (one fsync per call). Callers that also fold hold journal_lock()."""
+    p = path or _JOURNAL_PATH
+    os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+    with open(p, "a", encoding="utf-8") as f:
+        for op in ops:
+            f.write(json.dumps(op, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+# ---- Pure appliers (idempotent; used for startup replay and live updates) -----
+
+def apply_snomed_op(db: Dict[str, Dict[str, Any]], alias_index: Dict[str, str], op: Dict[str, Any]):
+    kind = op.get("op")
+    if kind == "snomed.upsert_concept":
+        term = op["term"]
+        entry = db.get(term)
+        aliases = list(entry["aliases"]) if entry else []
+        for a in op.get("aliases") or []:
+            if a not in aliases:
+                aliases.append(a)
+        db[term] = {"code": op["code"], "display": op["display"], "aliases": aliases}
+        alias_index[term] = term
+        for a in aliases:
+            alias_index[a] = term
+    elif kind == "snomed.remove_concept":
+        term = op["term"]
+        entry = db.pop(term, None)
+        if entry is not None:
+            for a in [term] + entry["aliases"]:
+                if alias_index.get(a) == term:
+                    del alias_index[a]
+    elif kind == "snomed.add_alias":
+        entry = db.get(op["term"])
+        if entry is None:
+            return
+        prev = alias_index.get(op["alias"])
+        if prev and prev != op["term"] and op["alias"] in db[prev]["aliases"]:
+            db[prev]["aliases"].remove(op["alias"])
+        if op["alias"] not in entry["aliases"] and op["alias"] != op["term"]:
+            entry["aliases"].append(op["alias"])
+        alias_index[op["alias"]] = op["term"]
+    elif kind == "snomed.remove_alias":
+        term = alias_index.get(op["alias"])
+        if term is None or term == op["alias"]:
+            return  # primaries are removed with remove_concept
+        del alias_index[op["alias"]]
+        entry = db.get(term)
+        if entry and op["alias"] in entry["aliases"]:
+            entry["aliases"].remove(op["alias"])
+
+def apply_loinc_alias_op(alias_map: Dict[str, str], op: Dict[str, Any]):
+    kind = op.get("op")
+    if kind == "loinc.add_alias":
+        alias_map[op["alias"]] = op["key"]
+    elif kind == "loinc.remove_alias":
+        alias_map.pop(op["alias"], None)
+
+def apply_loinc_canonical_op(canonical: Dict[str, str], op: Dict[str, Any]):
+    kind = op.get("op")
+    if kind == "loinc.set_canonical":
+        canonical[op["key"]] = op["code"]
+    elif kind == "loinc.remove_canonical":
+        canonical.pop(op["key"], None)
@@ -0,0 +1,243 @@
+from __future__ import annotations
+from typing import Dict, Any, List, Optional, Tuple
+import os, json, threading, time
+
+from app.data.journal import (
+    validate_op, append_ops, journal_lock, journal_path,
+    apply_snomed_op, apply_loinc_alias_op, apply_loinc_canonical_op,
+)
+from app.data.snomed_loader import get_snomed_db
+from app.data.loinc_loader import _load_alias_map
+from app.extensions.canonical_loinc import _load_canonical
+from app.data import code_index
+from app.utils.io_executor import submit_io
+
+_FOLD_EVERY = int(os.getenv("DATASET_FOLD_EVERY", "500"))
+_POLL_S = int(os.getenv("DATASET_JOURNAL_POLL_MS", "250")) / 1000.0
+_LOCK = threading.RLock()
+
+_LOADERS = (get_snomed_db, _load_alias_map, _load_canonical,
+            code_index.get_snomed_code_index, code_index.get_loinc_code_index)
+
+# Journal position this process has applied up to: (inode, size).
+_applied: Tuple[int, int] = (0, 0)
+_pending_fold = 0
+_last_poll = 0.0
+
+
+def _journal_stat() -> Tuple[int, int]:
+    try:
+        st = os.stat(journal_path())
+        return st.st_ino, st.st_size
+    except FileNotFoundError:
+        return 0, 0
+
+def _loaded(fn) -> bool:
+    return bool(fn.cache_info().currsize)
+
+# ---- Reverse-index maintenance ------------------------------------------------
+
+def _snomed_rev_refresh(term: str, old_code: Optional[str]):
+    if not _loaded(code_index.get_snomed_code_index):
+        return
+    idx = code_index.get_snomed_code_index()
+    db, _ = get_snomed_db()
+    if old_code and idx.get(old_code, {}).get("term") == term:
+        del idx[old_code]
+    entry = db.get(term)
+    if entry is None:
+        return
+    rec = idx.get(entry["code"])
+    if rec is None or rec["term"] == term:
+        idx[entry["code"]] = {
+            "code": entry["code"],
+            "display": entry["display"],
+            "term": term,
+            "aliases": [a for a in entry["aliases"] if a != term],
+        }
+    else:
+        code_index._add_unique(rec["aliases"], [term] + entry["aliases"])
+
+def _snomed_rev_drop_alias(code: Optional[str], alias: str):
+    if code and _loaded(code_index.get_snomed_code_index):
+        rec = code_index.get_snomed_code_index().get(code)
+        if rec and alias in rec["aliases"]:
+            rec["aliases"].remove(alias)
+
+def _loinc_rev_key(key: str, old_code: Optional[str]):
+    if not _loaded(code_index.get_loinc_code_index):
+        return
+    idx = code_index.get_loinc_code_index()
+    aliases: List[str] = []
+    if old_code and idx.get(old_code, {}).get("term") == key:
+        aliases = idx.pop(old_code)["aliases"]
+    code = _load_canonical().get(key)
+    if code is None:
+        return
+    rec = idx.get(code)
+    if rec is None or rec["term"] == key:
+        if rec is not None:
+            aliases = rec["aliases"]
+        display = code_index._load_loinc_displays().get(code) or key
+        idx[code] = {"code": code, "display": display, "term": key, "aliases": aliases}
+    else:
+        code_index._add_unique(rec["aliases"], [key] + aliases)
+
+def _loinc_rev_alias(alias: str, old_key: Optional[str], new_key: Optional[str]):
+    if not _loaded(code_index.get_loinc_code_index):
+        return
+    idx = code_index.get_loinc_code_index()
+    canonical = _load_canonical()
+    if old_key and canonical.get(old_key) in idx:
+        rec = idx[canonical[old_key]]
+        if alias in rec["aliases"]:
+            rec["aliases"].remove(alias)
+    if new_key and canonical.get(new_key) in idx:
+        code_index._add_unique(idx[canonical[new_key]]["aliases"], [alias])
+
+def _apply_live(op: Dict[str, Any]):
+    """Apply one op to the loaded in-memory indexes (forward and reverse)."""
+    kind = op["op"]
+    if kind.startswith("snomed."):
+        db, alias_index = get_snomed_db()
+        if kind in ("snomed.upsert_concept", "snomed.remove_concept"):
+            old = db.get(op["term"])
+            apply_snomed_op(db, alias_index, op)
+            _snomed_rev_refresh(op["term"], old["code"] if old else None)
+        elif kind == "snomed.add_alias":
+            prev = alias_index.get(op["alias"])
+            apply_snomed_op(db, alias_index, op)
+            if prev and prev != op["term"] and prev in db:
+                _snomed_rev_drop_alias(db[prev]["code"], op["alias"])
+            _snomed_rev_refresh(op["term"], None)
+        else:
+            prev = alias_index.get(op["alias"])
+            apply_snomed_op(db, alias_index, op)
+            if prev and prev in db:
+                _snomed_rev_drop_alias(db[prev]["code"], op["alias"])
+    elif kind in ("loinc.add_alias", "loinc.remove_alias"):
+        alias_map = _load_alias_map()
+        prev = alias_map.get(op["alias"])
+        apply_loinc_alias_op(alias_map, op)
+        _loinc_rev_alias(op["alias"], prev, alias_map.get(op["alias"]))
+    else:
+        canonical = _load_canonical()
+        old_code = canonical.get(op["key"])
+        apply_loinc_canonical_op(canonical, op)
+        _loinc_rev_key(op["key"], old_code)
+
+# ---- Public API -----------------------------------------------------------------
+
+def apply_ops(raw_ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validate, journal (one fsync) and apply ops to the live indexes.
+    Raises ValueError before anything is written if any op is invalid."""
+    global _applied, _pending_fold
+    ops = [validate_op(r) for r in raw_ops]
+    ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    for op in ops:
+        op["ts"] = ts
+    with _LOCK, journal_lock():
+        _sync_locked()  # loads indexes (replaying the journal) and catches up
+        append_ops(ops)
+        for op in ops:
+            _apply_live(op)
+        _applied = _journal_stat()
+        _pending_fold += len(ops)
+        fold_due = _FOLD_EVERY > 0 and _pending_fold >= _FOLD_EVERY
+    if fold_due:
+        submit_io(fold_journal)
+    return {"applied": len(ops), "journal": journal_path(), "fold_scheduled": fold_due}
+
+def _reload_all():
+    for fn in _LOADERS:
+        fn.cache_clear()
+    for fn in _LOADERS:
+        fn()
+
+def _sync_locked():
+    """Bring this process's indexes up to the journal (other workers' writes)."""
+    global _applied, _pending_fold
+    for fn in _LOADERS[:3]:
+        fn()
+    ino, size = _journal_stat()
+    a_ino, a_size = _applied
+    if (ino, size) == _applied:
+        return
+    if ino != a_ino or size < a_size:
+        if a_ino != 0 or a_size != 0:
+            # Journal was folded (replaced) elsewhere: base files changed, reload.
+            _reload_all()
+        # First sync in this process (the loaders replayed the journal, possibly long
+        # ago) or after a reload: ops are idempotent, so re-apply and recount it all.
+        start, _pending_fold = 0, 0
+    else:
+        start = a_size
+    pos, n = start, 0
+    if start < size:
+        with open(journal_path(), "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn tail of an in-progress append: picked up next sync
+                pos += len(line)
+                try:
+                    _apply_live(validate_op(json.loads(line)))
+                    n += 1
+                except (ValueError, json.JSONDecodeError):
+                    continue
+    _pending_fold += n
+    _applied = (ino, pos)
+
+def sync_journal():
+    with _LOCK:
+        _sync_locked()
+
+def journal_changed() -> bool:
+    """Cheap, throttled check (one stat per DATASET_JOURNAL_POLL_MS) for new journal ops."""
+    global _last_poll
+    now = time.monotonic()
+    if now - _last_poll < _POLL_S:
+        return False
+    _last_poll = now
+    return _journal_stat() != _applied
+
+def _dump_json_atomic(path: str, data: Any):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def fold_journal() -> Dict[str, Any]:
+    """Write base + journal back into the base files and start an empty journal.
+    Ops are idempotent, so a crash between the two steps only replays folded ops. Holds
+    journal_lock() throughout, like apply_ops(), so no op lands in the journal after
+    the sync and is then lost by the truncate."""
+    global _applied, _pending_fold
+    with _LOCK, journal_lock():  # no worker can append between the sync and the truncate
+        _sync_locked()
+        n = _pending_fold
+        if n == 0:
+            return {"folded": 0}
+        db, _ = get_snomed_db()
+        _dump_json_atomic(os.getenv("SNOMED_JSON", "data/snomed.json"), {
+            term: {"code": e["code"], "display": e["display"], "aliases": e["aliases"]}
+            for term, e in db.items()
+        })
+        _dump_json_atomic(os.getenv("LOINC_ALIASES_JSON", "data/loinc_aliases.json"), dict(_load_alias_map()))
+        _dump_json_atomic(os.getenv("LOINC_CANONICAL_JSON", "data/loinc_canonical.json"), dict(_load_canonical()))
+        path = journal_path()
+        open(path + ".tmp", "w").close()
+        os.replace(path + ".tmp", path)
+        _applied = _journal_stat()
+        _pending_fold = 0
+        return {"folded": n}
+
+def journal_position() -> Tuple[int, int]:
+    """(inode, size) of the journal this process has applied; changes with every edit or fold."""
+    return _applied
+
+def journal_status() -> Dict[str, Any]:
+    ino, size = _journal_stat()
+    return {"journal": journal_path(), "bytes": size, "pending_ops": _pending_fold, "fold_every": _FOLD_EVERY}
@@ -3,25 +3,30 @@ from typing import Dict
 import os, json
 from functools import lru_cache
 
-def _norm(s: str) -> str:
-    return (s or "").strip().lower()
+from app.data.journal import read_journal, apply_loinc_alias_op, LOINC_OPS, _norm
+from app.utils.single_flight import coalesced
+
+def read_alias_file(path: str) -> Dict[str, str]:
+    """Parse one loinc_aliases.json-shaped file (alias -> canonical key), normalized."""
+    with open(path, "r", encoding="utf-8-sig") as f:  # <-- handles BOM
+        raw = json.load(f)
+    if not isinstance(raw, dict):
+        return {}
+    return {_norm(k): _norm(v) for k, v in raw.items() if isinstance(v, str)}
 
 @lru_cache(maxsize=1)
+@coalesced("loinc_aliases")
 def _load_alias_map() -> Dict[str, str]:
     """Load alias -> canonical-key from data/loinc_aliases.json.
-    Accepts UTF-8 with or without BOM; returns {} on problems."""
+    Accepts UTF-8 with or without BOM; replays loinc alias ops from the dataset
+    journal; returns {} on problems."""
     path = os.getenv("LOINC_ALIASES_JSON", "data/loinc_aliases.json")
     if not os.path.exists(path):
         return {}
     try:
-        with open(path, "r", encoding="utf-8-sig") as f:  # <-- handles BOM
-            raw = json.load(f)
-        if not isinstance(raw, dict):
-            return {}
-        out: Dict[str, str] = {}
-        for k, v in raw.items():
-            if isinstance(v, str):
-                out[_norm(k)] = _norm(v)
+        out = read_alias_file(path)
+        for op in read_journal(LOINC_OPS):
+            apply_loinc_alias_op(out, op)
         return out
     except Exception:
         return {}
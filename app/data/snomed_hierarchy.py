@@ -0,0 +1,235 @@
+from __future__ import annotations
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from array import array
+from functools import lru_cache
+import bisect, json, os, sys, time
+
+from app.utils.single_flight import coalesced
+
+ISA_TYPE_ID = "116680003"  # SNOMED CT |is a|
+
+
+def read_rf2_isa(path: str) -> List[Tuple[str, str]]:
+    """Active is-a (child, parent) pairs from an RF2 Relationship file (snapshot or full;
+    for full files the latest effectiveTime per relationship id wins)."""
+    latest: Dict[str, Tuple[str, bool, str, str]] = {}
+    with open(path, "r", encoding="utf-8-sig") as f:
+        header = f.readline().rstrip("\r\n").split("\t")
+        col = {name: i for i, name in enumerate(header)}
+        i_id, i_time, i_active = col["id"], col["effectiveTime"], col["active"]
+        i_src, i_dst, i_type = col["sourceId"], col["destinationId"], col["typeId"]
+        for line in f:
+            row = line.rstrip("\r\n").split("\t")
+            if len(row) < len(header) or row[i_type] != ISA_TYPE_ID:
+                continue
+            prev = latest.get(row[i_id])
+            if prev is None or row[i_time] >= prev[0]:
+                latest[row[i_id]] = (row[i_time], row[i_active] == "1", row[i_src], row[i_dst])
+    return [(src, dst) for _, active, src, dst in latest.values() if active]
+
+def read_json_isa(path: str) -> List[Tuple[str, str]]:
+    """(child, parent) pairs from [[child, parent], ...], [{"child", "parent"}, ...]
+    or {child: [parent, ...]}."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        raw = json.load(f)
+    edges: List[Tuple[str, str]] = []
+    if isinstance(raw, dict):
+        for child, parents in raw.items():
+            for p in (parents if isinstance(parents, list) else [parents]):
+                edges.append((str(child), str(p)))
+    elif isinstance(raw, list):
+        for row in raw:
+            if isinstance(row, (list, tuple)) and len(row) >= 2:
+                edges.append((str(row[0]), str(row[1])))
+            elif isinstance(row, dict):
+                c = row.get("child", row.get("sourceId"))
+                p = row.get("parent", row.get("destinationId"))
+                if c is not None and p is not None:
+                    edges.append((str(c), str(p)))
+    return edges
+
+def _bytes(a) -> int:
+    return sys.getsizeof(a)
+
+
+class SnomedHierarchy:
+    """Transitive closure of the is-a DAG, interval labeled.
+
+    Concepts are numbered in DFS post-order over a spanning forest, so each subtree is
+    a contiguous post-order range [low, post]. A concept's descendants are the union
+    of its own range and its children's (non-tree edges add extra ranges); merged, one
+    concept usually needs a single interval. All per-concept data lives in flat
+    int arrays (CSR), not per-node Python objects.
+
+    - subsumes(a, b): binary search in a's intervals for b's post number.
+    - descendants(a): walk a's intervals, O(k).
+    - ancestors(b): BFS over parent links, O(k) (ancestor sets are small).
+    """
+
+    def __init__(self, edges: List[Tuple[str, str]]):
+        t0 = time.perf_counter()
+        index: Dict[str, int] = {}
+        ids: List[str] = []
+        for c, p in edges:
+            for x in (c, p):
+                if x not in index:
+                    index[x] = len(ids)
+                    ids.append(x)
+        n = len(ids)
+        parents: List[List[int]] = [[] for _ in range(n)]
+        children: List[List[int]] = [[] for _ in range(n)]
+        for c, p in edges:
+            ci, pi = index[c], index[p]
+            if ci != pi and pi not in parents[ci]:
+                parents[ci].append(pi)
+                children[pi].append(ci)
+
+        par_off, par = array("i", [0]), array("i")
+        for ps in parents:
+            par.extend(ps)
+            par_off.append(len(par))
+
+        # Iterative DFS post-order from the roots; leftovers (cycles) start their own trees.
+        post, low, order = array("i", [0]) * n, array("i", [0]) * n, array("i", [0]) * n
+        seen = bytearray(n)
+        counter = 0
+        roots = [i for i in range(n) if not parents[i]]
+        for r in roots + list(range(n)):
+            if seen[r]:
+                continue
+            seen[r] = 1
+            low[r] = counter
+            stack = [[r, 0]]
+            while stack:
+                top = stack[-1]
+                ch = children[top[0]]
+                if top[1] < len(ch):
+                    c = ch[top[1]]
+                    top[1] += 1
+                    if not seen[c]:
+                        seen[c] = 1
+                        low[c] = counter
+                        stack.append([c, 0])
+                else:
+                    stack.pop()
+                    post[top[0]] = counter
+                    order[counter] = top[0]
+                    counter += 1
+
+        # Merged descendant intervals, built in post-order (children before parents).
+        iv_off, iv_lo, iv_hi = array("i", [0]), array("i"), array("i")
+        for p in range(n):
+            node = order[p]
+            ivs = [(low[node], p)]
+            for c in children[node]:
+                pc = post[c]
+                if pc > p:  # back edge from a cycle: not a descendant interval
+                    continue
+                s, e = iv_off[pc], iv_off[pc + 1]
+                ivs.extend(zip(iv_lo[s:e], iv_hi[s:e]))
+            ivs.sort()
+            lo, hi = ivs[0]
+            for a, b in ivs[1:]:
+                if a <= hi + 1:
+                    hi = max(hi, b)
+                else:
+                    iv_lo.append(lo)
+                    iv_hi.append(hi)
+                    lo, hi = a, b
+            iv_lo.append(lo)
+            iv_hi.append(hi)
+            iv_off.append(len(iv_lo))
+
+        self.ids, self.index = ids, index
+        self.par_off, self.par = par_off, par
+        self.post, self.order = post, order
+        self.iv_off, self.iv_lo, self.iv_hi = iv_off, iv_lo, iv_hi
+        self.edges = len(par)
+        self.build_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def subsumes(self, a: str, b: str) -> bool:
+        """True if a is b or an ancestor of b."""
+        ia, ib = self.index.get(a), self.index.get(b)
+        if ia is None or ib is None:
+            return False
+        pb, pa = self.post[ib], self.post[ia]
+        s, e = self.iv_off[pa], self.iv_off[pa + 1]
+        k = bisect.bisect_right(self.iv_lo, pb, s, e) - 1
+        return k >= s and pb <= self.iv_hi[k]
+
+    def descendants(self, code: str) -> Iterator[str]:
+        i = self.index.get(code)
+        if i is None:
+            return
+        p = self.post[i]
+        for k in range(self.iv_off[p], self.iv_off[p + 1]):
+            for q in range(self.iv_lo[k], self.iv_hi[k] + 1):
+                if q != p:
+                    yield self.ids[self.order[q]]
+
+    def descendant_count(self, code: str) -> int:
+        """O(intervals), without enumerating."""
+        i = self.index.get(code)
+        if i is None:
+            return 0
+        p = self.post[i]
+        return sum(self.iv_hi[k] - self.iv_lo[k] + 1 for k in range(self.iv_off[p], self.iv_off[p + 1])) - 1
+
+    def ancestors(self, code: str) -> List[str]:
+        i = self.index.get(code)
+        if i is None:
+            return []
+        seen = {i}
+        out: List[str] = []
+        frontier = [i]
+        while frontier:
+            nxt = []
+            for x in frontier:
+                for j in self.par[self.par_off[x]:self.par_off[x + 1]]:
+                    if j not in seen:
+                        seen.add(j)
+                        out.append(self.ids[j])
+                        nxt.append(j)
+            frontier = nxt
+        return out
+
+    def parents(self, code: str) -> List[str]:
+        i = self.index.get(code)
+        if i is None:
+            return []
+        return [self.ids[j] for j in self.par[self.par_off[i]:self.par_off[i + 1]]]
+
+    def stats(self) -> Dict[str, Any]:
+        closure = sum(_bytes(a) for a in (self.post, self.order, self.iv_off, self.iv_lo, self.iv_hi))
+        graph = _bytes(self.par_off) + _bytes(self.par)
+        ids = _bytes(self.ids) + _bytes(self.index) + sum(sys.getsizeof(s) for s in self.ids)
+        n = len(self.ids)
+        return {
+            "concepts": n,
+            "isa_edges": self.edges,
+            "intervals": len(self.iv_lo),
+            "intervals_per_concept": round(len(self.iv_lo) / n, 3) if n else 0.0,
+            "build_ms": self.build_ms,
+            "bytes": {"closure": closure, "parents": graph, "id_map": ids, "total": closure + graph + ids},
+        }
+
+
+@lru_cache(maxsize=1)
+@coalesced("snomed_hierarchy")
+def get_snomed_hierarchy() -> Optional[SnomedHierarchy]:
+    """Load is-a edges from SNOMED_ISA (RF2 Relationship .txt/.tsv, or a JSON edge list;
+    default data/snomed_isa.json) and build the closure. None if absent or unreadable."""
+    path = os.getenv("SNOMED_ISA", "data/snomed_isa.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        if path.lower().endswith((".txt", ".tsv")):
+            edges = read_rf2_isa(path)
+        else:
+            edges = read_json_isa(path)
+        return SnomedHierarchy(edges)
+    except Exception:
+        return None
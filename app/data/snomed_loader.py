@@ -3,8 +3,8 @@ from typing import Dict, Any, Tuple
 import os, json
 from functools import lru_cache
 
-def _norm(s: str) -> str:
-    return (s or "").strip().lower()
+from app.data.journal import read_journal, apply_snomed_op, SNOMED_OPS, _norm
+from app.utils.single_flight import coalesced
 
 def _alias_index(db: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
     idx: Dict[str, str] = {}
@@ -34,30 +34,41 @@ def _as_object_map(raw: Any) -> Dict[str, Dict[str, Any]]:
         return out
     return {}
 
+def read_snomed_file(path: str) -> Dict[str, Dict[str, Any]]:
+    """Parse one snomed.json-shaped file into {term: {code, display, aliases}}.
+    Raises on unreadable JSON; callers decide how to degrade."""
+    with open(path, "r", encoding="utf-8-sig") as f:  # <-- handles BOM
+        raw = json.load(f)
+    raw = _as_object_map(raw)
+    db: Dict[str, Dict[str, Any]] = {}
+    for k, v in raw.items():
+        if not isinstance(v, dict):
+            continue
+        code = v.get("code")
+        display = v.get("display")
+        if not code or not display:
+            continue
+        aliases = [str(a).strip().lower() for a in (v.get("aliases") or []) if a]
+        db[str(k).strip().lower()] = {"code": str(code), "display": str(display), "aliases": aliases}
+    return db
+
 @lru_cache(maxsize=1)
+@coalesced("snomed")
 def get_snomed_db() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
     """Load SNOMED terms from data/snomed.json.
     - Accepts UTF-8 with or without BOM.
     - Accepts object map OR array-of-rows (with .term/.code/.display/.aliases).
+    - Replays snomed.* ops from the dataset journal over the base file.
     - Never throws; returns ({}, {}) on problems.
     """
     path = os.getenv("SNOMED_JSON", "data/snomed.json")
     if not os.path.exists(path):
         return {}, {}
     try:
-        with open(path, "r", encoding="utf-8-sig") as f:  # <-- handles BOM
-            raw = json.load(f)
-        raw = _as_object_map(raw)
-        db: Dict[str, Dict[str, Any]] = {}
-        for k, v in raw.items():
-            if not isinstance(v, dict):
-                continue
-            code = v.get("code")
-            display = v.get("display")
-            if not code or not display:
-                continue
-            aliases = [str(a).strip().lower() for a in (v.get("aliases") or []) if a]
-            db[str(k).strip().lower()] = {"code": str(code), "display": str(display), "aliases": aliases}
-        return db, _alias_index(db)
+        db = read_snomed_file(path)
+        idx = _alias_index(db)
+        for op in read_journal(SNOMED_OPS):
+            apply_snomed_op(db, idx, op)
+        return db, idx
     except Exception:
         return {}, {}
\ No newline at end of file
@@ -0,0 +1,255 @@
+from __future__ import annotations
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import os, re, sys, threading, time
+
+from app.data.snomed_loader import get_snomed_db, read_snomed_file, _alias_index
+from app.data.loinc_loader import _load_alias_map, read_alias_file
+from app.extensions.canonical_loinc import _load_canonical, read_canonical_file
+
+_TENANTS_DIR = os.getenv("TENANTS_DIR", "data/tenants")
+_TENANT_CACHE_BYTES = int(float(os.getenv("TENANT_CACHE_MB", "256")) * 1024 * 1024)
+_TENANT_MISSING_MAX = int(os.getenv("TENANT_MISSING_MAX", "4096"))
+_TENANT_RECHECK_S = float(os.getenv("TENANT_RECHECK_S", "30"))
+_OVERLAY_FILES = ("snomed.json", "loinc_aliases.json", "loinc_canonical.json")
+_TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,63}$")
+
+
+def _approx_bytes(obj: Any) -> int:
+    """Rough deep size of the dict/list/str structures an overlay holds."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _approx_bytes(k) + _approx_bytes(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            size += _approx_bytes(v)
+    return size
+
+
+class TenantOverlay:
+    """One tenant's vocabulary layered copy-on-write over the shared base indexes.
+
+    Only the tenant's own entries are held; every read checks the overlay first and
+    falls through to the base, so the base is never copied or mutated.
+    """
+
+    def __init__(self, tenant: str, snomed_db: Dict[str, Dict[str, Any]],
+                 loinc_aliases: Dict[str, str], loinc_canonical: Dict[str, str]):
+        self.tenant = tenant
+        self.snomed_db = snomed_db
+        self.snomed_alias = _alias_index(snomed_db)
+        self.loinc_aliases = loinc_aliases
+        self.loinc_canonical = loinc_canonical
+        self.stamp: Optional[Tuple] = None
+        self.checked = 0.0
+        self.nbytes = (_approx_bytes(snomed_db) + _approx_bytes(self.snomed_alias)
+                       + _approx_bytes(loinc_aliases) + _approx_bytes(loinc_canonical))
+
+    def snomed_entry(self, term: str) -> Optional[Dict[str, Any]]:
+        pk = self.snomed_alias.get(term)
+        if pk is not None:
+            return self.snomed_db[pk]
+        db, alias_index = get_snomed_db()
+        pk = alias_index.get(term)
+        return db[pk] if pk else None
+
+    def loinc_key(self, term: str) -> str:
+        key = self.loinc_aliases.get(term)
+        if key is not None:
+            return key
+        return _load_alias_map().get(term, term)
+
+    def loinc_code(self, key: str) -> Optional[str]:
+        code = self.loinc_canonical.get(key)
+        if code is not None:
+            return code
+        return _load_canonical().get(key)
+
+
+def valid_tenant(tenant: Optional[str]) -> Optional[str]:
+    """Normalized tenant id, or None if absent/invalid (ids double as directory names)."""
+    t = (tenant or "").strip().lower()
+    return t if t and _TENANT_ID.match(t) else None
+
+def _overlay_stamp(tenant: str) -> Optional[Tuple]:
+    """(mtime_ns, size) of the tenant directory and each overlay file; None if the
+    directory does not exist. Any edit, add or delete changes the stamp."""
+    root = os.path.join(_TENANTS_DIR, tenant)
+    try:
+        st = os.stat(root)
+    except OSError:
+        return None
+    stamp = [st.st_mtime_ns]
+    for name in _OVERLAY_FILES:
+        try:
+            st = os.stat(os.path.join(root, name))
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def _read_overlay(tenant: str) -> Optional[TenantOverlay]:
+    root = os.path.join(_TENANTS_DIR, tenant)
+    stamp = _overlay_stamp(tenant)  # taken before reading: an edit mid-read reloads next time
+    if stamp is None or not os.path.isdir(root):
+        return None
+
+    def _read(name, reader):
+        p = os.path.join(root, name)
+        if not os.path.exists(p):
+            return {}
+        try:
+            return reader(p)
+        except Exception:
+            return {}
+
+    ov = TenantOverlay(
+        tenant,
+        _read("snomed.json", read_snomed_file),
+        _read("loinc_aliases.json", read_alias_file),
+        _read("loinc_canonical.json", read_canonical_file),
+    )
+    ov.stamp = stamp
+    return ov
+
+
+class TenantCache:
+    """LRU of loaded overlays bounded by approximate bytes (TENANT_CACHE_MB).
+
+    Tenants without a directory are remembered as misses (no overlay) in a separate
+    LRU capped at TENANT_MISSING_MAX entries, so unknown ids neither stat the
+    filesystem on every request nor grow the cache without bound. Both kinds of entry
+    are revalidated after TENANT_RECHECK_S: a miss is looked up again (picking up a
+    directory created later) and an overlay is reloaded only if its files' mtime/size
+    stamp changed. Loads and revalidations are single-flight per tenant.
+    """
+
+    def __init__(self, budget_bytes: int = _TENANT_CACHE_BYTES,
+                 missing_max: int = _TENANT_MISSING_MAX, recheck_s: float = _TENANT_RECHECK_S):
+        self.budget = budget_bytes
+        self.missing_max = missing_max
+        self.recheck_s = recheck_s
+        self._lru: "OrderedDict[str, TenantOverlay]" = OrderedDict()
+        self._missing: "OrderedDict[str, float]" = OrderedDict()  # tenant -> checked at
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Event] = {}
+        self.hits = self.misses = self.evictions = self.reloads = 0
+
+    def _fresh(self, checked: float) -> bool:
+        return time.monotonic() - checked < self.recheck_s
+
+    def peek(self, tenant: str) -> Tuple[bool, Optional[TenantOverlay]]:
+        """(cached?, overlay) without touching disk; refreshes LRU position on hit.
+        An entry due for revalidation reads as not cached."""
+        with self._lock:
+            ov = self._lru.get(tenant)
+            if ov is not None and self._fresh(ov.checked):
+                self._lru.move_to_end(tenant)
+                self.hits += 1
+                return True, ov
+            checked = self._missing.get(tenant)
+            if checked is not None and self._fresh(checked):
+                self._missing.move_to_end(tenant)
+                self.hits += 1
+                return True, None
+        return False, None
+
+    def get(self, tenant: str) -> Optional[TenantOverlay]:
+        """Cached overlay, loading or revalidating it (blocking) when due."""
+        cached, ov = self.peek(tenant)
+        if cached:
+            return ov
+        with self._lock:
+            ev = self._loading.get(tenant)
+            leader = ev is None
+            if leader:
+                ev = self._loading[tenant] = threading.Event()
+        if not leader:
+            ev.wait()
+            return self.peek(tenant)[1]
+        try:
+            return self._load(tenant)
+        finally:
+            with self._lock:
+                self._loading.pop(tenant, None)
+            ev.set()
+
+    def _load(self, tenant: str) -> Optional[TenantOverlay]:
+        with self._lock:
+            current = self._lru.get(tenant)
+        if current is not None and _overlay_stamp(tenant) == current.stamp:
+            with self._lock:
+                current.checked = time.monotonic()
+            return current
+        ov = _read_overlay(tenant)
+        with self._lock:
+            self.misses += 1
+            old = self._lru.pop(tenant, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+                self.reloads += 1
+            self._missing.pop(tenant, None)
+            if ov is None:
+                self._missing[tenant] = time.monotonic()
+                while len(self._missing) > self.missing_max:
+                    self._missing.popitem(last=False)
+                    self.evictions += 1
+            else:
+                ov.checked = time.monotonic()
+                self._lru[tenant] = ov
+                self._bytes += ov.nbytes
+                self._evict_locked(keep=tenant)
+        return ov
+
+    def _evict_locked(self, keep: str):
+        while self._bytes > self.budget and len(self._lru) > 1:
+            victim, ov = next(iter(self._lru.items()))
+            if victim == keep:
+                self._lru.move_to_end(victim)
+                continue
+            del self._lru[victim]
+            self._bytes -= ov.nbytes
+            self.evictions += 1
+
+    def invalidate(self, tenant: Optional[str] = None) -> int:
+        """Drop one tenant (or all); the next request reloads from disk. Returns the
+        number of entries dropped."""
+        with self._lock:
+            if tenant is None:
+                n = len(self._lru) + len(self._missing)
+                self._lru.clear()
+                self._missing.clear()
+                self._bytes = 0
+                return n
+            ov = self._lru.pop(tenant, None)
+            self._bytes -= ov.nbytes if ov else 0
+            return int(ov is not None) + int(self._missing.pop(tenant, None) is not None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tenants_cached": len(self._lru) + len(self._missing),
+                "overlays_loaded": len(self._lru),
+                "missing_cached": len(self._missing),
+                "missing_max": self.missing_max,
+                "recheck_s": self.recheck_s,
+                "bytes": self._bytes,
+                "budget_bytes": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+            }
+
+_cache: Optional[TenantCache] = None
+_cache_lock = threading.Lock()
+
+def get_tenant_cache() -> TenantCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TenantCache()
+    return _cache
@@ -3,25 +3,30 @@ from typing import Optional, Dict
 from functools import lru_cache
 import os, json
 
-def _norm(s: str) -> str:
-    return (s or "").strip().lower()
+from app.data.journal import read_journal, apply_loinc_canonical_op, LOINC_OPS, _norm
+from app.utils.single_flight import coalesced
+
+def read_canonical_file(path: str) -> Dict[str, str]:
+    """Parse one loinc_canonical.json-shaped file (canonical key -> LOINC code)."""
+    with open(path, "r", encoding="utf-8-sig") as f:  # <-- handles BOM
+        raw = json.load(f)
+    if not isinstance(raw, dict):
+        return {}
+    return {_norm(k): v.strip() for k, v in raw.items() if isinstance(v, str) and v.strip()}
 
 @lru_cache(maxsize=1)
+@coalesced("loinc_canonical")
 def _load_canonical() -> Dict[str, str]:
     """Load canonical key -> LOINC code from data/loinc_canonical.json.
-    Accepts UTF-8 with or without BOM; returns {} on problems."""
+    Accepts UTF-8 with or without BOM; replays loinc canonical ops from the
+    dataset journal; returns {} on problems."""
     path = os.getenv("LOINC_CANONICAL_JSON", "data/loinc_canonical.json")
     if not os.path.exists(path):
         return {}
     try:
-        with open(path, "r", encoding="utf-8-sig") as f:  # <-- handles BOM
-            raw = json.load(f)
-        if not isinstance(raw, dict):
-            return {}
-        out: Dict[str, str] = {}
-        for k, v in raw.items():
-            if isinstance(v, str) and v.strip():
-                out[_norm(k)] = v.strip()
+        out = read_canonical_file(path)
+        for op in read_journal(LOINC_OPS):
+            apply_loinc_canonical_op(out, op)
         return out
     except Exception:
         return {}
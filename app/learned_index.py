@@ -0,0 +1,151 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import base64, bisect, json, threading, time
+
+Pos = Tuple[str, str]  # (updated_utc, key): the listing order and the cursor
+
+
+def encode_cursor(pos: Pos) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(pos), separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Pos:
+    """Raises ValueError on anything encode_cursor() didn't produce."""
+    try:
+        updated, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(updated, str) or not isinstance(key, str):
+        raise ValueError("invalid cursor")
+    return updated, key
+
+def entry_code(e: Dict[str, Any]) -> Optional[str]:
+    code = e.get("snomed_code") or e.get("snomed")
+    return str(code) if code else None
+
+
+class LearnedIndex:
+    """Secondary indexes over the learned map ({"ctx::term": entry}).
+
+    Three posting lists of (updated_utc, key), each kept sorted: every entry, entries per
+    context (the key's prefix) and entries per SNOMED code. A query takes the smallest
+    list its filters allow, bisects to its start (the later of `since` and the cursor) and
+    walks forward, so a page costs O(log n + page), not a scan of the store. Ordering
+    by update time makes the cursor stable: inserts and deletes elsewhere never shift a
+    page, and an entry that changes moves past the cursor and is listed again.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        t0 = time.perf_counter()
+        self._lock = threading.RLock()
+        self._meta: Dict[str, Tuple[str, str, Optional[str]]] = {}  # key -> (updated, ctx, code)
+        self._all: List[Pos] = []
+        self._by_context: Dict[str, List[Pos]] = {}
+        self._by_code: Dict[str, List[Pos]] = {}
+        for key, e in data.items():
+            if isinstance(e, dict):
+                meta = self._fields(key, e)
+                self._meta[key] = meta
+                pos = (meta[0], key)
+                self._all.append(pos)
+                self._by_context.setdefault(meta[1], []).append(pos)
+                if meta[2]:
+                    self._by_code.setdefault(meta[2], []).append(pos)
+        self._all.sort()
+        for lists in (self._by_context, self._by_code):
+            for lst in lists.values():
+                lst.sort()
+        self.build_ms = round((time.perf_counter() - t0) * 1000, 2)
+        self.updates = 0
+
+    @staticmethod
+    def _fields(key: str, e: Dict[str, Any]) -> Tuple[str, str, Optional[str]]:
+        ctx = key.split("::", 1)[0] if "::" in key else "global"
+        return str(e.get("updated_utc") or ""), ctx, entry_code(e)
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    # ---- maintenance ------------------------------------------------------------
+
+    @staticmethod
+    def _insert(lists: Dict[str, List[Pos]], name: Optional[str], pos: Pos):
+        if name:
+            bisect.insort(lists.setdefault(name, []), pos)
+
+    @staticmethod
+    def _delete(lists: Dict[str, List[Pos]], name: Optional[str], pos: Pos):
+        lst = lists.get(name) if name else None
+        if lst is None:
+            return
+        i = bisect.bisect_left(lst, pos)
+        if i < len(lst) and lst[i] == pos:
+            del lst[i]
+        if not lst:
+            del lists[name]
+
+    def update(self, key: str, entry: Optional[Dict[str, Any]]):
+        """Apply one key's new value (None = removed)."""
+        with self._lock:
+            old = self._meta.pop(key, None)
+            if old is not None:
+                pos = (old[0], key)
+                i = bisect.bisect_left(self._all, pos)
+                if i < len(self._all) and self._all[i] == pos:
+                    del self._all[i]
+                self._delete(self._by_context, old[1], pos)
+                self._delete(self._by_code, old[2], pos)
+            if isinstance(entry, dict):
+                meta = self._fields(key, entry)
+                self._meta[key] = meta
+                pos = (meta[0], key)
+                bisect.insort(self._all, pos)
+                self._insert(self._by_context, meta[1], pos)
+                self._insert(self._by_code, meta[2], pos)
+            self.updates += 1
+
+    # ---- queries ----------------------------------------------------------------
+
+    def _iter(self, context: Optional[str], code: Optional[str], since: Optional[str],
+              after: Optional[Pos]) -> Iterator[Pos]:
+        if context is not None:
+            context = context.strip().lower() or "global"
+        lists = []
+        if context is not None:
+            lists.append(self._by_context.get(context, []))
+        if code is not None:
+            lists.append(self._by_code.get(code, []))
+        driver = min(lists, key=len) if lists else self._all
+        i = bisect.bisect_left(driver, (since, "")) if since else 0
+        if after is not None:
+            i = max(i, bisect.bisect_right(driver, after))
+        for pos in _walk(driver, i):
+            _, ctx, c = self._meta[pos[1]]
+            if (context is None or ctx == context) and (code is None or c == code):
+                yield pos
+
+    def query(self, context: Optional[str] = None, code: Optional[str] = None, since: Optional[str] = None,
+              after: Optional[Pos] = None, limit: Optional[int] = None) -> Tuple[List[str], Optional[Pos]]:
+        """Keys matching every given filter with updated_utc >= since, after the cursor
+        position, oldest update first. Returns (keys, position of the last key) where
+        the position is None once there are no more matches."""
+        with self._lock:
+            out: List[Pos] = []
+            more = False
+            for pos in self._iter(context, code, since, after):
+                if limit is not None and len(out) >= limit:
+                    more = True
+                    break
+                out.append(pos)
+        return [k for _, k in out], (out[-1] if more else None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._meta), "contexts": len(self._by_context), "codes": len(self._by_code),
+                    "build_ms": self.build_ms, "updates": self.updates}
+
+
+def _walk(lst: List[Pos], i: int) -> Iterator[Pos]:
+    """lst[i:] without copying the tail (queries usually stop after one page)."""
+    while i < len(lst):
+        yield lst[i]
+        i += 1
@@ -1,10 +1,15 @@
 from __future__ import annotations
-import json, os, datetime, threading
-from typing import Optional, Dict, Any
+import json, os, datetime, threading, time
+from typing import Optional, Dict, Any, List
+
+from app.learned_index import LearnedIndex, Pos
+from app.utils.audit_log import AuditLog, get_audit_log
+from app.utils.profiling import StageTimer
 
 _LEARNED_PATH = os.getenv("LEARNED_JSON", "data/layman_learned.json")
 _LOG_DIR = os.getenv("LEARNED_LOG_DIR", "data/logs/learned")
 _LOCK = threading.RLock()
+_POLL_S = int(os.getenv("LEARNED_POLL_MS", "1000")) / 1000.0
 
 def _ensure_dirs():
     os.makedirs(os.path.dirname(_LEARNED_PATH) or ".", exist_ok=True)
@@ -19,19 +24,17 @@ def _load_json(path: str) -> dict:
         except json.JSONDecodeError:
             return {}
 
-def _dump_json(path: str, data: dict):
+def _dump_json(path: str, data: dict, durable: bool = False):
     tmp = path + ".tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
     os.replace(tmp, path)
 
-def _today_log_path() -> str:
-    today = datetime.datetime.utcnow().strftime("%Y-%m-%d")
-    return os.path.join(_LOG_DIR, f"{today}.jsonl")
-
-def _append_jsonl(path: str, row: Dict[str, Any]):
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+def _audit() -> AuditLog:
+    return get_audit_log(_LOG_DIR)
 
 def _ns_key(context: Optional[str], term: str) -> str:
     ctx = (context or "global").strip().lower()
@@ -43,12 +46,17 @@ def learn_selection(
     snomed_display: Optional[str],
     lay_text: Optional[str],
     context: Optional[str] = None,
+    timer: Optional[StageTimer] = None,
 ) -> Dict[str, Any]:
     """Persist a selection into namespaced learned map and JSONL log."""
     assert term, "term required"
     _ensure_dirs()
     with _LOCK:
-        data = _load_json(_LEARNED_PATH)
+        if timer:
+            timer.mark("lock_wait")
+        data, fresh = _load_for_write()
+        if timer:
+            timer.mark("load_learned")
         key = _ns_key(context, term)
         entry = {
             "term": term,
@@ -60,6 +68,9 @@ def learn_selection(
         }
         data[key] = entry
         _dump_json(_LEARNED_PATH, data)
+        _set_snapshot(data, [key] if fresh else None)
+        if timer:
+            timer.mark("write_learned")
 
         log_row = {
             "ts": datetime.datetime.utcnow().isoformat() + "Z",
@@ -70,11 +81,181 @@ def learn_selection(
             "snomed_display": snomed_display,
             "lay_text": lay_text or term,
         }
-        _append_jsonl(_today_log_path(), log_row)
+        _audit().append(log_row)
+        if timer:
+            timer.mark("audit_append")
 
         return {"ok": True, "key": key, "entry": entry}
 
+_COMPARED = ("snomed_code", "snomed_display", "lay_text")
+
+def learn_selections(items: List[Dict[str, Any]], dry_run: bool = False) -> Dict[str, Any]:
+    """Apply many selections under one lock: one load, one durable write of the learned
+    map and one audit append. Items are dicts with learn_selection()'s keyword names.
+    Each gets an action: insert (new key), update (changed) or noop (identical); later
+    items see earlier ones. With dry_run nothing is written."""
+    _ensure_dirs()
+    with _LOCK:
+        data, fresh = _load_for_write()
+        now = datetime.datetime.utcnow().isoformat() + "Z"
+        results: List[Dict[str, Any]] = []
+        log_rows: List[Dict[str, Any]] = []
+        counts = {"insert": 0, "update": 0, "noop": 0}
+        for i, it in enumerate(items):
+            term = it["term"]
+            context = it.get("context")
+            key = _ns_key(context, term)
+            entry = {
+                "term": term,
+                "context": (context or "global"),
+                "snomed_code": it.get("snomed_code"),
+                "snomed_display": it.get("snomed_display"),
+                "lay_text": it.get("lay_text") or term,
+                "updated_utc": now,
+            }
+            old = data.get(key)
+            if old is None:
+                action = "insert"
+            elif all(old.get(f) == entry[f] for f in _COMPARED):
+                action = "noop"
+            else:
+                action = "update"
+            counts[action] += 1
+            results.append({"index": i, "key": key, "action": action})
+            if action == "noop":
+                continue
+            data[key] = entry
+            log_rows.append({
+                "ts": now,
+                "action": "api_learn_batch",
+                "term": term,
+                "context": entry["context"],
+                "snomed_code": entry["snomed_code"],
+                "snomed_display": entry["snomed_display"],
+                "lay_text": entry["lay_text"],
+            })
+        if not dry_run and log_rows:
+            _dump_json(_LEARNED_PATH, data, durable=True)
+            _set_snapshot(data, [r["key"] for r in results if r["action"] != "noop"] if fresh else None)
+            _audit().append_many(log_rows)
+        return {"ok": True, "dry_run": dry_run, "count": len(results), **counts, "items": results}
+
+def learned_path() -> str:
+    return _LEARNED_PATH
+
+def load_learned() -> Dict[str, Any]:
+    """The whole namespaced learned map ({"ctx::term": entry}); {} if absent or invalid."""
+    return _load_json(_LEARNED_PATH)
+
+# ---- Read snapshot for /lookup (learned overlay) -----------------------------------
+# Writers in this process swap the snapshot directly; other workers' writes are
+# picked up by a stat of the file at most every LEARNED_POLL_MS.
+
+_snapshot: Optional[Dict[str, Any]] = None
+_snapshot_stat = (0, 0)
+_snapshot_checked = 0.0
+_index: Optional[LearnedIndex] = None
+_index_of: Optional[Dict[str, Any]] = None  # the snapshot _index describes
+
+def _learned_stat():
+    try:
+        st = os.stat(_LEARNED_PATH)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return 0, 0
+
+def _load_for_write():
+    """(store, fresh) for a writer holding _LOCK. fresh: the snapshot already matches the
+    file, so _set_snapshot() can patch the index with just the changed keys."""
+    fresh = _snapshot is not None and _learned_stat() == _snapshot_stat
+    return _load_json(_LEARNED_PATH), fresh
+
+def _set_snapshot(data: Dict[str, Any], changed: Optional[List[str]] = None):
+    """Swap in a new snapshot. With `changed` (keys written since the current snapshot)
+    the index is patched in place; otherwise it is rebuilt on next use."""
+    global _snapshot, _snapshot_stat, _snapshot_checked, _index, _index_of
+    if _index is not None and changed is not None and _index_of is _snapshot:
+        for k in changed:
+            _index.update(k, data.get(k))
+        _index_of = data
+    else:
+        _index = _index_of = None
+    _snapshot, _snapshot_stat, _snapshot_checked = data, _learned_stat(), time.monotonic()
+
+def learned_snapshot() -> Dict[str, Any]:
+    """In-memory learned map for reads; callers must not mutate it."""
+    global _snapshot_checked
+    now = time.monotonic()
+    if _snapshot is not None and now - _snapshot_checked < _POLL_S:
+        return _snapshot
+    _snapshot_checked = now
+    if _snapshot is None or _learned_stat() != _snapshot_stat:
+        with _LOCK:
+            _set_snapshot(_load_json(_LEARNED_PATH))
+    return _snapshot
+
 def get_learned(context: Optional[str], term: str) -> Optional[Dict[str, Any]]:
     key = _ns_key(context, term)
     data = _load_json(_LEARNED_PATH)
     return data.get(key)
+
+# ---- Indexed listing / bulk unlearn -------------------------------------------------
+
+def learned_index() -> LearnedIndex:
+    """Secondary indexes (context, code, updated time) over the current snapshot. Built
+    once per snapshot read from disk; this process's writes patch it per key."""
+    global _index, _index_of
+    snap = learned_snapshot()
+    if _index is None or _index_of is not snap:
+        with _LOCK:
+            snap = learned_snapshot()
+            if _index is None or _index_of is not snap:
+                _index, _index_of = LearnedIndex(snap), snap
+    return _index
+
+def list_learned(context: Optional[str] = None, code: Optional[str] = None, since: Optional[str] = None,
+                 after: Optional[Pos] = None, limit: int = 100) -> Dict[str, Any]:
+    """One page of learned entries (oldest update first) plus the position to resume after."""
+    index = learned_index()
+    keys, last = index.query(context=context, code=code, since=since, after=after, limit=limit)
+    snap = learned_snapshot()  # a key removed in between is skipped
+    return {"items": [{"key": k, **snap[k]} for k in keys if k in snap], "last": last}
+
+def unlearn_selections(keys: Optional[List[str]] = None, context: Optional[str] = None,
+                       code: Optional[str] = None, since: Optional[str] = None,
+                       dry_run: bool = False) -> Dict[str, Any]:
+    """Remove every entry in `keys` plus every entry matching all of context / code /
+    since, under one lock: one durable write and one audit append. Raises ValueError
+    without any selector (an unfiltered call would wipe the store)."""
+    if not keys and context is None and code is None and since is None:
+        raise ValueError("give keys or at least one of context, code, since")
+    with _LOCK:
+        data, fresh = _load_for_write()
+        if not fresh:
+            _set_snapshot(data)
+            data = dict(data)  # readers may hold the snapshot; edit a copy
+        selected: List[str] = []
+        if context is not None or code is not None or since is not None:
+            selected, _ = learned_index().query(context=context, code=code, since=since)
+        seen = set(selected)
+        removed = selected + [k for k in dict.fromkeys(keys or []) if k in data and k not in seen]
+        if dry_run or not removed:
+            return {"ok": True, "dry_run": dry_run, "count": len(removed), "keys": removed}
+        now = datetime.datetime.utcnow().isoformat() + "Z"
+        log_rows = []
+        for k in removed:
+            e = data.pop(k)
+            log_rows.append({
+                "ts": now,
+                "action": "api_unlearn_batch",
+                "term": e.get("term") or k.split("::", 1)[-1],
+                "context": e.get("context") or k.split("::", 1)[0],
+                "snomed_code": e.get("snomed_code"),
+            })
+        _dump_json(_LEARNED_PATH, data, durable=True)
+        _set_snapshot(data, removed)
+        _audit().append_many(log_rows)
+        return {"ok": True, "dry_run": False, "count": len(removed), "keys": removed}
+
+def learned_index_stats() -> Optional[Dict[str, Any]]:
+    return _index.stats() if _index is not None else None
@@ -1,18 +1,34 @@
 from __future__ import annotations
-from fastapi import FastAPI, Query, Body
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Query, Body, Request, Depends, Header
+from fastapi.responses import RedirectResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
-from app.learning import learn_selection
-from app.extensions.canonical_loinc import choose as choose_loinc
+from app.learning import learn_selection, learn_selections, list_learned, unlearn_selections, learned_index_stats
+from app.learned_index import encode_cursor, decode_cursor
+from app.resolver import lookup_response, ensure_indexes, tenant_overlay, coalesced_lookup, parse_fields
+from app.utils.io_executor import run_cpu, run_io
 from app.data.snomed_loader import get_snomed_db  # reads data/snomed.json
-from app.data.loinc_loader import normalize_loinc_term
-import os, json
+from app.utils.ndjson_stream import translate_ndjson, NDJSONStreamingResponse
+from app.utils.miss_tracker import get_miss_tracker
+from app.middleware.admission import AdmissionControlMiddleware, admission_metrics
+from app.data.live_index import apply_ops, fold_journal, journal_status
+from app.data.tenants import get_tenant_cache, valid_tenant
+from app.utils.admin import require_admin, is_admin
+from app.utils.profiling import StageTimer, cprofile_call, sample_stacks
+from app.data.code_index import lookup_code, validate_code, resolve_system, SNOMED_SYSTEM
+from app.data.code_systems import get_registry, allowed_systems
+from app.utils.single_flight import single_flight_stats
+from app.utils.lookup_cache import get_lookup_cache
+from app.utils.audit_log import audit_log_stats, close_audit_logs
+from app.utils.fhir_export import iter_resources, stream_bundle, EXPORT_PAGE_ROWS
+from app.data.snomed_hierarchy import get_snomed_hierarchy
+import os, re, json, asyncio, itertools
 
 
 
 app = FastAPI(title="Akashic Lookup API")
+app.add_middleware(AdmissionControlMiddleware)
 
 @app.get("/", include_in_schema=False)
 def root():
@@ -62,25 +78,29 @@ def readyz():
         }
     }
 
+@app.on_event("shutdown")
+def _persist_misses():
+    get_miss_tracker().persist()
+
+@app.on_event("shutdown")
+def _close_audit_logs():
+    close_audit_logs()
+
+@app.get("/api/metrics")
+def metrics():
+    return {"ok": True, "admission": admission_metrics(), "tenants": get_tenant_cache().stats(),
+            "code_systems": get_registry().stats(), "single_flight": single_flight_stats(),
+            "lookup_cache": get_lookup_cache().stats(), "audit_log": audit_log_stats(),
+            "learned_index": learned_index_stats()}
+
 @app.get("/version")
 def version():
     sha = os.getenv("GITHUB_SHA") or os.getenv("COMMIT_SHA") or "local"
     return {"version": sha}
 
 
-class LookupResult(BaseModel):
-    term: str
-    aliases: List[str] = []
-    loinc: Optional[str] = None
-    snomed: Optional[str] = None
-    score: int = 0
-    patient_view: Optional[str] = None
-    practitioner_view: Optional[str] = None
-    practitioner_options: Dict[str, Any] = {}
-    codeable_concept: Dict[str, Any] = {}
-
 @app.get("/lookup")
-def lookup(
+async def lookup(
     query: str = Query(...),
     domain: str = "auto",
     include_technical: bool = False,
@@ -88,45 +108,103 @@ def lookup(
     score_cutoff: int = 70,
     tech_top_k: int = 8,
     tech_score_cutoff: int = 60,
+    context: Optional[str] = None,
+    tenant: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: Optional[str] = None,
+    profile: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+    x_akashic_tenant: Optional[str] = Header(None),
 ):
-    term = (query or "").strip().lower()
-    result = LookupResult(term=term)
+    try:
+        wanted = parse_fields(fields, format)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+    kwargs = dict(
+        domain=domain,
+        include_technical=include_technical,
+        top_k=top_k,
+        score_cutoff=score_cutoff,
+        tech_top_k=tech_top_k,
+        tech_score_cutoff=tech_score_cutoff,
+        context=context,
+        fields=wanted,
+    )
+    if profile:
+        return await _profiled_lookup(query, profile, x_admin_token, tenant or x_akashic_tenant, kwargs)
+    # Fast path stays on the event loop: pure in-memory dict reads. Only a cold or
+    # cleared index awaits the single-flight loader (file I/O on the I/O executor).
+    await ensure_indexes(allowed_systems(context, domain))
+    overlay = await tenant_overlay(tenant or x_akashic_tenant)
+    return await coalesced_lookup(query, tenant or x_akashic_tenant, overlay, **kwargs)
 
-    # Deterministic SNOMED from data/snomed.json (no fuzzy)
-    db, alias_index = get_snomed_db()
-    pk = alias_index.get(term)
-    if pk:
-        entry = db[pk]
-        snomed_code = entry["code"]
-        snomed_display = entry["display"]
-        result.snomed = snomed_code
-        result.score = 100
-        result.patient_view = f"{term} ({snomed_display})"
-        result.practitioner_view = f"{snomed_display} ({term})"
-        result.practitioner_options = {
-            "snomed": [
-                {"code": snomed_code, "display": snomed_display, "score": 100, "selected": True}
-            ]
-        }
-        result.codeable_concept = {
-            "coding": [
-                {"system": "http://snomed.info/sct", "code": snomed_code, "display": snomed_display}
-            ],
-            "text": term,
-        }
+def _check_profile(profile: str, token: Optional[str]) -> Optional[JSONResponse]:
+    if not is_admin(token):
+        return JSONResponse(status_code=403, content={"ok": False, "error": "profiling requires X-Admin-Token"})
+    if profile not in ("1", "stages", "cprofile"):
+        return JSONResponse(status_code=400, content={"ok": False, "error": "profile must be 1|stages|cprofile"})
+    return None
 
-    # Canonical LOINC still applies independently (for labs)
-    loinc_key = normalize_loinc_term(term)   
-    result.loinc = choose_loinc(loinc_key)
+async def _profiled_lookup(query: str, profile: str, token: Optional[str], tenant: Optional[str],
+                           kwargs: Dict[str, Any]):
+    """Uncached lookup_response() under a StageTimer or cProfile, run on the CPU executor
+    (the profiler wraps the worker thread, never the event loop)."""
+    denied = _check_profile(profile, token)
+    if denied:
+        return denied
+    systems = allowed_systems(kwargs["context"], kwargs["domain"])
+    if profile == "cprofile":
+        await ensure_indexes(systems)
+        overlay = await tenant_overlay(tenant)
+        body, report = await run_cpu(cprofile_call, lookup_response, query, overlay=overlay, **kwargs)
+    else:
+        timer = StageTimer()
+        await ensure_indexes(systems)
+        timer.mark("ensure_indexes")
+        overlay = await tenant_overlay(tenant)
+        timer.mark("tenant_overlay")
+        body = await run_cpu(lookup_response, query, timer=timer, overlay=overlay, **kwargs)
+        report = timer.report()
+    body["profile"] = report
+    return body
 
-    return {
-        "ok": True,
-        "query": term,
-        "domain": domain,
-        "count": 1 if (result.snomed or result.loinc) else 0,
-        "results": [result.model_dump()],
-        "include_technical": include_technical,
-    }
+@app.post("/api/translate/stream")
+async def translate_stream(
+    request: Request,
+    skip: int = 0,
+    progress_every: int = 1000,
+    tenant: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: Optional[str] = None,
+    x_akashic_tenant: Optional[str] = Header(None),
+):
+    """NDJSON in, NDJSON out: one /lookup result per input line, plus progress/error records.
+    `fields` / `format=minimal` trim every result as on /lookup."""
+    try:
+        wanted = parse_fields(fields, format)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+    await ensure_indexes()
+    tenant = tenant or x_akashic_tenant
+    overlay = await tenant_overlay(tenant)
+
+    async def resolve(query: str, domain: str = "auto", include_technical: bool = False,
+                      context: Optional[str] = None, top_k: int = 5, score_cutoff: int = 70,
+                      tech_top_k: int = 8, tech_score_cutoff: int = 60):
+        # Same path and kwargs as /lookup, so lines share its cache and coalescing.
+        await ensure_indexes(allowed_systems(context, domain))
+        return await coalesced_lookup(query, tenant, overlay, domain=domain, include_technical=include_technical,
+                                      top_k=top_k, score_cutoff=score_cutoff, tech_top_k=tech_top_k,
+                                      tech_score_cutoff=tech_score_cutoff, context=context, fields=wanted)
+    return NDJSONStreamingResponse(
+        translate_ndjson(request.stream(), resolve, skip=skip, progress_every=progress_every)
+    )
+
+@app.get("/api/misses/top")
+def misses_top(n: int = 50, context: Optional[str] = None):
+    """Most frequent /lookup misses (context::term) across workers, with Space-Saving
+    error bounds: true count lies in [min_count, count]."""
+    return {"ok": True, **get_miss_tracker().top(n=n, context=context)}
 
 class CommitPayload(BaseModel):
     term: str
@@ -137,14 +215,340 @@ class CommitPayload(BaseModel):
     context: Optional[str] = None
 
 @app.post("/api/commit_selection")
-def commit_selection(payload: CommitPayload = Body(...)):
+async def commit_selection(
+    payload: CommitPayload = Body(...),
+    profile: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
     if payload.dry_run:
         return {"ok": True, "preview": True, "action": "preview", "payload": payload.model_dump()}
-    res = learn_selection(
+    kwargs = dict(
         term=payload.term,
         snomed_code=payload.code,
-        snomed_display=payload.display, 
+        snomed_display=payload.display,
         lay_text=payload.lay_text or payload.term,
         context=payload.context,
     )
-    return {"ok": True, "preview": False, "result": res} 
\ No newline at end of file
+    if not profile:
+        res = await run_io(learn_selection, **kwargs)
+        return {"ok": True, "preview": False, "result": res}
+    denied = _check_profile(profile, x_admin_token)
+    if denied:
+        return denied
+    if profile == "cprofile":
+        res, report = await run_io(cprofile_call, learn_selection, **kwargs)
+    else:
+        timer = StageTimer()
+        res = await run_io(learn_selection, timer=timer, **kwargs)
+        report = timer.report()
+    return {"ok": True, "preview": False, "result": res, "profile": report}
+
+
+_COMMIT_BATCH_MAX = int(os.getenv("COMMIT_BATCH_MAX", "10000"))
+_SCTID = re.compile(r"^\d{6,18}$")
+
+def _commit_item_errors(it: CommitPayload) -> List[str]:
+    errors = []
+    if not it.term.strip():
+        errors.append("term is required")
+    if not _SCTID.match((it.code or "").strip()):
+        errors.append("code must be a SNOMED CT id (6-18 digits)")
+    if not (it.display or "").strip():
+        errors.append("display is required")
+    return errors
+
+class CommitBatchPayload(BaseModel):
+    items: List[CommitPayload] = []
+    dry_run: bool = False  # whole batch; per-item dry_run is ignored here
+    strict: bool = False  # any invalid item rejects the whole batch
+
+@app.post("/api/commit_selection/batch")
+async def commit_selection_batch(payload: CommitBatchPayload = Body(...)):
+    """Many selections in one lock / one durable write / one audit append, with a
+    per-item insert|update|noop action. Invalid items get action "error" with their
+    reasons and the valid ones are still applied, unless `strict` is set: then any
+    invalid item rejects the batch with 400 and nothing is written."""
+    if len(payload.items) > _COMMIT_BATCH_MAX:
+        return JSONResponse(status_code=413, content={
+            "ok": False, "error": f"too many items (max {_COMMIT_BATCH_MAX})",
+        })
+    errors = {i: e for i, e in ((i, _commit_item_errors(it)) for i, it in enumerate(payload.items)) if e}
+    if errors and payload.strict:
+        return JSONResponse(status_code=400, content={
+            "ok": False, "error": "invalid items", "items": sorted(errors),
+            "errors": [{"index": i, "errors": e} for i, e in sorted(errors.items())],
+        })
+    valid = [i for i in range(len(payload.items)) if i not in errors]
+    items = [dict(
+        term=it.term,
+        snomed_code=it.code.strip(),
+        snomed_display=it.display.strip(),
+        lay_text=it.lay_text or it.term,
+        context=it.context,
+    ) for it in (payload.items[i] for i in valid)]
+    res = await run_io(learn_selections, items, payload.dry_run)
+    for r in res["items"]:
+        r["index"] = valid[r["index"]]
+    res["items"] = sorted(res["items"] + [{"index": i, "action": "error", "errors": e} for i, e in errors.items()],
+                          key=lambda r: r["index"])
+    res["count"] = len(payload.items)
+    res["error"] = len(errors)
+    return res
+
+# ---- Learned store: indexed listing / bulk unlearn ---------------------------
+
+_LEARNED_PAGE_MAX = int(os.getenv("LEARNED_PAGE_MAX", "1000"))
+
+@app.get("/api/learned")
+def learned_list(
+    context: Optional[str] = None,
+    code: Optional[str] = None,
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1),
+):
+    """Learned entries filtered by context, SNOMED code and/or updated_utc >= since,
+    oldest update first. Pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+    page = list_learned(context=context, code=code, since=since, after=after,
+                        limit=min(limit, _LEARNED_PAGE_MAX))
+    return {"ok": True, "count": len(page["items"]), "items": page["items"],
+            "next_cursor": encode_cursor(page["last"]) if page["last"] else None}
+
+class UnlearnPayload(BaseModel):
+    keys: List[str] = []  # exact "context::term" keys
+    context: Optional[str] = None
+    code: Optional[str] = None
+    since: Optional[str] = None
+    dry_run: bool = False
+
+@app.post("/api/learned/unlearn", dependencies=[Depends(require_admin)])
+async def learned_unlearn(payload: UnlearnPayload = Body(...)):
+    """Remove the listed keys plus every entry matching all given filters, in one write."""
+    try:
+        return await run_io(unlearn_selections, keys=payload.keys, context=payload.context,
+                            code=payload.code, since=payload.since, dry_run=payload.dry_run)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+
+# ---- Code lookup / validation (FHIR CodeSystem operations) ------------------
+
+def _operation_outcome(status: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={
+        "resourceType": "OperationOutcome",
+        "issue": [{"severity": "error", "code": code, "diagnostics": message}],
+    })
+
+def _parameters(params: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"resourceType": "Parameters", "parameter": params}
+
+@app.get("/fhir/CodeSystem/$lookup")
+def fhir_lookup(system: str = Query(...), code: str = Query(...)):
+    uri = resolve_system(system)
+    if uri is None:
+        return _operation_outcome(400, "not-supported", f"Unknown code system '{system}'")
+    rec = lookup_code(uri, code)
+    if rec is None:
+        return _operation_outcome(404, "not-found", f"Unknown code '{code}' in {uri}")
+    params: List[Dict[str, Any]] = [
+        {"name": "name", "valueString": "SNOMED CT" if "snomed" in uri else "LOINC"},
+        {"name": "display", "valueString": rec["display"]},
+        {"name": "designation", "part": [
+            {"name": "use", "valueCoding": {"code": "primary"}},
+            {"name": "value", "valueString": rec["term"]},
+        ]},
+    ]
+    for a in rec["aliases"]:
+        params.append({"name": "designation", "part": [
+            {"name": "use", "valueCoding": {"code": "alias"}},
+            {"name": "value", "valueString": a},
+        ]})
+    return _parameters(params)
+
+@app.get("/fhir/CodeSystem/$validate-code")
+def fhir_validate_code(system: str = Query(...), code: str = Query(...), display: Optional[str] = None):
+    res = validate_code(system, code, display)
+    params: List[Dict[str, Any]] = [{"name": "result", "valueBoolean": res["result"]}]
+    if res.get("display"):
+        params.append({"name": "display", "valueString": res["display"]})
+    if res.get("message"):
+        params.append({"name": "message", "valueString": res["message"]})
+    return _parameters(params)
+
+def _hierarchy_code(h, code_or_term: str) -> Optional[str]:
+    """A SNOMED code in the hierarchy; lay/primary terms resolve through the SNOMED db."""
+    c = (code_or_term or "").strip()
+    if c in h:
+        return c
+    db, alias_index = get_snomed_db()
+    pk = alias_index.get(c.lower())
+    return db[pk]["code"] if pk and db[pk]["code"] in h else None
+
+@app.get("/fhir/CodeSystem/$subsumes")
+def fhir_subsumes(codeA: str = Query(...), codeB: str = Query(...), system: str = "http://snomed.info/sct"):
+    if resolve_system(system) != SNOMED_SYSTEM:
+        return _operation_outcome(400, "not-supported", f"$subsumes is only supported for {SNOMED_SYSTEM}")
+    h = get_snomed_hierarchy()
+    if h is None:
+        return _operation_outcome(503, "not-supported", "No SNOMED is-a hierarchy loaded (SNOMED_ISA)")
+    a, b = _hierarchy_code(h, codeA), _hierarchy_code(h, codeB)
+    if a is None or b is None:
+        return _operation_outcome(404, "not-found", f"Unknown code '{codeA if a is None else codeB}'")
+    if a == b:
+        outcome = "equivalent"
+    elif h.subsumes(a, b):
+        outcome = "subsumes"
+    elif h.subsumes(b, a):
+        outcome = "subsumed-by"
+    else:
+        outcome = "not-subsumed"
+    return _parameters([{"name": "outcome", "valueCode": outcome}])
+
+_VALIDATE_BATCH_MAX = int(os.getenv("VALIDATE_BATCH_MAX", "50000"))
+
+class CodeRef(BaseModel):
+    code: str
+    system: Optional[str] = None
+    display: Optional[str] = None
+
+class ValidateBatchPayload(BaseModel):
+    system: Optional[str] = None  # default for items that omit it
+    codes: List[CodeRef] = []
+
+@app.post("/api/codes/validate")
+def validate_codes(payload: ValidateBatchPayload = Body(...)):
+    if len(payload.codes) > _VALIDATE_BATCH_MAX:
+        return JSONResponse(status_code=413, content={
+            "ok": False, "error": f"too many codes (max {_VALIDATE_BATCH_MAX})",
+        })
+    results = [validate_code(c.system or payload.system, c.code, c.display) for c in payload.codes]
+    valid = sum(1 for r in results if r["result"])
+    return {"ok": True, "count": len(results), "valid": valid, "invalid": len(results) - valid, "results": results}
+
+
+
+# ---- FHIR export ----------------------------------------------------------------
+
+_EXPORT_MEDIA = {"json": "application/fhir+json", "ndjson": "application/fhir+ndjson"}
+
+def _export(kind: str, request: Request, context: Optional[str], format: str,
+            cursor: Optional[str], limit: int):
+    if format not in _EXPORT_MEDIA:
+        return JSONResponse(status_code=400, content={"ok": False, "error": "format must be json|ndjson"})
+    try:
+        resources = iter_resources(kind, context=context, cursor=cursor, limit=max(0, limit))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+    next_url = lambda c: str(request.url.include_query_params(cursor=c))
+    # Sync generator: Starlette iterates it in the threadpool, off the event loop.
+    return StreamingResponse(stream_bundle(resources, format, next_url), media_type=_EXPORT_MEDIA[format])
+
+@app.get("/api/export/conceptmap")
+def export_conceptmap(request: Request, context: Optional[str] = None, format: str = "json",
+                      cursor: Optional[str] = None, limit: int = EXPORT_PAGE_ROWS):
+    """Lay term -> SNOMED/LOINC mappings (learned store, then base terminologies) as a
+    Bundle of ConceptMaps; follow the `next` link (cursor) for the following page."""
+    return _export("conceptmap", request, context, format, cursor, limit)
+
+@app.get("/api/export/valueset")
+def export_valueset(request: Request, context: Optional[str] = None, format: str = "json",
+                    cursor: Optional[str] = None, limit: int = EXPORT_PAGE_ROWS):
+    """Codes with displays and lay-term designations as a Bundle of ValueSets."""
+    return _export("valueset", request, context, format, cursor, limit)
+
+
+# ---- SNOMED hierarchy -------------------------------------------------------------
+
+def _hierarchy_or_error():
+    h = get_snomed_hierarchy()
+    if h is None:
+        return None, JSONResponse(status_code=503, content={
+            "ok": False, "error": "no SNOMED is-a hierarchy loaded (SNOMED_ISA)",
+        })
+    return h, None
+
+@app.get("/api/snomed/hierarchy")
+def snomed_hierarchy_stats():
+    """Closure size and memory."""
+    h, err = _hierarchy_or_error()
+    return err or {"ok": True, **h.stats()}
+
+@app.get("/api/snomed/hierarchy/subsumes")
+def snomed_subsumes(a: str = Query(...), b: str = Query(...)):
+    """Is b a kind of a? Codes or SNOMED terms, e.g. a=49601007 (cardiovascular disorder)."""
+    h, err = _hierarchy_or_error()
+    if err:
+        return err
+    ca, cb = _hierarchy_code(h, a), _hierarchy_code(h, b)
+    if ca is None or cb is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": f"unknown code '{a if ca is None else b}'"})
+    return {"ok": True, "a": ca, "b": cb, "subsumes": h.subsumes(ca, cb)}
+
+@app.get("/api/snomed/hierarchy/ancestors")
+def snomed_ancestors(code: str = Query(...)):
+    h, err = _hierarchy_or_error()
+    if err:
+        return err
+    c = _hierarchy_code(h, code)
+    if c is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": f"unknown code '{code}'"})
+    anc = h.ancestors(c)
+    return {"ok": True, "code": c, "parents": h.parents(c), "count": len(anc), "ancestors": anc}
+
+@app.get("/api/snomed/hierarchy/descendants")
+def snomed_descendants(code: str = Query(...), limit: int = 1000):
+    h, err = _hierarchy_or_error()
+    if err:
+        return err
+    c = _hierarchy_code(h, code)
+    if c is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": f"unknown code '{code}'"})
+    total = h.descendant_count(c)
+    out = list(itertools.islice(h.descendants(c), max(0, limit)))
+    return {"ok": True, "code": c, "count": total, "truncated": total > len(out), "descendants": out}
+
+# ---- Live dataset edits (admin) ----------------------------------------------
+
+class DatasetOpsPayload(BaseModel):
+    ops: List[Dict[str, Any]] = []
+
+@app.post("/api/admin/dataset/ops", dependencies=[Depends(require_admin)])
+async def dataset_ops(payload: DatasetOpsPayload = Body(...)):
+    """Apply snomed.* / loinc.* alias and concept ops to the live indexes and journal them."""
+    try:
+        res = await run_io(apply_ops, payload.ops)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+    return {"ok": True, **res}
+
+@app.post("/api/admin/dataset/fold", dependencies=[Depends(require_admin)])
+async def dataset_fold():
+    return {"ok": True, **(await run_io(fold_journal))}
+
+@app.get("/api/admin/dataset/journal", dependencies=[Depends(require_admin)])
+def dataset_journal():
+    return {"ok": True, **journal_status()}
+
+@app.post("/api/admin/tenants/invalidate", dependencies=[Depends(require_admin)])
+def tenants_invalidate(tenant: Optional[str] = None):
+    """Drop one tenant's cached overlay (or every tenant's) so the next request reloads it."""
+    if tenant is not None and valid_tenant(tenant) is None:
+        return JSONResponse(status_code=400, content={"ok": False, "error": "invalid tenant id"})
+    dropped = get_tenant_cache().invalidate(valid_tenant(tenant) if tenant is not None else None)
+    return {"ok": True, "tenant": valid_tenant(tenant), "dropped": dropped}
+
+
+# ---- Profiling (admin) ----------------------------------------------------------
+
+@app.get("/debug/profile", dependencies=[Depends(require_admin)])
+async def debug_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample every thread's stack for `seconds` (max 60); collapsed flame-graph text."""
+    seconds = max(0.1, min(seconds, 60.0))
+    interval = max(0.001, interval_ms / 1000.0)
+    out = await asyncio.to_thread(sample_stacks, seconds, interval)
+    if out is None:
+        return JSONResponse(status_code=409, content={"ok": False, "error": "a profile is already running"})
+    return PlainTextResponse(out)
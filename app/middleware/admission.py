@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+# Route class -> path prefixes. Anything unmatched (health, docs, admin) bypasses
+# admission entirely.
+ROUTE_CLASSES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("batch", ("/api/translate/stream", "/api/codes/validate", "/api/commit_selection/batch", "/api/export/",
+               "/api/learned/unlearn")),
+    ("write", ("/api/commit_selection",)),
+    ("lookup", ("/lookup", "/fhir/CodeSystem/", "/api/learned")),
+)
+
+# Defaults keep write + batch well under Starlette's 40-thread pool, so slow
+# learned-store rewrites can never take every thread away from lookups.
+_DEFAULTS = {
+    "lookup": (32, 256, 250),
+    "write": (4, 64, 2000),
+    "batch": (2, 8, 5000),
+}
+
+
+def classify(path: str) -> Optional[str]:
+    for name, prefixes in ROUTE_CLASSES:
+        for p in prefixes:
+            if path == p or (p.endswith("/") and path.startswith(p)) or path.startswith(p + "/"):
+                return name
+    return None
+
+
+class _Shed(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClass:
+    """Concurrency limit + bounded FIFO queue with a queue-wait latency budget."""
+
+    def __init__(self, name: str, limit: int, queue: int, budget_ms: int, tenant_limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, queue)
+        self.budget_s = budget_ms / 1000.0
+        self.tenant_limit = tenant_limit
+        self.active = 0
+        self.waiters: deque = deque()
+        self.tenants: Dict[str, int] = {}
+        self.ewma_service_s = 0.0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_budget = 0
+        self.shed_tenant = 0
+        self.timed_out = 0
+
+    def _retry_after(self) -> int:
+        est = (len(self.waiters) + 1) / self.limit * max(self.ewma_service_s, 0.001)
+        return max(1, int(est + 0.999))
+
+    def _estimated_wait(self) -> float:
+        return (len(self.waiters) + 1) / self.limit * self.ewma_service_s
+
+    async def acquire(self, tenant: Optional[str]):
+        if tenant and self.tenant_limit > 0 and self.tenants.get(tenant, 0) >= self.tenant_limit:
+            self.shed_tenant += 1
+            raise _Shed(429, f"tenant '{tenant}' over {self.name} quota", self._retry_after())
+        if self.active < self.limit and not self.waiters:
+            self._admit(tenant)
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise _Shed(503, f"{self.name} queue full", self._retry_after())
+        if self._estimated_wait() > self.budget_s:
+            self.shed_budget += 1
+            raise _Shed(503, f"{self.name} queue wait exceeds budget", self._retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        if tenant:
+            self.tenants[tenant] = self.tenants.get(tenant, 0) + 1
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.budget_s)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return  # slot was handed over just as the wait expired
+            fut.cancel()
+            self._drop_waiter(fut, tenant)
+            self.timed_out += 1
+            raise _Shed(503, f"{self.name} queue wait exceeded budget", self._retry_after())
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self.release(tenant, 0.0)
+            else:
+                fut.cancel()
+                self._drop_waiter(fut, tenant)
+            raise
+
+    def _drop_waiter(self, fut, tenant: Optional[str]):
+        try:
+            self.waiters.remove(fut)
+        except ValueError:
+            pass
+        if tenant:
+            self._tenant_dec(tenant)
+
+    def _tenant_dec(self, tenant: str):
+        n = self.tenants.get(tenant, 0) - 1
+        if n > 0:
+            self.tenants[tenant] = n
+        else:
+            self.tenants.pop(tenant, None)
+
+    def _admit(self, tenant: Optional[str]):
+        self.active += 1
+        self.admitted += 1
+        if tenant:
+            self.tenants[tenant] = self.tenants.get(tenant, 0) + 1
+
+    def release(self, tenant: Optional[str], service_s: float):
+        if service_s > 0:
+            self.ewma_service_s = service_s if not self.ewma_service_s else 0.8 * self.ewma_service_s + 0.2 * service_s
+        if tenant:
+            self._tenant_dec(tenant)
+        self.active -= 1
+        # Hand the slot straight to the next live waiter (FIFO).
+        while self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done():
+                self.active += 1
+                self.admitted += 1
+                fut.set_result(True)
+                return
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "max_queue": self.max_queue,
+            "budget_ms": int(self.budget_s * 1000),
+            "ewma_service_ms": round(self.ewma_service_s * 1000, 2),
+            "admitted": self.admitted,
+            "shed": {
+                "queue_full": self.shed_queue_full,
+                "budget": self.shed_budget,
+                "timeout": self.timed_out,
+                "tenant_quota": self.shed_tenant,
+            },
+            "tenants_inflight": len(self.tenants),
+        }
+
+
+class AdmissionControlMiddleware:
+    """Pure-ASGI admission control per route class (lookup / write / batch).
+
+    Each class has its own concurrency limit and bounded queue. A request is shed
+    with 503 + Retry-After when the queue is full or the estimated queue wait
+    exceeds the class latency budget, and with 429 when its tenant (`context`
+    query param or X-Akashic-Context header) is over its in-flight quota.
+    Configure with ADMISSION_<CLASS>_CONCURRENCY / _QUEUE / _BUDGET_MS and
+    ADMISSION_TENANT_MAX_INFLIGHT (0 = no tenant quota); ADMISSION_ENABLED=0 disables.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = os.getenv("ADMISSION_ENABLED", "1") != "0"
+        tenant_limit = _env_int("ADMISSION_TENANT_MAX_INFLIGHT", 0)
+        self.classes: Dict[str, RouteClass] = {}
+        for name, (limit, queue, budget) in _DEFAULTS.items():
+            up = name.upper()
+            self.classes[name] = RouteClass(
+                name,
+                _env_int(f"ADMISSION_{up}_CONCURRENCY", limit),
+                _env_int(f"ADMISSION_{up}_QUEUE", queue),
+                _env_int(f"ADMISSION_{up}_BUDGET_MS", budget),
+                tenant_limit,
+            )
+        global _instance
+        _instance = self
+
+    @staticmethod
+    def _tenant(scope) -> Optional[str]:
+        for k, v in scope.get("headers") or []:
+            if k == b"x-akashic-context":
+                return v.decode("latin-1").strip().lower() or None
+        qs = scope.get("query_string") or b""
+        if b"context=" in qs:
+            vals = parse_qs(qs.decode("latin-1")).get("context")
+            if vals and vals[0].strip():
+                return vals[0].strip().lower()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        name = classify(scope.get("path", ""))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        rc = self.classes[name]
+        tenant = self._tenant(scope)
+        try:
+            await rc.acquire(tenant)
+        except _Shed as e:
+            await self._reject(send, e)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rc.release(tenant, time.perf_counter() - start)
+
+    @staticmethod
+    async def _reject(send, e: _Shed):
+        body = json.dumps({"ok": False, "error": e.reason, "retry_after": e.retry_after}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": e.status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(e.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def snapshot(self) -> dict:
+        return {"enabled": self.enabled, "classes": {n: c.snapshot() for n, c in self.classes.items()}}
+
+
+_instance: Optional[AdmissionControlMiddleware] = None
+
+def admission_metrics() -> dict:
+    """Queue depth / shed counters for /api/metrics ({} until the middleware is built)."""
+    return _instance.snapshot() if _instance is not None else {}
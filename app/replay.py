@@ -0,0 +1,291 @@
+"""Replay production /lookup traffic (JSONLogMiddleware logs) against two dataset
+snapshots and report which answers would change, weighted by traffic.
+
+Queries are deduplicated with counts, then every distinct query is resolved through
+lookup_response() in two process pools at once, one per snapshot.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+import gzip, json, multiprocessing, os, time
+
+# Snapshot directory file -> the env var its loader reads.
+SNAPSHOT_FILES = {
+    "snomed.json": "SNOMED_JSON",
+    "loinc_aliases.json": "LOINC_ALIASES_JSON",
+    "loinc_canonical.json": "LOINC_CANONICAL_JSON",
+    "loinc.json": "LOINC_JSON",
+    "rxnorm.json": "RXNORM_JSON",
+    "cvx.json": "CVX_JSON",
+    "layman_learned.json": "LEARNED_JSON",
+    "tenants": "TENANTS_DIR",
+}
+_INT_PARAMS = ("top_k", "score_cutoff", "tech_top_k", "tech_score_cutoff")
+_STR_PARAMS = ("domain", "context", "tenant")
+CATEGORIES = ("same", "gained", "lost", "changed")
+
+# ---- Logs -----------------------------------------------------------------------
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+def iter_log_records(paths: Iterable[str], contains: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """JSON records from JSONLogMiddleware output, streamed. Lines may carry a logging
+    prefix before the JSON object; non-JSON lines are skipped, as are lines without
+    the `contains` substring (checked before parsing)."""
+    for path in paths:
+        with _open(path) as f:
+            for line in f:
+                if contains and contains not in line:
+                    continue
+                i = line.find("{")
+                if i < 0:
+                    continue
+                try:
+                    rec = json.loads(line[i:])
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(rec, dict):
+                    yield rec
+
+def lookup_key(query_string: str) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    """A /lookup query string reduced to its normalized lookup parameters, or None if it
+    has no query. Equal keys resolve identically, so they're replayed once."""
+    qs = parse_qs(query_string or "", keep_blank_values=True)
+    term = (qs.get("query") or [""])[0].strip().lower()
+    if not term:
+        return None
+    params: Dict[str, Any] = {"query": term}
+    for name in _STR_PARAMS:
+        v = (qs.get(name) or [""])[0].strip().lower()
+        if v and not (name == "domain" and v == "auto"):
+            params[name] = v
+    for name in _INT_PARAMS:
+        v = (qs.get(name) or [""])[0]
+        if v.lstrip("-").isdigit():
+            params[name] = int(v)
+    if (qs.get("include_technical") or [""])[0].strip().lower() in ("1", "true", "yes", "on"):
+        params["include_technical"] = True
+    return tuple(sorted(params.items()))
+
+def dedupe_queries(records: Iterable[Dict[str, Any]], path: str = "/lookup") -> Tuple[Counter, Dict[str, int]]:
+    """(Counter of lookup keys, stats) over successful GET `path` requests. Raw query
+    strings are counted first, so each distinct one is parsed once."""
+    raw: Counter = Counter()
+    stats = {"records": 0, "lookups": 0, "skipped": 0}
+    for rec in records:
+        stats["records"] += 1
+        if rec.get("path") != path or rec.get("method", "GET") != "GET":
+            continue
+        if rec.get("status") != 200:
+            stats["skipped"] += 1
+            continue
+        raw[rec.get("query") or ""] += 1
+    counts: Counter = Counter()
+    for qs, n in raw.items():
+        key = lookup_key(qs)
+        if key is None:
+            stats["skipped"] += n
+            continue
+        counts[key] += n
+        stats["lookups"] += n
+    return counts, stats
+
+# ---- Snapshots ------------------------------------------------------------------
+
+def snapshot_env(path: Optional[str]) -> Dict[str, str]:
+    """Env overrides for a snapshot: a directory of dataset files (SNAPSHOT_FILES names)
+    or a gen_synthetic-style manifest.json with a "files" map. Files a snapshot lacks
+    keep the current configuration. The dataset journal is the snapshot's own
+    dataset_journal.jsonl (usually absent), never the live one. None = current config."""
+    if not path:
+        return {}
+    env: Dict[str, str] = {}
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            files = (json.load(f) or {}).get("files") or {}
+        root = os.path.dirname(os.path.abspath(path))
+        env.update({k: os.path.join(root, v) for k, v in files.items()})
+    elif os.path.isdir(path):
+        root = os.path.abspath(path)
+        for name, var in SNAPSHOT_FILES.items():
+            p = os.path.join(root, name)
+            if os.path.exists(p):
+                env[var] = p
+    else:
+        raise FileNotFoundError(path)
+    env["DATASET_JOURNAL"] = os.path.join(root, "dataset_journal.jsonl")
+    return env
+
+# ---- Workers (spawned with the snapshot's environment) ----------------------------
+
+def _init_worker():
+    from app.resolver import warm_indexes
+    warm_indexes()
+
+def _ready() -> int:
+    return os.getpid()
+
+def _answer(body: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """The top result's codes, as sorted (system uri, code) pairs; () for no answer."""
+    if not body.get("count"):
+        return ()
+    coding = (body["results"][0].get("codeable_concept") or {}).get("coding") or []
+    return tuple(sorted((c["system"], c["code"]) for c in coding))
+
+def resolve_chunk(keys: List[Tuple[Tuple[str, Any], ...]]) -> List[Tuple[Tuple[Tuple[str, str], ...], int]]:
+    """[(answer, latency_ns)] for each lookup key, through the same path as /lookup."""
+    from app.resolver import lookup_response
+    from app.data.tenants import get_tenant_cache
+    out = []
+    for key in keys:
+        params = dict(key)
+        query = params.pop("query")
+        tenant = params.pop("tenant", None)
+        t0 = time.perf_counter_ns()
+        overlay = get_tenant_cache().get(tenant) if tenant else None
+        body = lookup_response(query, overlay=overlay, **params)
+        out.append((_answer(body), time.perf_counter_ns() - t0))
+    return out
+
+def start_pool(env: Dict[str, str], jobs: int) -> Tuple[ProcessPoolExecutor, float]:
+    """Spawn `jobs` workers with `env` applied, wait until their indexes are warm;
+    returns (pool, load seconds). Spawned children inherit os.environ at start, which
+    module-level settings (journal, learned store) need; the parent's env is restored."""
+    ctx = multiprocessing.get_context("spawn")
+    saved = dict(os.environ)
+    t0 = time.perf_counter()
+    os.environ.update(env)
+    os.environ["MISS_TRACKER_PERSIST_S"] = "0"  # replays must not write miss snapshots
+    try:
+        pool = ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, initializer=_init_worker)
+        ready = [pool.submit(_ready) for _ in range(jobs)]  # each submit starts a worker
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    for fut in ready:
+        fut.result()
+    return pool, time.perf_counter() - t0
+
+# ---- Report ---------------------------------------------------------------------
+
+def _percentiles(samples: List[Tuple[int, int]]) -> Dict[str, float]:
+    """p50/p95/p99/mean in µs over (latency_ns, weight) samples."""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    total = sum(w for _, w in samples)
+    out: Dict[str, float] = {"mean": round(sum(l * w for l, w in samples) / total / 1000, 1)}
+    marks = [("p50", 0.50), ("p95", 0.95), ("p99", 0.99)]
+    acc = 0
+    for lat, w in samples:
+        acc += w
+        while marks and acc >= marks[0][1] * total:
+            out[marks.pop(0)[0]] = round(lat / 1000, 1)
+    return out
+
+def classify(a: Tuple[Tuple[str, str], ...], b: Tuple[Tuple[str, str], ...]) -> str:
+    if a == b:
+        return "same"
+    if not a:
+        return "gained"
+    if not b:
+        return "lost"
+    return "changed"
+
+def _system_diff(a, b) -> Dict[str, str]:
+    """Per code system: gained / lost / changed between two answers."""
+    da, db = dict(a), dict(b)
+    out = {}
+    for system in set(da) | set(db):
+        if system not in da:
+            out[system] = "gained"
+        elif system not in db:
+            out[system] = "lost"
+        elif da[system] != db[system]:
+            out[system] = "changed"
+    return out
+
+def replay(log_paths: List[str], snapshot_a: Optional[str], snapshot_b: Optional[str],
+           jobs: int = 2, chunk_size: int = 2000, examples: int = 20,
+           diff_out=None) -> Dict[str, Any]:
+    """Dedupe the logs, resolve every distinct query against both snapshots, report."""
+    t0 = time.perf_counter()
+    counts, log_stats = dedupe_queries(iter_log_records(log_paths, contains='"/lookup"'))
+    items = counts.most_common()
+    read_s = time.perf_counter() - t0
+
+    pools: Dict[str, ProcessPoolExecutor] = {}
+    perf: Dict[str, Dict[str, Any]] = {}
+    envs = {"a": snapshot_env(snapshot_a), "b": snapshot_env(snapshot_b)}
+    answers: Dict[str, List[Any]] = {"a": [None] * len(items), "b": [None] * len(items)}
+    lat: Dict[str, List[Tuple[int, int]]] = {"a": [], "b": []}
+    try:
+        for side in ("a", "b"):
+            pools[side], load_s = start_pool(envs[side], jobs)
+            perf[side] = {"load_s": round(load_s, 3)}
+        t1 = time.perf_counter()
+        window: deque = deque()
+        finished = {"a": t1, "b": t1}
+
+        def drain_one():
+            side, start, fut = window.popleft()
+            for i, (answer, ns) in enumerate(fut.result()):
+                answers[side][start + i] = answer
+                lat[side].append((ns, items[start + i][1]))
+            finished[side] = time.perf_counter()
+
+        for start in range(0, len(items), chunk_size):
+            keys = [k for k, _ in items[start:start + chunk_size]]
+            for side in ("a", "b"):
+                window.append((side, start, pools[side].submit(resolve_chunk, keys)))
+            while len(window) >= 4 * jobs:
+                drain_one()
+        while window:
+            drain_one()
+    finally:
+        for pool in pools.values():
+            pool.shutdown(cancel_futures=True)
+
+    for side in ("a", "b"):
+        wall = finished[side] - t1
+        perf[side].update({
+            "resolve_s": round(wall, 3),
+            "queries_per_s": round(len(items) / wall, 1) if wall > 0 else None,
+            "latency_us": _percentiles([(ns, 1) for ns, _ in lat[side]]),
+            "traffic_weighted_latency_us": _percentiles(lat[side]),
+        })
+
+    total_traffic = sum(counts.values()) or 1
+    summary = {c: {"queries": 0, "traffic": 0} for c in CATEGORIES}
+    by_system: Dict[str, Counter] = {}
+    samples: Dict[str, List[Dict[str, Any]]] = {c: [] for c in CATEGORIES if c != "same"}
+    for (key, n), a, b in zip(items, answers["a"], answers["b"]):
+        cat = classify(a, b)
+        summary[cat]["queries"] += 1
+        summary[cat]["traffic"] += n
+        if cat == "same":
+            continue
+        for system, change in _system_diff(a, b).items():
+            by_system.setdefault(system, Counter())[change] += n
+        row = {**dict(key), "count": n, "change": cat,
+               "a": [{"system": s, "code": c} for s, c in a], "b": [{"system": s, "code": c} for s, c in b]}
+        if len(samples[cat]) < examples:  # items are in traffic order: heaviest first
+            samples[cat].append(row)
+        if diff_out is not None:
+            diff_out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    for s in summary.values():
+        s["traffic_pct"] = round(100.0 * s["traffic"] / total_traffic, 3)
+
+    return {
+        "logs": {"files": len(log_paths), **log_stats, "distinct": len(items), "read_s": round(read_s, 3)},
+        "snapshots": {"a": snapshot_a or "(current)", "b": snapshot_b or "(current)"},
+        "diff": {**summary, "by_system": {k: dict(v) for k, v in sorted(by_system.items())}, "top": samples},
+        "performance": perf,
+        "jobs_per_snapshot": jobs,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
@@ -0,0 +1,279 @@
+from __future__ import annotations
+from typing import Optional, List, Dict, Any
+from pydantic import BaseModel
+import hashlib, json, os
+
+from app.data.code_systems import get_registry, allowed_systems, data_version, DEFAULT_SYSTEMS
+from app.utils.miss_tracker import get_miss_tracker
+from app.utils.io_executor import run_cpu, run_io
+from app.data.live_index import journal_changed, sync_journal
+from app.utils.single_flight import get_group
+from app.utils.profiling import StageTimer
+from app.data.tenants import TenantOverlay, valid_tenant, get_tenant_cache
+from app.candidates import Candidate, CandidatePipeline
+from app.policy import FUZZY_ACCEPT
+from app.learning import learned_snapshot, _ns_key
+from app.data.journal import journal_path
+from app.utils.domain_profile import _DEF_PATH as DOMAIN_PROFILE_PATH
+from app.utils.lookup_cache import get_lookup_cache, dataset_fingerprint, _KEY_PREFIX
+
+
+class LookupResult(BaseModel):
+    term: str
+    aliases: List[str] = []
+    loinc: Optional[str] = None
+    snomed: Optional[str] = None
+    score: int = 0
+    source: Optional[str] = None
+    patient_view: Optional[str] = None
+    practitioner_view: Optional[str] = None
+    practitioner_options: Dict[str, Any] = {}
+    codeable_concept: Dict[str, Any] = {}
+
+def indexes_loaded(systems=DEFAULT_SYSTEMS) -> bool:
+    reg = get_registry()
+    return all(reg.loaded(n) for n in systems)
+
+def warm_indexes(systems=DEFAULT_SYSTEMS):
+    """Load the indexes for `systems` (blocking); others stay unloaded until used."""
+    reg = get_registry()
+    for n in systems:
+        reg.index(n)
+
+async def ensure_indexes(systems=DEFAULT_SYSTEMS):
+    """Single-flight async load: the first caller on a cold (or unloaded) system runs
+    warm_indexes() on the I/O executor; concurrent callers await the same future.
+    Also picks up dataset-journal ops written by other workers (throttled stat)."""
+    systems = tuple(systems)
+    if indexes_loaded(systems):
+        if journal_changed():
+            await run_io(sync_journal)
+        return
+    await get_group("index_warm").do_async(systems, lambda: run_io(warm_indexes, systems))
+
+async def tenant_overlay(tenant: Optional[str]) -> Optional[TenantOverlay]:
+    """Overlay for a request's tenant: inline on a cache hit, loaded on the I/O
+    executor (single-flight per tenant) on a miss. None means base indexes only."""
+    t = valid_tenant(tenant)
+    if t is None:
+        return None
+    cache = get_tenant_cache()
+    cached, ov = cache.peek(t)
+    if cached:
+        return ov
+    return await run_io(cache.get, t)
+
+RESULT_FIELDS = tuple(LookupResult.model_fields)
+ECHO_FIELDS = ("query", "domain", "include_technical")
+MINIMAL_FIELDS = frozenset(("snomed", "loinc", "score"))
+
+def parse_fields(fields: Optional[str] = None, fmt: Optional[str] = None) -> Optional[frozenset]:
+    """The requested result/echo fields, or None for the full body. `fields` is a
+    comma list of LookupResult fields (plus query/domain/include_technical to echo);
+    fmt="minimal" means snomed, loinc, score. Raises ValueError on unknown names."""
+    if fmt not in (None, "", "full", "minimal"):
+        raise ValueError("format must be full|minimal")
+    if fmt == "minimal":
+        return MINIMAL_FIELDS
+    if not fields:
+        return None
+    names = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    unknown = sorted(names - set(RESULT_FIELDS) - set(ECHO_FIELDS))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return names
+
+def _option(c: Candidate, selected: bool) -> Dict[str, Any]:
+    return {"code": c.code, "display": c.display, "score": c.score, "source": c.source, "selected": selected}
+
+def _candidate_result(c: Candidate, want) -> Dict[str, Any]:
+    """One result dict holding only the fields in `want` (a container of names);
+    views and the CodeableConcept are only formatted when asked for."""
+    system = get_registry().system(c.system)
+    out: Dict[str, Any] = {}
+    if "term" in want:
+        out["term"] = c.term
+    if "aliases" in want:
+        out["aliases"] = []
+    if "loinc" in want:
+        out["loinc"] = c.code if c.system == "loinc" else None
+    if "snomed" in want:
+        out["snomed"] = c.code if c.system == "snomed" else None
+    if "score" in want:
+        out["score"] = c.score
+    if "source" in want:
+        out["source"] = c.source
+    clinical = not system.technical
+    if "patient_view" in want:
+        out["patient_view"] = f"{c.term} ({c.display})" if clinical else None
+    if "practitioner_view" in want:
+        out["practitioner_view"] = f"{c.display} ({c.term})" if clinical else None
+    if "practitioner_options" in want:
+        out["practitioner_options"] = {}
+    if "codeable_concept" in want:
+        out["codeable_concept"] = {"coding": [{"system": system.uri, "code": c.code, "display": c.display}],
+                                   "text": c.term}
+    return out
+
+def build_pipeline(query: str, domain: str = "auto", include_technical: bool = False,
+                   top_k: int = 5, score_cutoff: int = 70, tech_top_k: int = 8,
+                   tech_score_cutoff: int = 60, context: Optional[str] = None,
+                   timer: Optional[StageTimer] = None,
+                   overlay: Optional[TenantOverlay] = None) -> CandidatePipeline:
+    term = (query or "").strip().lower()
+    return CandidatePipeline(term, allowed_systems(context, domain), overlay=overlay, context=context,
+                             top_k=top_k, score_cutoff=score_cutoff, include_technical=include_technical,
+                             tech_top_k=tech_top_k, tech_score_cutoff=tech_score_cutoff, timer=timer)
+
+def lookup_response(
+    query: str,
+    domain: str = "auto",
+    include_technical: bool = False,
+    top_k: int = 5,
+    score_cutoff: int = 70,
+    tech_top_k: int = 8,
+    tech_score_cutoff: int = 60,
+    context: Optional[str] = None,
+    timer: Optional[StageTimer] = None,
+    overlay: Optional[TenantOverlay] = None,
+    pipeline: Optional[CandidatePipeline] = None,
+    fields: Optional[frozenset] = None,
+) -> Dict[str, Any]:
+    """Build the /lookup body: up to top_k ranked results (one per candidate code), best
+    first. results[0] carries practitioner_options for every system with scores, and the
+    exact codes other systems matched. Shared by /lookup, streaming and offline tools;
+    `pipeline` resumes one already run partway (see coalesced_lookup).
+
+    With `fields` (see parse_fields) the body is just count + results holding those
+    fields (+ any echo fields asked for); nothing else is built."""
+    term = (query or "").strip().lower()
+    p = pipeline or build_pipeline(query, domain, include_technical, top_k, score_cutoff,
+                                   tech_top_k, tech_score_cutoff, context, timer, overlay)
+    p.run()
+    ranked = p.ranked()
+    if not p.exact_hit():
+        get_miss_tracker().record(term, context)
+    want = RESULT_FIELDS if fields is None else fields
+    if ranked:
+        results = [_candidate_result(c, want) for c in ranked]
+        top, head = ranked[0], results[0]
+        options = "practitioner_options" in want
+        coding = head["codeable_concept"]["coding"] if "codeable_concept" in want else None
+        if options or coding is not None or "snomed" in want or "loinc" in want:
+            reg = get_registry()
+            for name, cands in p.by_system().items():
+                if options:
+                    limit = tech_top_k if reg.system(name).technical else top_k
+                    head["practitioner_options"][name] = [
+                        _option(c, c is top and c.score >= FUZZY_ACCEPT) for c in cands[:limit]
+                    ]
+                other = cands[0]
+                if name != top.system and other.score == 100:
+                    if name in want and name in ("snomed", "loinc"):
+                        head[name] = other.code
+                    if coding is not None:
+                        coding.append({"system": reg.system(name).uri, "code": other.code, "display": other.display})
+    else:
+        results = [{k: v for k, v in LookupResult(term=term).model_dump().items() if k in want}]
+    if fields is None:
+        body = {
+            "ok": True,
+            "query": term,
+            "domain": domain,
+            "count": len(ranked),
+            "results": results,
+            "include_technical": include_technical,
+        }
+    else:
+        echo = {"query": term, "domain": domain, "include_technical": include_technical}
+        body = {k: echo[k] for k in ECHO_FIELDS if k in fields}
+        body["count"] = len(ranked)
+        body["results"] = results
+    if timer:
+        timer.mark("assemble")
+    return body
+
+
+_namespace = (None, "")
+
+def cache_namespace() -> str:
+    """Dataset fingerprint for lookup cache keys, shared by every task serving the same
+    files, journal and build; recomputed only when data_version() changes. Blocking
+    (hashes the files): event-loop callers go through ensure_cache_namespace()."""
+    global _namespace
+    version = data_version()
+    if _namespace[0] != version:
+        reg = get_registry()
+        paths = {p for n in reg.names() for p in reg.system(n).paths().values()}
+        paths |= {os.getenv("LOINC_JSON", "data/loinc.json"), DOMAIN_PROFILE_PATH}
+        build = os.getenv("GITHUB_SHA") or os.getenv("COMMIT_SHA") or "local"
+        _namespace = (version, dataset_fingerprint(sorted(paths), (journal_path(), version[1][1]), build))
+    return _namespace[1]
+
+async def ensure_cache_namespace() -> str:
+    if _namespace[0] == data_version():
+        return _namespace[1]
+    ns, _ = await get_group("cache_namespace").do_async("ns", lambda: run_io(cache_namespace))
+    return ns
+
+def cache_key(query: str, kwargs: Dict[str, Any], namespace: Optional[str] = None) -> str:
+    """namespace + hash of the normalized request and the learned entries the learned
+    source would read for it (a new selection changes only that term's keys)."""
+    term = (query or "").strip().lower()
+    context = kwargs.get("context")
+    learned = learned_snapshot()
+    marks = []
+    for k in {_ns_key(context, term), _ns_key(None, term)}:
+        e = learned.get(k)
+        if e:
+            marks.append([k, e.get("snomed_code"), e.get("snomed_display"), e.get("updated_utc")])
+    params = sorted((k, sorted(v) if isinstance(v, frozenset) else v) for k, v in kwargs.items())
+    raw = json.dumps([term, params, sorted(marks)], ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"{_KEY_PREFIX}:{namespace or cache_namespace()}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+def _cached_body(hit, term: str, context: Optional[str]) -> Dict[str, Any]:
+    body, miss = hit
+    if miss:
+        get_miss_tracker().record(term, context)
+    return dict(body)
+
+async def coalesced_lookup(query: str, tenant: Optional[str] = None,
+                           overlay: Optional[TenantOverlay] = None, **kwargs) -> Dict[str, Any]:
+    """/lookup body. Checks the L1 lookup cache, then runs the cheap candidate sources
+    (learned, exact, variants) inline; when they already guarantee top_k, the response is
+    built right there. Otherwise the L2 cache is consulted, and on a miss the fuzzy/
+    technical remainder runs on the CPU executor, where identical concurrent requests
+    (normalized term, domain, context, cutoffs, fields, tenant, data version) share it.
+    Requests through a tenant overlay are not cached."""
+    cache = get_lookup_cache()
+    term = (query or "").strip().lower()
+    context = kwargs.get("context")
+    key = None
+    if cache.enabled and overlay is None:
+        key = cache_key(query, kwargs, await ensure_cache_namespace())  # file hashing off the loop
+    if key is not None:
+        hit = cache.get_l1(key)
+        if hit is not None:
+            return _cached_body(hit, term, context)
+    pipeline = build_pipeline(query, overlay=overlay, **{k: v for k, v in kwargs.items() if k != "fields"})
+    if pipeline.run(cheap_only=True):
+        body = lookup_response(query, overlay=overlay, pipeline=pipeline, **kwargs)
+        if key is not None:
+            cache.put_l1(key, body, not pipeline.exact_hit())
+        return body
+    if key is not None:
+        hit = await cache.get_l2_async(key)
+        if hit is not None:
+            cache.put_l1(key, *hit)
+            return _cached_body(hit, term, context)
+    group_key = (term, valid_tenant(tenant), data_version(), tuple(sorted(kwargs.items())))
+    body, shared = await get_group("lookup").do_async(
+        group_key, lambda: run_cpu(lookup_response, query, overlay=overlay, pipeline=pipeline, **kwargs))
+    miss = not pipeline.exact_hit()  # the cheap pass ran here too, so this is per caller
+    if shared:
+        # Follower: the leader caches, but every request counts, as an L1 hit would.
+        return _cached_body((body, miss), term, context)
+    if key is not None:
+        cache.put_l1(key, body, miss)
+        cache.put_l2_background(key, body, miss)
+    return body
@@ -0,0 +1,16 @@
+import os, hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency for admin endpoints: X-Admin-Token must match ADMIN_TOKEN.
+    With ADMIN_TOKEN unset the admin surface is disabled entirely."""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="admin API disabled (set ADMIN_TOKEN)")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
+def is_admin(token: Optional[str]) -> bool:
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected) and hmac.compare_digest((token or "").encode(), expected.encode())
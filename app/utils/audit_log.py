@@ -0,0 +1,450 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import atexit, base64, datetime, glob, gzip, hashlib, json, math, os, re, shutil, socket, threading, time
+
+from app.utils.io_executor import submit_io
+
+_FLUSH_S = int(os.getenv("AUDIT_LOG_FLUSH_MS", "1000")) / 1000.0
+_FSYNC = os.getenv("AUDIT_LOG_FSYNC", "interval").strip().lower()  # event | batch | interval | off
+_ROTATE_BYTES = int(float(os.getenv("AUDIT_LOG_ROTATE_MB", "64")) * 1024 * 1024)
+_BUFFER_MAX = int(os.getenv("AUDIT_LOG_BUFFER", "1000"))  # buffered events that force a flush
+_COMPRESS = os.getenv("AUDIT_LOG_COMPRESS", "1") == "1"
+_BLOOM_FP = 0.01
+
+FSYNC_MODES = ("event", "batch", "interval", "off")
+
+# <day>.<host>-<pid>.<seq>.jsonl while open; sealed -> .jsonl.gz + .jsonl.gz.idx.json
+_SEGMENT = re.compile(r"^(\d{4}-\d{2}-\d{2})\.(.+)\.(\d{4,})\.jsonl(\.gz)?$")
+_LEGACY = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl$")  # one file per day, written before segments
+
+
+def _utc_day() -> str:
+    return datetime.datetime.utcnow().strftime("%Y-%m-%d")
+
+def norm_term(term: Any) -> str:
+    return str(term or "").strip().lower()
+
+
+# ---- Segment index ------------------------------------------------------------------
+
+class Bloom:
+    """Fixed-size bloom filter over strings (blake2b double hashing)."""
+
+    def __init__(self, m: int, k: int, bits: Optional[bytearray] = None):
+        self.m, self.k = max(8, m), max(1, k)
+        self.bits = bits if bits is not None else bytearray((self.m + 7) // 8)
+
+    @classmethod
+    def for_count(cls, n: int, fp: float = _BLOOM_FP) -> "Bloom":
+        n = max(1, n)
+        m = int(math.ceil(-n * math.log(fp) / (math.log(2) ** 2)))
+        return cls(m, int(round(m / n * math.log(2))))
+
+    def _positions(self, value: str):
+        d = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def add(self, value: str):
+        for p in self._positions(value):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"m": self.m, "k": self.k, "bits": base64.b64encode(bytes(self.bits)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Bloom":
+        return cls(int(d["m"]), int(d["k"]), bytearray(base64.b64decode(d["bits"])))
+
+
+class _SegmentMeta:
+    """What the writer learns about a segment while appending to it."""
+    __slots__ = ("path", "day", "count", "bytes", "min_ts", "max_ts", "terms")
+
+    def __init__(self, path: str, day: str, size: int = 0):
+        self.path, self.day, self.bytes = path, day, size
+        self.count = 0
+        self.min_ts: Optional[str] = None
+        self.max_ts: Optional[str] = None
+        self.terms: set = set()
+
+    def observe(self, row: Dict[str, Any], nbytes: int):
+        self.count += 1
+        self.bytes += nbytes
+        ts = row.get("ts")
+        if isinstance(ts, str):
+            if self.min_ts is None or ts < self.min_ts:
+                self.min_ts = ts
+            if self.max_ts is None or ts > self.max_ts:
+                self.max_ts = ts
+        if row.get("term") is not None:
+            self.terms.add(norm_term(row["term"]))
+
+    @classmethod
+    def scan(cls, path: str, day: str) -> "_SegmentMeta":
+        """Rebuild from the file (segments left open by a crashed writer)."""
+        meta = cls(path, day)
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(row, dict):
+                    meta.observe(row, len(line))
+        return meta
+
+
+def index_path(segment: str) -> str:
+    return segment + ".idx.json"
+
+def seal_segment(meta: _SegmentMeta, compress: bool = _COMPRESS) -> str:
+    """Compress a closed segment and write its index next to it; returns the sealed path.
+    Each step is tmp + rename, so a crash mid-way leaves either the plain segment or the
+    sealed one (a leftover plain copy is removed on the next seal)."""
+    src, dst = meta.path, meta.path + ".gz" if compress else meta.path
+    if compress:
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        with open(src, "rb") as fin, gzip.open(tmp, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+        os.replace(tmp, dst)
+    bloom = Bloom.for_count(len(meta.terms))
+    for t in meta.terms:
+        bloom.add(t)
+    idx = {"segment": os.path.basename(dst), "day": meta.day, "count": meta.count, "bytes": meta.bytes,
+           "min_ts": meta.min_ts, "max_ts": meta.max_ts, "terms": len(meta.terms), "bloom": bloom.to_dict()}
+    tmp = f"{index_path(dst)}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(idx, f, separators=(",", ":"))
+    os.replace(tmp, index_path(dst))
+    if compress:
+        try:
+            os.remove(src)
+        except FileNotFoundError:
+            pass  # sealed concurrently by another worker's recovery
+    return dst
+
+
+# ---- Writer -------------------------------------------------------------------------
+
+class AuditLog:
+    """Long-lived append-only JSONL writer for one directory.
+
+    Events are buffered and written by a flusher thread every `flush_s`, or as soon as
+    `buffer_max` are pending. `fsync` sets durability: `event` writes and fsyncs each event
+    before append() returns, `batch` does the same once per append()/append_many() call,
+    `interval` fsyncs on every background flush (up to `flush_s` of events can be lost on
+    a crash), `off` never fsyncs. The segment rotates at `rotate_bytes` or at the UTC day
+    boundary; closed segments are compressed and indexed on the I/O executor.
+    """
+
+    def __init__(self, directory: str, flush_s: float = _FLUSH_S, fsync: str = _FSYNC,
+                 rotate_bytes: int = _ROTATE_BYTES, buffer_max: int = _BUFFER_MAX, compress: bool = _COMPRESS):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"AUDIT_LOG_FSYNC must be one of {', '.join(FSYNC_MODES)}, got '{fsync}'")
+        self.directory = directory
+        self.flush_s = flush_s
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.buffer_max = max(1, buffer_max)
+        self.compress = compress
+        self.writer_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._buffer: List[Tuple[Dict[str, Any], bytes]] = []
+        self._lock = threading.Lock()  # buffer
+        self._io_lock = threading.Lock()  # file + segment state
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._meta: Optional[_SegmentMeta] = None
+        self._seq = -1
+        self.counters = {"events": 0, "bytes": 0, "flushes": 0, "fsyncs": 0, "rotations": 0,
+                         "sealed": 0, "seal_errors": 0, "write_errors": 0}
+        self.last_flush_ms: Optional[float] = None
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # ---- segments ---------------------------------------------------------------
+
+    def _writer_gone(self, writer: str) -> bool:
+        host, _, pid = writer.rpartition("-")
+        if writer == self.writer_id:
+            return True
+        if host != socket.gethostname() or not pid.isdigit():
+            return False  # another host's writer: leave it alone
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def _recover(self):
+        """Continue numbering after this writer id's segments (a restarted container
+        often gets the same pid) and seal segments left open by writers on this host
+        that no longer run."""
+        for path in glob.glob(os.path.join(glob.escape(self.directory), "*.jsonl")):
+            m = _SEGMENT.match(os.path.basename(path))
+            if not m:
+                continue
+            day, writer, seq = m.group(1), m.group(2), int(m.group(3))
+            if writer == self.writer_id:
+                self._seq = max(self._seq, seq)
+            if os.path.exists(index_path(path)) or not self._writer_gone(writer):
+                continue
+            try:
+                self._submit_seal(_SegmentMeta.scan(path, day))
+            except OSError:
+                self.counters["seal_errors"] += 1
+        for path in glob.glob(os.path.join(glob.escape(self.directory), f"*.{glob.escape(self.writer_id)}.*.jsonl.gz")):
+            m = _SEGMENT.match(os.path.basename(path))
+            if m and m.group(2) == self.writer_id:
+                self._seq = max(self._seq, int(m.group(3)))
+
+    def _open_segment(self, day: str):
+        self._seq += 1
+        path = os.path.join(self.directory, f"{day}.{self.writer_id}.{self._seq:04d}.jsonl")
+        self._file = open(path, "ab")
+        self._meta = _SegmentMeta(path, day, self._file.tell())
+
+    def _close_segment(self, background: bool = True):
+        if self._file is None:
+            return
+        self._file.close()
+        meta, self._file, self._meta = self._meta, None, None
+        if meta.count == 0:
+            try:
+                os.remove(meta.path)
+            except OSError:
+                pass
+            return
+        if background:
+            self._submit_seal(meta)
+        else:
+            self._seal(meta)
+
+    def _seal(self, meta: _SegmentMeta):
+        try:
+            seal_segment(meta, self.compress)
+            self.counters["sealed"] += 1
+        except OSError:
+            self.counters["seal_errors"] += 1
+
+    def _submit_seal(self, meta: _SegmentMeta):
+        try:
+            submit_io(self._seal, meta)
+        except RuntimeError:  # executor already shut down (interpreter exit)
+            self._seal(meta)
+
+    # ---- writes -----------------------------------------------------------------
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], bytes]], sync: bool):
+        """Append encoded rows to the current segment, rotating first if needed."""
+        t0 = time.perf_counter()
+        with self._io_lock:
+            day = _utc_day()
+            if self._meta is not None and (self._meta.day != day or self._meta.bytes >= self.rotate_bytes):
+                self._close_segment()
+                self.counters["rotations"] += 1
+            if self._file is None:
+                self._open_segment(day)
+            per_event = sync and self.fsync == "event"
+            for row, line in batch:
+                if self._meta.bytes >= self.rotate_bytes and self._meta.count:
+                    self._file.flush()
+                    self._close_segment()
+                    self.counters["rotations"] += 1
+                    self._open_segment(day)
+                self._file.write(line)
+                self._meta.observe(row, len(line))
+                if per_event:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self.counters["fsyncs"] += 1
+            self._file.flush()
+            if self.fsync != "off" and not per_event:
+                os.fsync(self._file.fileno())
+                self.counters["fsyncs"] += 1
+            self.counters["events"] += len(batch)
+            self.counters["bytes"] += sum(len(line) for _, line in batch)
+            self.counters["flushes"] += 1
+        self.last_flush_ms = round((time.perf_counter() - t0) * 1000, 3)
+
+    def append(self, row: Dict[str, Any]):
+        self.append_many([row])
+
+    def append_many(self, rows: List[Dict[str, Any]]):
+        """Queue rows (one batch). In `event`/`batch` mode they are on disk and fsync'd
+        when this returns; write errors then propagate to the caller."""
+        if not rows:
+            return
+        batch = [(r, (json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8")) for r in rows]
+        if self.fsync in ("event", "batch") or self._closed:
+            self.flush()  # keep earlier buffered rows ahead of these
+            self._write(batch, sync=True)
+            return
+        with self._lock:
+            self._buffer.extend(batch)
+            full = len(self._buffer) >= self.buffer_max
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write out everything buffered so far (blocking)."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            self._write(batch, sync=False)
+        except OSError:
+            self.counters["write_errors"] += 1
+            with self._lock:  # keep the rows for the next attempt
+                self._buffer[:0] = batch
+            raise
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="akashic-audit-flush", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                time.sleep(self.flush_s)  # disk full / unavailable: rows stay buffered
+            if self._meta is not None and self._meta.day != _utc_day():
+                with self._io_lock:  # idle across midnight: close yesterday's segment
+                    if self._meta is not None and self._meta.day != _utc_day():
+                        self._close_segment()
+                        self.counters["rotations"] += 1
+
+    def close(self):
+        """Flush, stop the flusher and seal the current segment synchronously."""
+        self._closed = True
+        self._wake.set()
+        try:
+            self.flush()
+        except OSError:
+            pass
+        with self._io_lock:
+            self._close_segment(background=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._buffer)
+        meta = self._meta
+        return {**self.counters, "pending": pending, "fsync": self.fsync, "flush_ms": int(self.flush_s * 1000),
+                "last_flush_ms": self.last_flush_ms, "rotate_bytes": self.rotate_bytes,
+                "segment": os.path.basename(meta.path) if meta else None,
+                "segment_bytes": meta.bytes if meta else 0}
+
+
+_logs: Dict[Tuple[int, str], AuditLog] = {}
+_logs_lock = threading.Lock()
+
+def get_audit_log(directory: str) -> AuditLog:
+    """The process-wide writer for `directory` (one per path; a forked child gets its own)."""
+    key = (os.getpid(), os.path.abspath(directory))
+    log = _logs.get(key)
+    if log is None:
+        with _logs_lock:
+            log = _logs.get(key)
+            if log is None:
+                log = _logs[key] = AuditLog(directory)
+    return log
+
+def close_audit_logs():
+    for (pid, _), log in list(_logs.items()):
+        if pid == os.getpid():
+            log.close()
+
+atexit.register(close_audit_logs)  # CLI / scripts: the flusher is a daemon thread
+
+def audit_log_stats() -> Dict[str, Any]:
+    return {path: log.stats() for (pid, path), log in list(_logs.items()) if pid == os.getpid()}
+
+
+# ---- Reader -------------------------------------------------------------------------
+
+def list_segments(directory: str) -> List[Tuple[str, str]]:
+    """(day, path) for every segment (sealed, open or legacy per-day file), oldest day first."""
+    out = []
+    for path in glob.glob(os.path.join(glob.escape(directory), "*.jsonl*")):
+        name = os.path.basename(path)
+        m = _SEGMENT.match(name) or _LEGACY.match(name)
+        if m:
+            out.append((m.group(1), path))
+    return sorted(out)
+
+def _load_index(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def iter_events(directory: str, term: Optional[str] = None, since: Optional[str] = None,
+                until: Optional[str] = None, action: Optional[str] = None,
+                stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Events with since <= ts <= until (ISO strings), optionally for one term or action.
+    Segments are skipped by day (file name), then by the index's ts range and term bloom
+    filter; open and legacy segments have no index and are always read. Pending events
+    of this process's writer are flushed first. Order is per segment, oldest day first."""
+    log = _logs.get((os.getpid(), os.path.abspath(directory)))
+    if log is not None:
+        log.flush()
+    want = norm_term(term) if term is not None else None
+    st = stats if stats is not None else {}
+    for k in ("segments", "skipped", "read", "events"):
+        st.setdefault(k, 0)
+    segments = list_segments(directory)
+    names = {p for _, p in segments}
+    for day, path in segments:
+        if path + ".gz" in names:
+            continue  # being sealed: the compressed copy is complete
+        st["segments"] += 1
+        if (since and day < since[:10]) or (until and day > until[:10]):
+            st["skipped"] += 1
+            continue
+        idx = _load_index(path) if path.endswith(".gz") or os.path.exists(index_path(path)) else None
+        if idx is not None:
+            if (since and idx.get("max_ts") and idx["max_ts"] < since) or \
+               (until and idx.get("min_ts") and idx["min_ts"] > until):
+                st["skipped"] += 1
+                continue
+            if want is not None and want not in Bloom.from_dict(idx["bloom"]):
+                st["skipped"] += 1
+                continue
+        st["read"] += 1
+        try:
+            f = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+        except OSError:
+            continue  # sealed (renamed) between listing and opening
+        with f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an open segment
+                if not isinstance(row, dict):
+                    continue
+                ts = row.get("ts") or ""
+                if (since and ts < since) or (until and ts > until):
+                    continue
+                if want is not None and norm_term(row.get("term")) != want:
+                    continue
+                if action is not None and row.get("action") != action:
+                    continue
+                st["events"] += 1
+                yield row
@@ -0,0 +1,276 @@
+from __future__ import annotations
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+import base64, bisect, hashlib, json, os
+
+from app.data.snomed_loader import get_snomed_db
+from app.data.loinc_loader import _load_alias_map
+from app.extensions.canonical_loinc import _load_canonical
+from app.data.code_index import SNOMED_SYSTEM, LOINC_SYSTEM, get_snomed_code_index, get_loinc_code_index
+from app.data.code_systems import allowed_systems, data_version
+from app.learning import learned_snapshot
+
+LAY_TERM_SYSTEM = "urn:akashic:lay-term"
+EXPORT_BASE_URL = os.getenv("EXPORT_BASE_URL", "urn:akashic")
+EXPORT_PAGE_ROWS = int(os.getenv("EXPORT_PAGE_ROWS", "10000"))
+_RESOURCE_ROWS = 500  # elements/concepts per ConceptMap/ValueSet entry
+
+# A source yields (sort key, group, row) in key order. `group` splits resources:
+# rows of one resource share it. Cursors record (source, last key), so a page
+# resumes correctly even if entries were added or removed in between.
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def encode_cursor(source: str, key: str) -> str:
+    raw = _dumps({"s": source, "k": key}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(source, last key); raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        obj = json.loads(raw)
+        return str(obj["s"]), str(obj["k"])
+    except Exception:
+        raise ValueError("invalid cursor")
+
+_versioned_cache: Dict[str, Tuple[Any, Any]] = {}
+
+def _versioned(name: str, version: Any, build: Callable[[], Any]) -> Any:
+    """build() for one source, rebuilt only when its data version changes. A learned
+    snapshot is its own version: every write swaps in a new map."""
+    hit = _versioned_cache.get(name)
+    if hit is not None and (hit[0] is version or hit[0] == version):
+        return hit[1]
+    value = build()
+    _versioned_cache[name] = (version, value)
+    return value
+
+def _sorted(name: str, version: Any, keys_fn: Callable[[], Any]) -> List[str]:
+    """Sorted keys of one source, re-sorted only when its data version changes."""
+    return _versioned(name, version, lambda: sorted(keys_fn()))
+
+def _prefix_start(keys: List[str], start: int, prefix: Optional[str]) -> int:
+    """Keys are sorted, so one context's `ctx::` keys are contiguous: skip to them."""
+    return max(start, bisect.bisect_left(keys, prefix)) if prefix else start
+
+def _base_version() -> Any:
+    return data_version()
+
+def _ctx(context: Optional[str]) -> Optional[str]:
+    return (context or "").strip().lower() or None
+
+# ---- ConceptMap sources (rows: lay term -> code) ---------------------------------
+
+def _learned_keys(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    return data, sorted(data)
+
+def _cm_learned(context: Optional[str]):
+    snap = learned_snapshot()
+    data, keys = _versioned("learned", snap, lambda: _learned_keys(snap))
+    prefix = f"{context}::" if context else None
+    def rows(start: int):
+        for k in keys[_prefix_start(keys, start, prefix):]:
+            if prefix and not k.startswith(prefix):
+                break
+            e = data.get(k)
+            if not e or not e.get("snomed_code"):
+                continue
+            ctx = (e.get("context") or "global").strip().lower()
+            yield k, ctx, {"term": e.get("term") or k.split("::", 1)[-1], "system": SNOMED_SYSTEM,
+                           "code": e["snomed_code"], "display": e.get("snomed_display")}
+    return keys, rows
+
+def _cm_snomed(context: Optional[str]):
+    db, alias_index = get_snomed_db()
+    keys = _sorted("snomed_terms", _base_version(), lambda: list(alias_index.keys()))
+    def rows(start: int):
+        for k in keys[start:]:
+            pk = alias_index.get(k)
+            e = db.get(pk) if pk else None
+            if e:
+                yield k, None, {"term": k, "system": SNOMED_SYSTEM, "code": e["code"], "display": e["display"]}
+    return keys, rows
+
+def _cm_loinc(context: Optional[str]):
+    aliases, canonical = _load_alias_map(), _load_canonical()
+    keys = _sorted("loinc_terms", _base_version(), lambda: set(aliases) | set(canonical))
+    def rows(start: int):
+        for k in keys[start:]:
+            code = canonical.get(aliases.get(k, k))
+            if code:
+                yield k, None, {"term": k, "system": LOINC_SYSTEM, "code": code, "display": None}
+    return keys, rows
+
+# ---- ValueSet sources (rows: code -> display + lay designations) -----------------
+
+def _vs_index(name: str, system: str, index_fn):
+    def source(context: Optional[str]):
+        idx = index_fn()
+        keys = _sorted(name, _base_version(), lambda: list(idx.keys()))
+        def rows(start: int):
+            for k in keys[start:]:
+                rec = idx.get(k)
+                if rec:
+                    yield k, None, {"system": system, "code": k, "display": rec["display"],
+                                    "terms": [rec["term"]] + rec["aliases"]}
+        return keys, rows
+    return source
+
+def _learned_codes(data: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Learned entries grouped by `ctx::code` for every context, plus the sorted keys."""
+    by_code: Dict[str, Dict[str, Any]] = {}
+    for k, e in data.items():
+        if not e.get("snomed_code"):
+            continue
+        ctx = (e.get("context") or "global").strip().lower()
+        gk = f"{ctx}::{e['snomed_code']}"
+        rec = by_code.setdefault(gk, {"system": SNOMED_SYSTEM, "code": e["snomed_code"],
+                                      "display": e.get("snomed_display"), "terms": [], "ctx": ctx})
+        rec["terms"].append(e.get("term") or k.split("::", 1)[-1])
+    return by_code, sorted(by_code)
+
+def _vs_learned(context: Optional[str]):
+    snap = learned_snapshot()
+    by_code, keys = _versioned("learned_codes", snap, lambda: _learned_codes(snap))
+    prefix = f"{context}::" if context else None
+    def rows(start: int):
+        for k in keys[_prefix_start(keys, start, prefix):]:
+            if prefix and not k.startswith(prefix):
+                break
+            rec = dict(by_code[k])
+            yield k, rec.pop("ctx"), rec
+    return keys, rows
+
+_SOURCES = {
+    "conceptmap": (("learned", _cm_learned, None), ("snomed", _cm_snomed, "snomed"), ("loinc", _cm_loinc, "loinc")),
+    "valueset": (("learned", _vs_learned, None),
+                 ("snomed", _vs_index("snomed_codes", SNOMED_SYSTEM, get_snomed_code_index), "snomed"),
+                 ("loinc", _vs_index("loinc_codes", LOINC_SYSTEM, get_loinc_code_index), "loinc")),
+}
+
+def _iter_rows(kind: str, context: Optional[str], start_src: str, start_key: Optional[str]):
+    """(source, key, group, row) across sources in order, resuming after (start_src, start_key).
+    With a context, base terminologies follow domain_profile.json (lab.test -> LOINC only)."""
+    sources = _SOURCES[kind]
+    allowed = allowed_systems(context, "auto") if context else None
+    names = [s[0] for s in sources]
+    for name, fn, system in sources[names.index(start_src):]:
+        if system and allowed is not None and system not in allowed:
+            continue
+        keys, rows = fn(context)
+        start = bisect.bisect_right(keys, start_key) if (name == start_src and start_key is not None) else 0
+        for key, group, row in rows(start):
+            yield name, key, group, row
+
+# ---- Resources --------------------------------------------------------------------
+
+def _lay_system(group: Optional[str]) -> str:
+    return f"{LAY_TERM_SYSTEM}:{group}" if group else LAY_TERM_SYSTEM
+
+def _resource_id(source: str, first_key: str) -> str:
+    """Stable across pages and runs: derived from the resource's first row key."""
+    return f"akashic-{source}-{hashlib.sha1(first_key.encode('utf-8')).hexdigest()[:16]}"
+
+def _conceptmap(source: str, group: Optional[str], first_key: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    target = rows[0]["system"]
+    cm_id = _resource_id(source, first_key)
+    return {
+        "resourceType": "ConceptMap",
+        "id": cm_id,
+        "url": f"{EXPORT_BASE_URL}/ConceptMap/{cm_id}",
+        "status": "active",
+        "sourceUri": _lay_system(group),
+        "targetUri": target,
+        "group": [{
+            "source": _lay_system(group),
+            "target": target,
+            "element": [{
+                "code": r["term"],
+                "target": [{k: v for k, v in (("code", r["code"]), ("display", r["display"]),
+                                               ("equivalence", "equivalent")) if v}],
+            } for r in rows],
+        }],
+    }
+
+def _valueset(source: str, group: Optional[str], first_key: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    vs_id = _resource_id(source, first_key)
+    concepts = []
+    for r in rows:
+        c: Dict[str, Any] = {"code": r["code"]}
+        if r["display"]:
+            c["display"] = r["display"]
+        if r["terms"]:
+            c["designation"] = [{"use": {"system": LAY_TERM_SYSTEM, "code": "lay"}, "value": t} for t in r["terms"]]
+        concepts.append(c)
+    return {
+        "resourceType": "ValueSet",
+        "id": vs_id,
+        "url": f"{EXPORT_BASE_URL}/ValueSet/{vs_id}",
+        "status": "active",
+        "compose": {"include": [{"system": rows[0]["system"], "concept": concepts}]},
+    }
+
+_BUILDERS = {"conceptmap": _conceptmap, "valueset": _valueset}
+
+def iter_resources(kind: str, context: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: int = EXPORT_PAGE_ROWS) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """Yield (resource, None) for each ConceptMap/ValueSet, then (None, next_cursor) once
+    at the end; next_cursor is None when the export is complete. `limit` caps rows per
+    page (0 = everything). Raises ValueError for an unknown kind or bad cursor up front."""
+    if kind not in _SOURCES:
+        raise ValueError(f"unknown export '{kind}'")
+    start_src, start_key = decode_cursor(cursor) if cursor else (_SOURCES[kind][0][0], None)
+    if start_src not in [s[0] for s in _SOURCES[kind]]:
+        raise ValueError("invalid cursor")
+    return _pack(kind, _iter_rows(kind, _ctx(context), start_src, start_key), limit)
+
+def _pack(kind: str, rows_it, limit: int):
+    build = _BUILDERS[kind]
+    buf: List[Dict[str, Any]] = []
+    cur: Optional[Tuple[str, Optional[str]]] = None
+    first = ""
+    last: Optional[Tuple[str, str]] = None
+    emitted = 0
+    for source, key, group, row in rows_it:
+        if limit and emitted >= limit:
+            if buf:
+                yield build(cur[0], cur[1], first, buf), None
+            yield None, encode_cursor(*last)
+            return
+        if cur != (source, group) or len(buf) >= _RESOURCE_ROWS:
+            if buf:
+                yield build(cur[0], cur[1], first, buf), None
+            buf, cur, first = [], (source, group), key
+        buf.append(row)
+        emitted += 1
+        last = (source, key)
+    if buf:
+        yield build(cur[0], cur[1], first, buf), None
+    yield None, None
+
+# ---- Serialization ----------------------------------------------------------------
+
+def stream_bundle(resources, fmt: str, next_url: Callable[[str], str]) -> Iterator[str]:
+    """Serialize iter_resources() output incrementally as a FHIR Bundle (type
+    collection). json: one Bundle document, entries streamed, `link` last.
+    ndjson: one resource per line, then an entry-less Bundle line carrying the `next` link."""
+    total = 0
+    nxt = None
+    if fmt == "json":
+        yield '{"resourceType":"Bundle","type":"collection","entry":['
+    for res, cursor in resources:
+        if res is None:
+            nxt = cursor
+            continue
+        if fmt == "json":
+            yield ("," if total else "") + _dumps({"fullUrl": res["url"], "resource": res})
+        else:
+            yield _dumps(res) + "\n"
+        total += 1
+    link = [{"relation": "next", "url": next_url(nxt)}] if nxt else []
+    if fmt == "json":
+        yield '],"link":' + _dumps(link) + "}\n"
+    else:
+        yield _dumps({"resourceType": "Bundle", "type": "collection", "link": link}) + "\n"
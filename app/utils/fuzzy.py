@@ -0,0 +1,30 @@
+from __future__ import annotations
+from typing import List, Sequence, Tuple
+import difflib
+
+try:  # optional: C-speed matching over large vocabularies
+    from rapidfuzz import fuzz as _rf_fuzz, process as _rf_process
+except ImportError:  # pragma: no cover - depends on the environment
+    _rf_process = None
+
+BACKEND = "rapidfuzz" if _rf_process is not None else "difflib"
+
+
+def fuzzy_matches(term: str, choices: Sequence[str], limit: int, cutoff: int) -> List[Tuple[str, int]]:
+    """Best `limit` (choice, score 0-100) pairs with score >= cutoff, best first.
+
+    Both backends score normalized edit similarity (rapidfuzz's ratio is difflib's
+    SequenceMatcher ratio computed exactly, in C); word order is the caller's job.
+    """
+    if not term or not choices or limit <= 0:
+        return []
+    if _rf_process is not None:
+        return [(c, int(round(s))) for c, s, _ in
+                _rf_process.extract(term, choices, scorer=_rf_fuzz.ratio, limit=limit, score_cutoff=cutoff)]
+    out = []
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(term)
+    for c in difflib.get_close_matches(term, choices, n=limit, cutoff=max(cutoff, 1) / 100.0):
+        matcher.set_seq1(c)
+        out.append((c, int(round(matcher.ratio() * 100))))
+    return out
@@ -0,0 +1,46 @@
+from __future__ import annotations
+from typing import Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, functools, os, threading
+
+_IO_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "2"))
+_CPU_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(os.cpu_count() or 1)))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for file I/O (learned store, logs, dataset loads), separate from
+    Starlette's request threadpool so slow disk never starves request handlers."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_IO_WORKERS, thread_name_prefix="akashic-io")
+    return _executor
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await fn(*args, **kwargs) on the I/O executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(fn, *args, **kwargs))
+
+def submit_io(fn: Callable[..., Any], *args, **kwargs):
+    """Fire-and-forget fn on the I/O executor (usable from sync or async code)."""
+    return get_io_executor().submit(fn, *args, **kwargs)
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Pool for CPU-bound request work (fuzzy/technical scans, profiled lookups), sized
+    to the cores and kept apart from the I/O pool so scans never queue behind (or in
+    front of) learned-store writes, journal ops and L2 round-trips."""
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _lock:
+            if _cpu_executor is None:
+                _cpu_executor = ThreadPoolExecutor(max_workers=_CPU_WORKERS, thread_name_prefix="akashic-cpu")
+    return _cpu_executor
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await fn(*args, **kwargs) on the CPU executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(fn, *args, **kwargs))
@@ -1,6 +1,8 @@
 import os, io, json, tempfile, time, hashlib
 from contextlib import contextmanager
 
+from app.utils.audit_log import get_audit_log
+
 _DEF_DATA_DIR = os.environ.get("DATA_DIR", os.path.join(os.getcwd(), "data"))
 
 @contextmanager
@@ -93,18 +95,15 @@ def update_learned_mapping(term: str, snomed_code: str, snomed_display: str, lay
         }
         _write_json_atomic(learned_path, store)
 
-        # append JSONL log for the day
-        today = time.strftime("%Y-%m-%d")
-        log_file = os.path.join(logs_dir, f"{today}.jsonl")
-        with io.open(log_file, "a", encoding="utf-8") as lf:
-            lf.write(json.dumps({
-                "ts": _now_iso(),
-                "action": "api_learn",
-                "term": term_norm,
-                "snomed_code": str(snomed_code),
-                "snomed_display": snomed_display,
-                "lay_text": lay_text or term_norm,
-            }, ensure_ascii=False) + "\n")
+        # audit event (buffered; see app/utils/audit_log.py)
+        get_audit_log(logs_dir).append({
+            "ts": _now_iso(),
+            "action": "api_learn",
+            "term": term_norm,
+            "snomed_code": str(snomed_code),
+            "snomed_display": snomed_display,
+            "lay_text": lay_text or term_norm,
+        })
 
     return store[term_norm]
 
@@ -122,15 +121,10 @@ def unlearn_mapping(term: str, data_dir: str = _DEF_DATA_DIR, keep_aliases: bool
             del store[term_norm]
             _write_json_atomic(learned_path, store)
         # log
-        logs_dir = os.path.join(data_dir, "logs", "learned")
-        _ensure_dir(logs_dir)
-        today = time.strftime("%Y-%m-%d")
-        log_file = os.path.join(logs_dir, f"{today}.jsonl")
-        with io.open(log_file, "a", encoding="utf-8") as lf:
-            lf.write(json.dumps({
-                "ts": _now_iso(),
-                "action": "api_unlearn",
-                "term": term_norm,
-                "kept_aliases": keep_aliases,
-            }) + "\n")
+        get_audit_log(os.path.join(data_dir, "logs", "learned")).append({
+            "ts": _now_iso(),
+            "action": "api_unlearn",
+            "term": term_norm,
+            "kept_aliases": keep_aliases,
+        })
     return existed
@@ -0,0 +1,362 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit, unquote
+import hashlib, json, os, socket, threading, time
+
+from app.utils.io_executor import run_io, submit_io
+
+_L1_SIZE = int(os.getenv("LOOKUP_CACHE_L1_SIZE", "10000"))  # 0 = no L1
+_L2_URL = os.getenv("LOOKUP_CACHE_L2", "")  # redis://host:6379/0 | file:///path | "" = none
+_L2_TTL_S = int(os.getenv("LOOKUP_CACHE_L2_TTL_S", "86400"))
+_L2_TIMEOUT_S = int(os.getenv("LOOKUP_CACHE_L2_TIMEOUT_MS", "50")) / 1000.0
+_L2_RETRY_S = float(os.getenv("LOOKUP_CACHE_L2_RETRY_S", "5"))
+_DATASET_VERSION = os.getenv("DATASET_VERSION", "")  # stands in for the base-file digests
+_KEY_PREFIX = "akashic:lookup"
+
+
+class L2Unavailable(Exception):
+    pass
+
+
+# ---- L2 backends --------------------------------------------------------------------
+# get(key) -> bytes | None, set(key, value, ttl_s). Raise L2Unavailable when the store
+# can't be reached; the cache then skips L2 for LOOKUP_CACHE_L2_RETRY_S.
+
+class RedisBackend:
+    """Minimal RESP2 client (GET / SET EX), one socket per thread, no dependencies.
+    redis://[:password@]host[:port][/db]"""
+    name = "redis"
+
+    def __init__(self, url: str, timeout: float = _L2_TIMEOUT_S):
+        u = urlsplit(url)
+        self.host, self.port = u.hostname or "127.0.0.1", u.port or 6379
+        self.password = unquote(u.password) if u.password else None
+        self.db = int(u.path.strip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.rf = sock, sock.makefile("rb")
+        if self.password:
+            self._call(b"AUTH", self.password.encode())
+        if self.db:
+            self._call(b"SELECT", str(self.db).encode())
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = self._local.rf = None
+
+    def _reply(self):
+        line = self._local.rf.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise L2Unavailable(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._local.rf.read(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise ConnectionError(f"bad reply {line[:20]!r}")
+
+    def _call(self, *args: bytes):
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        self._local.sock.sendall(b"".join(out))
+        return self._reply()
+
+    def command(self, *args: bytes):
+        try:
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            return self._call(*args)
+        except (OSError, ValueError) as e:
+            self._close()
+            raise L2Unavailable(str(e) or type(e).__name__)
+        except L2Unavailable:
+            self._close()
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command(b"GET", key.encode())
+
+    def set(self, key: str, value: bytes, ttl_s: int):
+        if ttl_s > 0:
+            self.command(b"SET", key.encode(), value, b"EX", str(ttl_s).encode())
+        else:
+            self.command(b"SET", key.encode(), value)
+
+
+class DiskBackend:
+    """One file per key under a directory (local disk, or a shared EFS mount).
+    File = expiry epoch seconds (0 = never) + newline + value; written tmp + rename."""
+    name = "disk"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        h = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, h[:2], h[2:])
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise L2Unavailable(str(e))
+        head, _, value = raw.partition(b"\n")
+        try:
+            expires = int(head)
+        except ValueError:
+            return None
+        if expires and expires < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key: str, value: bytes, ttl_s: int):
+        path = self._path(key)
+        expires = int(time.time()) + ttl_s if ttl_s > 0 else 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(b"%d\n" % expires + value)
+            os.replace(tmp, path)
+        except OSError as e:
+            raise L2Unavailable(str(e))
+
+
+def make_backend(url: str):
+    """Backend for LOOKUP_CACHE_L2, or None when unset."""
+    if not url:
+        return None
+    scheme = urlsplit(url).scheme
+    if scheme in ("redis", "tcp"):
+        return RedisBackend(url)
+    if scheme == "file":
+        return DiskBackend(unquote(urlsplit(url).path))
+    if scheme == "":
+        return DiskBackend(url)
+    raise ValueError(f"unsupported LOOKUP_CACHE_L2 '{url}'")
+
+
+# ---- Metrics ------------------------------------------------------------------------
+
+class TierStats:
+    """Counters plus the last 1024 get latencies (µs) for percentiles."""
+
+    def __init__(self):
+        self.hits = self.misses = self.errors = self.sets = 0
+        self._lat: deque = deque(maxlen=1024)
+
+    def observe(self, t0: float):
+        self._lat.append((time.perf_counter() - t0) * 1e6)
+
+    def to_dict(self) -> Dict[str, Any]:
+        lat = sorted(self._lat)
+        total = self.hits + self.misses
+        out: Dict[str, Any] = {"hits": self.hits, "misses": self.misses, "errors": self.errors, "sets": self.sets,
+                               "hit_ratio": round(self.hits / total, 4) if total else None}
+        if lat:
+            out["get_us"] = {"mean": round(sum(lat) / len(lat), 1), "p50": round(lat[len(lat) // 2], 1),
+                             "p99": round(lat[min(len(lat) - 1, int(len(lat) * 0.99))], 1)}
+        return out
+
+
+# ---- Cache --------------------------------------------------------------------------
+
+class LookupCache:
+    """Resolved /lookup bodies: in-process LRU (L1) over an optional shared store (L2).
+
+    Entries are (body, miss) where `miss` says the lookup counts as a miss for the
+    miss tracker. Keys carry the dataset namespace (see resolver.cache_key), so a new
+    dataset simply stops hitting old entries. L2 errors never fail a request: the
+    lookup is computed as if L2 were absent and L2 is skipped for a retry interval.
+    """
+
+    def __init__(self, l1_size: int = _L1_SIZE, backend=None, ttl_s: int = _L2_TTL_S,
+                 retry_s: float = _L2_RETRY_S):
+        self.l1_size = l1_size
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self.retry_s = retry_s
+        self._l1: "OrderedDict[str, Tuple[Dict[str, Any], bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self.l1 = TierStats()
+        self.l2 = TierStats()
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.l1_size > 0 or self.backend is not None
+
+    # L1 ----------------------------------------------------------------------------
+
+    def get_l1(self, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        if self.l1_size <= 0:
+            return None
+        t0 = time.perf_counter()
+        with self._lock:
+            hit = self._l1.get(key)
+            if hit is not None:
+                self._l1.move_to_end(key)
+                self.l1.hits += 1
+            else:
+                self.l1.misses += 1
+        self.l1.observe(t0)
+        return hit
+
+    def put_l1(self, key: str, body: Dict[str, Any], miss: bool):
+        if self.l1_size <= 0:
+            return
+        with self._lock:
+            self._l1[key] = (body, miss)
+            self._l1.move_to_end(key)
+            self.l1.sets += 1
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+                self.evictions += 1
+
+    # L2 ----------------------------------------------------------------------------
+
+    def l2_available(self) -> bool:
+        return self.backend is not None and time.monotonic() >= self._down_until
+
+    def _l2_failed(self):
+        self.l2.errors += 1
+        self._down_until = time.monotonic() + self.retry_s
+
+    def get_l2(self, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Blocking L2 read (run it on the I/O executor); None on miss or error."""
+        if not self.l2_available():
+            return None
+        t0 = time.perf_counter()
+        try:
+            raw = self.backend.get(key)
+        except L2Unavailable:
+            self._l2_failed()
+            return None
+        self.l2.observe(t0)
+        if raw is None:
+            self.l2.misses += 1
+            return None
+        try:
+            entry = json.loads(raw)
+            hit = (entry["b"], bool(entry["m"]))
+        except (ValueError, KeyError, TypeError):
+            self.l2.misses += 1
+            return None
+        self.l2.hits += 1
+        return hit
+
+    def put_l2(self, key: str, body: Dict[str, Any], miss: bool):
+        if not self.l2_available():
+            return
+        try:
+            value = json.dumps({"b": body, "m": miss}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self.backend.set(key, value, self.ttl_s)
+            self.l2.sets += 1
+        except L2Unavailable:
+            self._l2_failed()
+
+    async def get_l2_async(self, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        if not self.l2_available():
+            return None
+        return await run_io(self.get_l2, key)
+
+    def put_l2_background(self, key: str, body: Dict[str, Any], miss: bool):
+        if self.l2_available():
+            submit_io(self.put_l2, key, body, miss)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._l1)
+        return {
+            "l1": {**self.l1.to_dict(), "size": size, "max_size": self.l1_size, "evictions": self.evictions},
+            "l2": {**self.l2.to_dict(), "backend": self.backend.name if self.backend else None,
+                   "available": self.l2_available(), "ttl_s": self.ttl_s},
+        }
+
+
+_cache: Optional[LookupCache] = None
+_cache_lock = threading.Lock()
+
+def get_lookup_cache() -> LookupCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LookupCache(backend=make_backend(_L2_URL))
+    return _cache
+
+
+# ---- Dataset namespace ----------------------------------------------------------------
+
+_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}  # path -> ((size, mtime_ns), sha1)
+
+def _file_digest(path: str, size: Optional[int] = None) -> str:
+    """sha1 of the whole file (or its first `size` bytes), so any content edit moves the
+    namespace. Stable across hosts (unlike mtime or inode); remembered per (size, mtime)
+    so a version bump rehashes only files that changed. '-' for a missing file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    stamp = (st.st_size if size is None else size, st.st_mtime_ns)
+    memo = _digests.get(path)
+    if memo is not None and memo[0] == stamp:
+        return memo[1]
+    h = hashlib.sha1()
+    remaining = stamp[0]
+    try:
+        with open(path, "rb") as f:
+            while remaining > 0:
+                chunk = f.read(min(1 << 20, remaining))
+                if not chunk:
+                    break
+                h.update(chunk)
+                remaining -= len(chunk)
+    except OSError:
+        return "-"
+    digest = f"{stamp[0]}:{h.hexdigest()}"
+    _digests[path] = (stamp, digest)
+    return digest
+
+def dataset_fingerprint(paths: List[str], journal: Tuple[str, int], build: str) -> str:
+    """Hash of the build, the base files and the applied journal prefix. DATASET_VERSION
+    (an explicit release id) stands in for the base-file digests only: live edits still
+    move the journal, so they still change the namespace. Blocking: reads the files."""
+    base = [_DATASET_VERSION] if _DATASET_VERSION else [_file_digest(p) for p in paths]
+    parts = [build] + base + [_file_digest(*journal) if journal[1] > 0 else "0"]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,239 @@
+from __future__ import annotations
+from typing import Dict, Any, List, Optional, Tuple
+import os, json, glob, heapq, socket, threading, time
+
+from app.utils.io_executor import submit_io
+
+_MISS_DIR = os.getenv("MISS_TRACKER_DIR", "data/logs/misses")
+_MISS_CAPACITY = int(os.getenv("MISS_TRACKER_CAPACITY", "2000"))
+_MISS_PERSIST_S = float(os.getenv("MISS_TRACKER_PERSIST_S", "60"))
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch (Metwally et al.) over string keys.
+
+    Holds at most `capacity` counters. Every key with true frequency > total/capacity
+    is guaranteed to be present; each reported count over-estimates the true count
+    by at most its `error` (count - error is a lower bound).
+    """
+
+    def __init__(self, capacity: int = _MISS_CAPACITY):
+        self.capacity = max(1, int(capacity))
+        self.total = 0
+        self.counts: Dict[str, List[int]] = {}  # key -> [count, error]
+        self._heap: List[Tuple[int, str]] = []   # lazy min-heap of (count, key)
+
+    def _min_entry(self) -> Tuple[int, str]:
+        while True:
+            c, k = self._heap[0]
+            cur = self.counts.get(k)
+            if cur is not None and cur[0] == c:
+                return c, k
+            heapq.heappop(self._heap)
+
+    def _rebuild_heap(self):
+        self._heap = [(v[0], k) for k, v in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def offer(self, key: str, n: int = 1):
+        self.total += n
+        cur = self.counts.get(key)
+        if cur is not None:
+            cur[0] += n
+        elif len(self.counts) < self.capacity:
+            cur = self.counts[key] = [n, 0]
+        else:
+            c_min, k_min = self._min_entry()
+            heapq.heappop(self._heap)
+            del self.counts[k_min]
+            cur = self.counts[key] = [c_min + n, c_min]
+        heapq.heappush(self._heap, (cur[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def min_count(self) -> int:
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(v[0] for v in self.counts.values())
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combine two sketches (Agarwal et al. mergeable summaries). A key missing from
+        one side may have had up to that side's minimum count there, so it is added to
+        both count and error. Keeps the top `capacity` counters."""
+        m1, m2 = self.min_count(), other.min_count()
+        merged: Dict[str, List[int]] = {}
+        for k in set(self.counts) | set(other.counts):
+            a = self.counts.get(k, [m1, m1])
+            b = other.counts.get(k, [m2, m2])
+            merged[k] = [a[0] + b[0], a[1] + b[1]]
+        out = SpaceSaving(max(self.capacity, other.capacity))
+        out.total = self.total + other.total
+        keep = heapq.nlargest(out.capacity, merged.items(), key=lambda kv: kv[1][0])
+        out.counts = {k: v for k, v in keep}
+        out._rebuild_heap()
+        return out
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """(key, count, error) for the n largest counters."""
+        items = heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1][0])
+        return [(k, v[0], v[1]) for k, v in items]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "total": self.total, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "SpaceSaving":
+        s = cls(int(raw.get("capacity") or _MISS_CAPACITY))
+        s.total = int(raw.get("total") or 0)
+        for k, v in (raw.get("counts") or {}).items():
+            if isinstance(v, list) and len(v) == 2:
+                s.counts[str(k)] = [int(v[0]), int(v[1])]
+        s._rebuild_heap()
+        return s
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+def _miss_key(term: str, context: Optional[str]) -> str:
+    ctx = (context or "global").strip().lower()
+    return f"{ctx}::{term.strip().lower()}"
+
+class MissTracker:
+    """Process-wide Space-Saving sketch of /lookup misses keyed `context::term`.
+
+    Each process snapshots its own sketch to MISS_TRACKER_DIR/<host>-<pid>.json at most
+    every MISS_TRACKER_PERSIST_S seconds (and at shutdown); readers merge all snapshots,
+    so workers and restarts never double count. On persist, snapshots left by dead
+    processes on the same host are folded into this one and deleted, so the directory
+    holds one file per live worker rather than one per pid ever started.
+    """
+
+    def __init__(self, directory: str = _MISS_DIR, capacity: int = _MISS_CAPACITY,
+                 persist_s: float = _MISS_PERSIST_S):
+        self.directory = directory
+        self.persist_s = persist_s
+        self.sketch = SpaceSaving(capacity)
+        self._lock = threading.Lock()
+        self._last_persist = time.monotonic()
+        self._dirty = False
+        self.path = os.path.join(directory, f"{socket.gethostname()}-{os.getpid()}.json")
+
+    def record(self, term: str, context: Optional[str] = None):
+        if not (term or "").strip():
+            return
+        with self._lock:
+            self.sketch.offer(_miss_key(term, context))
+            self._dirty = True
+            due = self.persist_s > 0 and time.monotonic() - self._last_persist >= self.persist_s
+            if due:
+                self._last_persist = time.monotonic()
+        if due:
+            submit_io(self.persist)
+
+    def _dead_snapshots(self) -> List[str]:
+        host = socket.gethostname()
+        out = []
+        for p in glob.glob(os.path.join(self.directory, f"{glob.escape(host)}-*.json")):
+            h, _, pid = os.path.basename(p)[:-len(".json")].rpartition("-")
+            if h == host and pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                out.append(p)
+        return out
+
+    def _adopt_dead(self) -> List[str]:
+        """Claim (rename) each dead worker's snapshot and merge it into the live sketch.
+        The rename makes the claim exclusive between live workers; persist() deletes
+        the claimed files after writing the merged snapshot."""
+        claims = []
+        for p in self._dead_snapshots():
+            claim = f"{p}.{os.getpid()}.claim"
+            try:
+                os.rename(p, claim)
+            except OSError:
+                continue  # another worker got there first
+            try:
+                with open(claim, "r", encoding="utf-8") as f:
+                    other = SpaceSaving.from_dict(json.load(f))
+            except (OSError, ValueError):
+                other = None
+            if other is None:
+                try:
+                    os.remove(claim)  # unreadable: nothing to adopt
+                except OSError:
+                    pass
+                continue
+            with self._lock:
+                self.sketch = self.sketch.merge(other)
+                self._dirty = True
+            claims.append(claim)
+        return claims
+
+    def persist(self):
+        """Write this process's snapshot (blocking); record() schedules it on the I/O executor."""
+        claims = self._adopt_dead()
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self.sketch.to_dict(), ensure_ascii=False)
+            self._dirty = False
+            self._last_persist = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # the adopted counts stay in memory for the next persist
+        for claim in claims:
+            try:
+                os.remove(claim)
+            except OSError:
+                pass
+
+    def merged(self) -> SpaceSaving:
+        """Live sketch merged with every other process's persisted snapshot."""
+        with self._lock:
+            out = SpaceSaving.from_dict(json.loads(json.dumps(self.sketch.to_dict())))
+        for p in glob.glob(os.path.join(self.directory, "*.json")):
+            if os.path.abspath(p) == os.path.abspath(self.path):
+                continue
+            try:
+                with open(p, "r", encoding="utf-8") as f:
+                    out = out.merge(SpaceSaving.from_dict(json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def top(self, n: int = 50, context: Optional[str] = None) -> Dict[str, Any]:
+        sk = self.merged()
+        want = (context or "").strip().lower() or None
+        items = []
+        for key, count, error in sk.top(len(sk.counts)):
+            ctx, _, term = key.partition("::")
+            if want and ctx != want:
+                continue
+            items.append({"term": term, "context": ctx, "count": count, "error": error,
+                          "min_count": count - error})
+            if len(items) >= n:
+                break
+        return {
+            "total": sk.total,
+            "capacity": sk.capacity,
+            "error_bound": sk.total // sk.capacity,
+            "items": items,
+        }
+
+_tracker: Optional[MissTracker] = None
+
+def get_miss_tracker() -> MissTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = MissTracker()
+    return _tracker
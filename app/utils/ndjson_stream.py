@@ -0,0 +1,168 @@
+from __future__ import annotations
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Optional, Tuple
+import os, json
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+# Under Lambda (Mangum) the whole response is buffered and capped at ~6 MB, so
+# default to a byte budget there; elsewhere the stream is unbounded.
+_IN_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", "5000000" if _IN_LAMBDA else "0"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", "65536"))
+
+
+_INT_OPTIONS = ("top_k", "score_cutoff", "tech_top_k", "tech_score_cutoff")
+
+def _dumps(row: Dict[str, Any]) -> bytes:
+    return (json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse for bodies produced *from* the request stream.
+
+    Starlette's default (ASGI spec < 2.4) runs a disconnect listener that competes
+    with request.stream() for receive() and can swallow body chunks. Here the
+    handler is the only reader; a disconnect surfaces as ClientDisconnect from
+    request.stream() or an OSError on send.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line: int = STREAM_MAX_LINE_BYTES) -> AsyncIterator[Optional[bytes]]:
+    """Split a byte stream into lines without buffering more than one line.
+    Yields None in place of a line that exceeded max_line (the rest of it is discarded)."""
+    buf = b""
+    overflow = False
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buf += chunk
+        while True:
+            nl = buf.find(b"\n")
+            if nl < 0:
+                break
+            line, buf = buf[:nl], buf[nl + 1:]
+            if overflow:
+                overflow = False
+                yield None
+            else:
+                yield line
+        if len(buf) > max_line:
+            overflow = True
+            buf = b""
+    if overflow:
+        yield None
+    elif buf:
+        yield buf
+
+def parse_line(raw: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Accept {"query": ..., "id": ..., "domain": ..., "top_k": ...}, a JSON string, or plain text.
+    Returns (item, error); blank lines give (None, None)."""
+    text = raw.decode("utf-8", errors="replace").strip()
+    if not text:
+        return None, None
+    if text[0] in "{\"":
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            return None, f"invalid JSON: {e.msg}"
+        if isinstance(obj, str):
+            obj = {"query": obj}
+        if not isinstance(obj, dict):
+            return None, "expected object or string"
+        q = obj.get("query", obj.get("term"))
+        if not isinstance(q, str) or not q.strip():
+            return None, "missing query"
+        if not isinstance(obj.get("include_technical", False), bool):
+            return None, "include_technical must be true or false"
+        obj["query"] = q
+        return obj, None
+    return {"query": text}, None
+
+async def translate_ndjson(
+    chunks: AsyncIterator[bytes],
+    resolve: Callable[..., Awaitable[Dict[str, Any]]],
+    skip: int = 0,
+    progress_every: int = 1000,
+    max_bytes: int = STREAM_MAX_BYTES,
+    chunk_bytes: int = STREAM_CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """Resolve NDJSON input line by line and yield NDJSON output in ~chunk_bytes pieces.
+
+    Input is only pulled as fast as the client drains output (the ASGI send awaits),
+    so memory is bounded by one input line plus one output chunk. `resolve` is awaited
+    per line (resolver.coalesced_lookup in the app), so ranking never runs on the event
+    loop beyond the cheap inline sources. When max_bytes is
+    set and would be exceeded, a "truncated" record carries the `skip` to resume from.
+    Every response carries at least one line, so resuming always makes progress; a
+    single result larger than max_bytes becomes an error record for its line.
+    """
+    out = bytearray()
+    sent = 0
+    line_no = processed = errors = 0
+    truncated = False
+
+    async for raw in iter_lines(chunks):
+        line_no += 1
+        if line_no <= skip:
+            continue
+        if raw is None:
+            item, err = None, f"line exceeds {STREAM_MAX_LINE_BYTES} bytes"
+        else:
+            item, err = parse_line(raw)
+        if item is None and err is None:
+            continue
+        ok = err is None
+        if not ok:
+            row = _dumps({"type": "error", "line": line_no, "error": err})
+        else:
+            try:
+                body = await resolve(
+                    query=item["query"],
+                    domain=item.get("domain") or "auto",
+                    include_technical=item.get("include_technical", False),
+                    context=item.get("context"),
+                    **{k: item[k] for k in _INT_OPTIONS if type(item.get(k)) is int},
+                )
+                rec = {"type": "result", "line": line_no}
+                if "id" in item:
+                    rec["id"] = item["id"]
+                rec.update(body)
+                row = _dumps(rec)
+            except Exception as e:  # keep streaming; report the bad line
+                ok = False
+                row = _dumps({"type": "error", "line": line_no, "error": str(e)})
+
+        if max_bytes and len(row) > max_bytes:
+            # Would never fit, even first in a resumed stream: report it and move on.
+            ok = False
+            row = _dumps({"type": "error", "line": line_no, "error": f"result exceeds {max_bytes} bytes"})
+        if max_bytes and processed + errors and sent + len(out) + len(row) > max_bytes:
+            truncated = True
+            line_no -= 1
+            break
+        if ok:
+            processed += 1
+        else:
+            errors += 1
+        out += row
+        if progress_every and (processed + errors) % progress_every == 0:
+            out += _dumps({"type": "progress", "line": line_no, "processed": processed, "errors": errors})
+        if len(out) >= chunk_bytes:
+            sent += len(out)
+            yield bytes(out)
+            out.clear()
+
+    summary: Dict[str, Any] = {"type": "summary", "lines": line_no, "processed": processed, "errors": errors}
+    if truncated:
+        summary["truncated"] = True
+        summary["next_skip"] = line_no
+    out += _dumps(summary)
+    yield bytes(out)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+from typing import Dict, Any, List, Optional, Callable
+from collections import Counter
+import cProfile, io, pstats, sys, threading, time
+
+
+class StageTimer:
+    """perf_counter_ns stage breakdown. Only constructed for ?profile requests;
+    instrumented code checks `if timer:` so the disabled path costs nothing more."""
+
+    def __init__(self):
+        self.t0 = self._last = time.perf_counter_ns()
+        self.stages: List[Dict[str, Any]] = []
+
+    def mark(self, stage: str):
+        now = time.perf_counter_ns()
+        self.stages.append({"stage": stage, "us": round((now - self._last) / 1000, 1)})
+        self._last = now
+
+    def report(self) -> Dict[str, Any]:
+        return {"mode": "stages", "total_us": round((time.perf_counter_ns() - self.t0) / 1000, 1),
+                "stages": self.stages}
+
+
+def cprofile_call(fn: Callable[..., Any], *args, top: int = 25, **kwargs):
+    """Run fn under cProfile; returns (result, report) with the top entries by cumulative time."""
+    prof = cProfile.Profile()
+    result = prof.runcall(fn, *args, **kwargs)
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top)
+    return result, {"mode": "cprofile", "stats": buf.getvalue()}
+
+
+_SAMPLER_LOCK = threading.Lock()
+
+def _frame_stack(frame) -> List[str]:
+    out = []
+    while frame is not None:
+        code = frame.f_code
+        out.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+def sample_stacks(seconds: float, interval_s: float = 0.005) -> Optional[str]:
+    """Statistical sampler over every thread via sys._current_frames().
+
+    Returns stacks in collapsed flame-graph format ("thread;outer;...;inner count"
+    per line), or None if another sampling run is already in progress. Nothing runs
+    outside an explicit request, so there is no overhead when idle.
+    """
+    if not _SAMPLER_LOCK.acquire(blocking=False):
+        return None
+    try:
+        me = threading.get_ident()
+        names = {}
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _frame_stack(frame)
+                counts[";".join([names.get(ident, str(ident))] + stack)] += 1
+            time.sleep(interval_s)
+        return "\n".join(f"{k} {v}" for k, v in counts.most_common()) + "\n"
+    finally:
+        _SAMPLER_LOCK.release()
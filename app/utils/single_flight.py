@@ -0,0 +1,93 @@
+from __future__ import annotations
+from typing import Dict, Any, Callable, Hashable, Optional, Awaitable, Tuple
+import asyncio, functools, threading
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is in flight
+    wait and get the same result (or exception). Nothing is cached afterwards: the
+    next call after completion runs again. Thread callers use do(); event-loop
+    callers use do_async(), which never blocks the loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, list] = {}  # key -> [Event, result, exc]
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+        try:
+            call[1] = fn(*args, **kwargs)
+            return call[1]
+        except BaseException as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call[0].set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result, shared): shared is True for callers that joined another caller's
+        in-flight execution, False for the one that ran fn."""
+        fut = self._futures.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return await asyncio.shield(fut), True
+        self.executions += 1
+        fut = self._futures[key] = asyncio.ensure_future(fn())
+
+        def _done(f):
+            if self._futures.get(key) is f:
+                del self._futures[key]
+        fut.add_done_callback(_done)
+        return await asyncio.shield(fut), False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._futures),
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+def get_group(name: str) -> SingleFlight:
+    g = _groups.get(name)
+    if g is None:
+        with _groups_lock:
+            g = _groups.setdefault(name, SingleFlight(name))
+    return g
+
+def coalesced(name: str, group: str = "loaders"):
+    """Decorator for zero-arg loaders, placed under @lru_cache: on a cold cache every
+    thread misses the lru_cache at once; this makes one of them load and the rest wait."""
+    def wrap(fn: Callable[[], Any]) -> Callable[[], Any]:
+        @functools.wraps(fn)
+        def inner():
+            return get_group(group).do(name, fn)
+        return inner
+    return wrap
+
+def single_flight_stats() -> Dict[str, Any]:
+    return {name: g.stats() for name, g in sorted(_groups.items())}
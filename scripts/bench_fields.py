@@ -0,0 +1,136 @@
+"""Payload size and CPU per query for /lookup response shapes: the full body vs
+`fields=snomed,loinc` vs `format=minimal`, on three paths:
+
+  lookup  GET /lookup, one request per query (ASGI in-process, no sockets)
+  stream  one POST /api/translate/stream carrying every query
+  batch   lookup_response() + json.dumps per query, as offline/batch callers do
+
+    python scripts/gen_synthetic.py -o /tmp/synth --aliases 200000
+    python scripts/bench_fields.py --data /tmp/synth -n 5000
+
+Queries are Zipf-sampled from the dataset vocabulary (see loadtest.py). Every query is
+resolved once before timing, so all modes see warm indexes. --top-k defaults to 1 so
+exact hits skip the fuzzy scan and assembly/serialization cost isn't drowned out by
+ranking (pass --top-k 5 for the default /lookup mix). Prints one JSON report.
+"""
+import argparse, asyncio, json, os, random, sys, time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadtest import Zipf, data_env, vocabulary  # noqa: E402
+
+MODES = {
+    "full": {},
+    "fields": {"fields": "snomed,loinc"},
+    "minimal": {"format": "minimal"},
+}
+
+async def asgi_call(app, method: str, path: str, body: bytes = b"") -> bytes:
+    """One request through the ASGI app; returns the response body."""
+    p, _, qs = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": p, "raw_path": p.encode(),
+        "query_string": qs.encode(), "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    chunks = []
+    sent = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(msg):
+        if msg["type"] == "http.response.body":
+            chunks.append(msg.get("body", b""))
+            if not msg.get("more_body"):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return b"".join(chunks)
+
+def _qs(params: dict) -> str:
+    return "".join(f"&{k}={quote(v)}" for k, v in params.items())
+
+def _measure(fn):
+    c0, w0 = time.process_time(), time.perf_counter()
+    nbytes = fn()
+    return time.process_time() - c0, time.perf_counter() - w0, nbytes
+
+def bench_lookup(app, queries, params, top_k):
+    async def go():
+        n = 0
+        for q in queries:
+            n += len(await asgi_call(app, "GET", f"/lookup?top_k={top_k}&query=" + quote(q) + _qs(params)))
+        return n
+    return _measure(lambda: asyncio.run(go()))
+
+def bench_stream(app, queries, params, top_k):
+    body = "".join(json.dumps({"query": q, "top_k": top_k}) + "\n" for q in queries).encode()
+    path = "/api/translate/stream?progress_every=0" + _qs(params)
+    return _measure(lambda: len(asyncio.run(asgi_call(app, "POST", path, body))))
+
+def bench_batch(queries, params, top_k):
+    from app.resolver import lookup_response, parse_fields
+    fields = parse_fields(params.get("fields"), params.get("format"))
+    def go():
+        return sum(len(json.dumps(lookup_response(q, top_k=top_k, fields=fields), ensure_ascii=False, separators=(",", ":")))
+                   for q in queries)
+    return _measure(go)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", required=True, help="Directory written by scripts/gen_synthetic.py")
+    ap.add_argument("-n", "--queries", type=int, default=2000)
+    ap.add_argument("--top-k", type=int, default=1)
+    ap.add_argument("--rounds", type=int, default=3, help="Best of N per path/mode")
+    ap.add_argument("--miss-ratio", type=float, default=0.05)
+    ap.add_argument("--zipf-s", type=float, default=1.1)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    env = data_env(os.path.abspath(args.data))
+    os.environ.update(env, MISS_TRACKER_PERSIST_S="0")
+    terms, _ = vocabulary(env, args.seed)
+    rng, zipf = random.Random(args.seed), Zipf(len(terms), args.zipf_s)
+    queries = [f"zz{rng.randrange(10 ** 6)} unknown" if rng.random() < args.miss_ratio
+               else terms[zipf.sample(rng)] for _ in range(args.queries)]
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.main import app
+    from app.resolver import warm_indexes, lookup_response
+    warm_indexes()
+    for q in queries:
+        lookup_response(q, top_k=args.top_k)
+
+    n = len(queries)
+    report = {"queries": n, "distinct": len(set(queries)), "top_k": args.top_k, "paths": {}}
+    runners = {
+        "lookup": lambda p: bench_lookup(app, queries, p, args.top_k),
+        "stream": lambda p: bench_stream(app, queries, p, args.top_k),
+        "batch": lambda p: bench_batch(queries, p, args.top_k),
+    }
+    for path, run in runners.items():
+        out = {}
+        for mode, params in MODES.items():
+            best = min((run(params) for _ in range(args.rounds)), key=lambda r: r[0])
+            cpu, wall, nbytes = best
+            out[mode] = {"cpu_us_per_query": round(cpu / n * 1e6, 1), "wall_us_per_query": round(wall / n * 1e6, 1),
+                         "bytes_per_query": round(nbytes / n, 1)}
+        full = out["full"]
+        for mode in ("fields", "minimal"):
+            out[mode]["cpu_saved_pct"] = round(100 * (1 - out[mode]["cpu_us_per_query"] / full["cpu_us_per_query"]), 1)
+            out[mode]["bytes_saved_pct"] = round(100 * (1 - out[mode]["bytes_per_query"] / full["bytes_per_query"]), 1)
+        report["paths"][path] = out
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Requests/sec for /lookup on a single uvicorn worker (uvloop + httptools).
+
+Starts uvicorn from --app-dir, drives it with keep-alive connections, prints JSON.
+To compare against an older revision:
+
+    git worktree add /tmp/akashic-before <rev>
+    python scripts/bench_lookup.py --app-dir /tmp/akashic-before
+    python scripts/bench_lookup.py --app-dir .
+"""
+import argparse, asyncio, json, os, socket, subprocess, sys, time
+from urllib.parse import quote
+
+QUERIES = ["heart attack", "tearing", "hgb", "ldl", "high bp", "purple giraffe", "a1c", "mi"]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def wait_up(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            r, w = await asyncio.open_connection("127.0.0.1", port)
+            w.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+async def client(port: int, path_fn, stop_at: float, stats: dict):
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+    i = 0
+    try:
+        while time.perf_counter() < stop_at:
+            path = path_fn(i)
+            i += 1
+            w.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            t0 = time.perf_counter()
+            status = int((await r.readline()).split()[1])
+            length = 0
+            while True:
+                line = await r.readline()
+                if line in (b"\r\n", b""):
+                    break
+                k, _, v = line.decode().partition(":")
+                if k.lower() == "content-length":
+                    length = int(v)
+            await r.readexactly(length)
+            stats["lat"].append(time.perf_counter() - t0)
+            stats["ok" if status == 200 else "err"] += 1
+    finally:
+        w.close()
+
+async def drive(port: int, concurrency: int, seconds: float, warmup: float) -> dict:
+    def path_fn(i):
+        return "/lookup?query=" + quote(QUERIES[i % len(QUERIES)])
+    await wait_up(port)
+    warm = {"lat": [], "ok": 0, "err": 0}
+    await asyncio.gather(*[client(port, path_fn, time.perf_counter() + warmup, warm) for _ in range(concurrency)])
+    stats = {"lat": [], "ok": 0, "err": 0}
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client(port, path_fn, t0 + seconds, stats) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    lat = sorted(stats["lat"]) or [0.0]
+    pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3)
+    return {
+        "requests": stats["ok"] + stats["err"],
+        "errors": stats["err"],
+        "rps": round((stats["ok"] + stats["err"]) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--app-dir", default=".", help="Repo checkout to serve app.main:app from")
+    ap.add_argument("-c", "--concurrency", type=int, default=64)
+    ap.add_argument("-d", "--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    args = ap.parse_args()
+
+    port = free_port()
+    app_dir = os.path.abspath(args.app_dir)
+    env = dict(os.environ, ADMISSION_ENABLED="0", MISS_TRACKER_PERSIST_S="0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", app_dir,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", "1",
+         "--loop", "uvloop", "--http", "httptools", "--log-level", "warning", "--no-access-log"],
+        cwd=app_dir, env=env,
+    )
+    try:
+        res = asyncio.run(drive(port, args.concurrency, args.duration, args.warmup))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    res.update({"app_dir": app_dir, "concurrency": args.concurrency, "duration_s": args.duration})
+    print(json.dumps(res))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Generate a synthetic Akashic dataset at production-like scale.
+
+    python scripts/gen_synthetic.py -o /tmp/akashic-synth --aliases 500000
+
+Writes snomed.json, loinc_aliases.json, loinc_canonical.json, layman_learned.json
+and manifest.json into the output directory. Entries are streamed to disk rather
+than built up as dicts, but every generated term is kept in one set so terms stay
+unique across files: memory grows with the term count (roughly 100 bytes a term,
+~200 MB for 2M aliases). Point the API at them with SNOMED_JSON,
+LOINC_ALIASES_JSON, LOINC_CANONICAL_JSON and LEARNED_JSON (scripts/loadtest.py
+does this for you).
+"""
+import argparse, json, os, random, time
+
+SYLLABLES = ["ab", "ac", "al", "an", "ar", "ba", "be", "bi", "bo", "ca", "ce", "chi", "co", "da",
+             "de", "di", "do", "el", "en", "er", "fa", "fe", "fi", "ga", "ge", "gi", "ha", "he",
+             "hy", "ia", "il", "in", "is", "ka", "ki", "la", "le", "li", "lo", "ma", "me", "mi",
+             "mo", "na", "ne", "ni", "no", "ob", "oc", "ol", "on", "or", "pa", "pe", "pi", "po",
+             "ra", "re", "ri", "ro", "sa", "se", "si", "so", "ta", "te", "ti", "to", "tra", "tu",
+             "ul", "um", "ur", "va", "ve", "vi", "xa", "za", "ze"]
+LAY_WORDS = ["pain", "ache", "swelling", "itch", "rash", "bleeding", "cramp", "burning", "numb",
+             "weak", "sore", "tight", "dizzy", "stiff", "red", "dry", "watery", "sharp", "dull"]
+BODY = ["chest", "head", "eye", "ear", "knee", "back", "stomach", "throat", "skin", "foot",
+        "hand", "neck", "hip", "shoulder", "tooth", "jaw", "wrist", "ankle", "elbow", "leg"]
+CONTEXTS = ["hpi.symptom", "pmh.condition", "procedure", "lab.test", "allergy.substance"]
+
+
+def word(rng: random.Random, lo: int = 2, hi: int = 4) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(lo, hi)))
+
+def loinc_code(n: int) -> str:
+    """NNNNN-C with the LOINC mod-10 check digit."""
+    digits = str(n)
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 0:
+            d *= 2
+            d = d - 9 if d > 9 else d
+        total += d
+    return f"{digits}-{(10 - total % 10) % 10}"
+
+class JsonObjectWriter:
+    """Write one JSON object incrementally: one key per line."""
+
+    def __init__(self, path: str):
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write("{\n")
+        self.first = True
+
+    def put(self, key, value):
+        if not self.first:
+            self.f.write(",\n")
+        self.first = False
+        self.f.write(f"  {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}")
+
+    def close(self):
+        self.f.write("\n}\n")
+        self.f.close()
+
+def unique_term(rng: random.Random, seen: set, kind: str) -> str:
+    while True:
+        if kind == "lay":
+            t = f"{rng.choice(BODY)} {rng.choice(LAY_WORDS)} {word(rng, 1, 2)}"
+        else:
+            t = f"{word(rng)} {word(rng)}"
+        if t not in seen:
+            seen.add(t)
+            return t
+
+def generate(out: str, aliases: int, per_concept: int, loinc_keys: int, loinc_alias_ratio: float,
+             learned: int, seed: int) -> dict:
+    os.makedirs(out, exist_ok=True)
+    rng = random.Random(seed)
+    seen: set = set()
+    t0 = time.perf_counter()
+
+    concepts = max(1, aliases // (per_concept + 1))
+    sn = JsonObjectWriter(os.path.join(out, "snomed.json"))
+    codes = set()
+    code_list = []
+    for _ in range(concepts):
+        primary = unique_term(rng, seen, "lay")
+        code = str(rng.randrange(10 ** 7, 10 ** 9))
+        while code in codes:
+            code = str(rng.randrange(10 ** 7, 10 ** 9))
+        codes.add(code)
+        code_list.append(code)
+        display = primary.split(" ")[0].title() + " " + word(rng).title() + " disorder"
+        sn.put(primary, {"code": code, "display": display,
+                         "aliases": [unique_term(rng, seen, "lay") for _ in range(rng.randint(1, 2 * per_concept - 1))]})
+    sn.close()
+
+    canon = JsonObjectWriter(os.path.join(out, "loinc_canonical.json"))
+    keys = []
+    for i in range(loinc_keys):
+        k = unique_term(rng, seen, "tech")
+        keys.append(k)
+        canon.put(k, loinc_code(10000 + i))
+    canon.close()
+
+    la = JsonObjectWriter(os.path.join(out, "loinc_aliases.json"))
+    n_loinc_aliases = int(loinc_keys * loinc_alias_ratio)
+    for _ in range(n_loinc_aliases):
+        la.put(unique_term(rng, seen, "tech"), rng.choice(keys))
+    la.close()
+
+    le = JsonObjectWriter(os.path.join(out, "layman_learned.json"))
+    for _ in range(learned):
+        ctx = rng.choice(CONTEXTS)
+        term = unique_term(rng, seen, "lay")
+        le.put(f"{ctx}::{term}", {
+            "term": term, "context": ctx, "snomed_code": rng.choice(code_list),
+            "snomed_display": None, "lay_text": term, "updated_utc": "2025-01-01T00:00:00Z",
+        })
+    le.close()
+
+    manifest = {
+        "seed": seed,
+        "snomed_concepts": concepts,
+        "snomed_terms": len(seen) - loinc_keys - n_loinc_aliases - learned,
+        "loinc_canonicals": loinc_keys,
+        "loinc_aliases": n_loinc_aliases,
+        "learned": learned,
+        "files": {
+            "SNOMED_JSON": os.path.join(out, "snomed.json"),
+            "LOINC_ALIASES_JSON": os.path.join(out, "loinc_aliases.json"),
+            "LOINC_CANONICAL_JSON": os.path.join(out, "loinc_canonical.json"),
+            "LEARNED_JSON": os.path.join(out, "layman_learned.json"),
+        },
+        "elapsed_s": round(time.perf_counter() - t0, 2),
+    }
+    with open(os.path.join(out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-o", "--output", required=True, help="Output directory")
+    ap.add_argument("--aliases", type=int, default=10000, help="Total SNOMED lay terms (primaries + aliases)")
+    ap.add_argument("--per-concept", type=int, default=4, help="Mean aliases per SNOMED concept")
+    ap.add_argument("--loinc-keys", type=int, default=None, help="Canonical LOINC keys (default aliases/20)")
+    ap.add_argument("--loinc-alias-ratio", type=float, default=3.0, help="LOINC aliases per canonical key")
+    ap.add_argument("--learned", type=int, default=None, help="Learned entries (default aliases/50)")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+    manifest = generate(
+        args.output, args.aliases, args.per_concept,
+        args.loinc_keys if args.loinc_keys is not None else max(1, args.aliases // 20),
+        args.loinc_alias_ratio,
+        args.learned if args.learned is not None else args.aliases // 50,
+        args.seed,
+    )
+    print(json.dumps(manifest))
+
+if __name__ == "__main__":
+    main()
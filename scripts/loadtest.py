@@ -0,0 +1,309 @@
+"""Replay a Zipf-distributed mix of /lookup reads and /api/commit_selection writes.
+
+    python scripts/gen_synthetic.py -o /tmp/synth --aliases 200000
+    python scripts/loadtest.py --data /tmp/synth -c 64 -d 30 --write-ratio 0.02
+
+Targets (one of):
+  default     spawn uvicorn (uvloop + httptools) from --app-dir pointed at --data
+  --url URL   an already running server (RSS only with --pid)
+  --asgi      call app.main:app in-process, no sockets (isolates app cost from HTTP)
+
+Query terms are drawn from the dataset's own SNOMED/LOINC vocabulary, ranked in a
+seeded shuffle and sampled with P(rank) ~ 1/rank^s; --miss-ratio of them are unknown
+terms. Prints one JSON report: throughput, p50/p95/p99 per request kind, status
+counts, error rate and server RSS (peak and final).
+"""
+import argparse, asyncio, bisect, itertools, json, os, random, subprocess, sys, time
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_lookup import free_port, wait_up  # noqa: E402
+from gen_synthetic import CONTEXTS  # noqa: E402
+
+
+class Zipf:
+    """Sample ranks 0..n-1 with P(k) proportional to 1/(k+1)^s (precomputed CDF + bisect)."""
+
+    def __init__(self, n: int, s: float):
+        weights = [1.0 / (k + 1) ** s for k in range(n)]
+        self.cdf = list(itertools.accumulate(weights))
+        self.total = self.cdf[-1]
+
+    def sample(self, rng: random.Random) -> int:
+        return min(bisect.bisect_left(self.cdf, rng.random() * self.total), len(self.cdf) - 1)
+
+def data_env(data_dir: str) -> dict:
+    with open(os.path.join(data_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        env = dict(json.load(f)["files"])
+    env["LEARNED_LOG_DIR"] = os.path.join(data_dir, "logs", "learned")
+    env["MISS_TRACKER_DIR"] = os.path.join(data_dir, "logs", "misses")
+    env["DATASET_JOURNAL"] = os.path.join(data_dir, "dataset_journal.jsonl")
+    return env
+
+def vocabulary(env: dict, seed: int):
+    """(terms, snomed entries) from the dataset files; terms in a seeded popularity order."""
+    with open(env["SNOMED_JSON"], "r", encoding="utf-8") as f:
+        snomed = json.load(f)
+    terms, entries = [], []
+    for term, e in snomed.items():
+        terms.append(term)
+        terms.extend(e.get("aliases") or [])
+        entries.append((term, e["code"], e["display"]))
+    for name in ("LOINC_ALIASES_JSON", "LOINC_CANONICAL_JSON"):
+        with open(env[name], "r", encoding="utf-8") as f:
+            terms.extend(json.load(f).keys())
+    random.Random(seed).shuffle(terms)
+    return terms, entries
+
+class Workload:
+    def __init__(self, terms, entries, zipf_s: float, write_ratio: float, miss_ratio: float):
+        self.terms, self.entries = terms, entries
+        self.zipf = Zipf(len(terms), zipf_s)
+        self.write_ratio, self.miss_ratio = write_ratio, miss_ratio
+
+    def next(self, rng: random.Random):
+        """(kind, method, path, body)"""
+        if rng.random() < self.write_ratio:
+            term, code, display = self.entries[rng.randrange(len(self.entries))]
+            body = {"term": f"{term} {rng.randrange(1000)}", "code": code, "display": display,
+                    "context": rng.choice(CONTEXTS)}
+            return "commit", "POST", "/api/commit_selection", json.dumps(body).encode()
+        if rng.random() < self.miss_ratio:
+            q = f"zz{rng.randrange(10 ** 6)} unknown"
+        else:
+            q = self.terms[self.zipf.sample(rng)]
+        return "lookup", "GET", "/lookup?query=" + quote(q), b""
+
+# ---- Transports ------------------------------------------------------------------
+
+class HTTPConn:
+    """Minimal keep-alive HTTP/1.1 client (same wire handling as bench_lookup.py)."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.r = self.w = None
+
+    async def request(self, method: str, path: str, body: bytes) -> int:
+        if self.w is None:
+            self.r, self.w = await asyncio.open_connection(self.host, self.port)
+        head = f"{method} {path} HTTP/1.1\r\nHost: loadtest\r\nContent-Length: {len(body)}\r\n"
+        if body:
+            head += "Content-Type: application/json\r\n"
+        self.w.write(head.encode() + b"\r\n" + body)
+        try:
+            status = int((await self.r.readline()).split()[1])
+        except (IndexError, ValueError):
+            self.close()
+            raise ConnectionError("connection closed")
+        length, close = 0, False
+        while True:
+            line = await self.r.readline()
+            if line in (b"\r\n", b""):
+                break
+            k, _, v = line.decode().partition(":")
+            k = k.lower()
+            if k == "content-length":
+                length = int(v)
+            elif k == "connection" and v.strip().lower() == "close":
+                close = True
+        await self.r.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.w is not None:
+            self.w.close()
+        self.r = self.w = None
+
+class ASGIConn:
+    """Drive an ASGI app directly: one http scope per request, body drained and dropped."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, body: bytes) -> int:
+        p, _, qs = path.partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": p, "raw_path": p.encode(),
+            "query_string": qs.encode(), "root_path": "",
+            "headers": [(b"host", b"loadtest"), (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0), "server": ("loadtest", 80),
+        }
+        done = asyncio.Event()
+        sent = False
+        status = 0
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(msg):
+            nonlocal status
+            if msg["type"] == "http.response.start":
+                status = msg["status"]
+            elif msg["type"] == "http.response.body" and not msg.get("more_body"):
+                done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status
+
+    def close(self):
+        pass
+
+# ---- Driver ----------------------------------------------------------------------
+
+def read_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+async def worker(conn, wl: Workload, rng: random.Random, stop_at: float, stats: dict):
+    try:
+        while time.perf_counter() < stop_at:
+            kind, method, path, body = wl.next(rng)
+            t0 = time.perf_counter()
+            try:
+                status = await conn.request(method, path, body)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                status = 0
+                conn.close()
+            s = stats[kind]
+            s["lat"].append(time.perf_counter() - t0)
+            s["status"][status] = s["status"].get(status, 0) + 1
+    finally:
+        conn.close()
+
+def _summary(s: dict, elapsed: float) -> dict:
+    lat = sorted(s["lat"]) or [0.0]
+    pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3)
+    n = len(s["lat"])
+    errors = sum(c for code, c in s["status"].items() if code == 0 or code >= 400)
+    return {
+        "requests": n,
+        "rps": round(n / elapsed, 1),
+        "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": round(lat[-1] * 1000, 3),
+        "error_rate": round(errors / n, 5) if n else 0.0,
+        "status": {str(k): v for k, v in sorted(s["status"].items())},
+    }
+
+async def run(make_conn, wl: Workload, concurrency: int, seconds: float, warmup: float, seed: int,
+              rss_pid) -> dict:
+    def fresh():
+        return {"lookup": {"lat": [], "status": {}}, "commit": {"lat": [], "status": {}}}
+
+    rngs = [random.Random(seed * 1000 + i) for i in range(concurrency)]
+    if warmup > 0:
+        stop = time.perf_counter() + warmup
+        await asyncio.gather(*[worker(make_conn(), wl, rngs[i], stop, fresh()) for i in range(concurrency)])
+
+    rss = {"peak_kb": 0, "samples": 0}
+    stopped = asyncio.Event()
+
+    async def sample_rss():
+        while not stopped.is_set():
+            kb = rss_pid() if callable(rss_pid) else 0
+            rss["peak_kb"] = max(rss["peak_kb"], kb)
+            rss["samples"] += 1
+            try:
+                await asyncio.wait_for(stopped.wait(), 0.25)
+            except asyncio.TimeoutError:
+                pass
+
+    stats = fresh()
+    sampler = asyncio.create_task(sample_rss())
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker(make_conn(), wl, rngs[i], t0 + seconds, stats) for i in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    stopped.set()
+    await sampler
+
+    total = {"lat": stats["lookup"]["lat"] + stats["commit"]["lat"], "status": {}}
+    for s in stats.values():
+        for k, v in s["status"].items():
+            total["status"][k] = total["status"].get(k, 0) + v
+    out = _summary(total, elapsed)
+    out["elapsed_s"] = round(elapsed, 2)
+    out["by_kind"] = {k: _summary(s, elapsed) for k, s in stats.items() if s["lat"]}
+    final_kb = rss_pid() if callable(rss_pid) else 0
+    out["rss_mb"] = {"peak": round(rss["peak_kb"] / 1024, 1), "final": round(final_kb / 1024, 1)} if final_kb else None
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", required=True, help="Directory written by scripts/gen_synthetic.py")
+    ap.add_argument("--app-dir", default=".", help="Repo checkout to serve app.main:app from")
+    target = ap.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Drive an already running server instead of spawning one")
+    target.add_argument("--asgi", action="store_true", help="Call the ASGI app in-process")
+    ap.add_argument("--pid", type=int, help="With --url: server pid to sample RSS from")
+    ap.add_argument("-c", "--concurrency", type=int, default=32)
+    ap.add_argument("-d", "--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--write-ratio", type=float, default=0.01, help="Fraction of requests that commit a selection")
+    ap.add_argument("--miss-ratio", type=float, default=0.05, help="Fraction of lookups for unknown terms")
+    ap.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent for term popularity")
+    ap.add_argument("--no-admission", action="store_true", help="Run the server with ADMISSION_ENABLED=0")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    env = data_env(os.path.abspath(args.data))
+    t = time.perf_counter()
+    terms, entries = vocabulary(env, args.seed)
+    wl = Workload(terms, entries, args.zipf_s, args.write_ratio, args.miss_ratio)
+    report = {"target": None, "vocabulary": len(terms), "setup_s": round(time.perf_counter() - t, 2)}
+    server_env = dict(os.environ, **env, MISS_TRACKER_PERSIST_S="5")
+    if args.no_admission:
+        server_env["ADMISSION_ENABLED"] = "0"
+
+    proc = None
+    try:
+        if args.asgi:
+            os.environ.update(server_env)
+            sys.path.insert(0, os.path.abspath(args.app_dir))
+            from app.main import app
+            report["target"] = "asgi"
+            make_conn = lambda: ASGIConn(app)
+            rss_pid = lambda: read_rss_kb(os.getpid())
+        elif args.url:
+            u = urlsplit(args.url)
+            report["target"] = args.url
+            make_conn = lambda: HTTPConn(u.hostname, u.port or 80)
+            rss_pid = (lambda: read_rss_kb(args.pid)) if args.pid else None
+        else:
+            port = free_port()
+            app_dir = os.path.abspath(args.app_dir)
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", app_dir,
+                 "--host", "127.0.0.1", "--port", str(port), "--workers", "1",
+                 "--loop", "uvloop", "--http", "httptools", "--log-level", "warning", "--no-access-log"],
+                cwd=app_dir, env=server_env,
+            )
+            asyncio.run(wait_up(port))
+            report["target"] = f"uvicorn {app_dir}"
+            make_conn = lambda: HTTPConn("127.0.0.1", port)
+            rss_pid = lambda: read_rss_kb(proc.pid)
+        report.update(asyncio.run(run(make_conn, wl, args.concurrency, args.duration, args.warmup,
+                                      args.seed, rss_pid)))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+    report.update({"concurrency": args.concurrency, "duration_s": args.duration,
+                   "write_ratio": args.write_ratio, "miss_ratio": args.miss_ratio, "zipf_s": args.zipf_s})
+    print(json.dumps(report))
+
+if __name__ == "__main__":
+    main()
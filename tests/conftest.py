@@ -0,0 +1,55 @@
+"""Shared setup for the pytest suite (python -m pytest -q from the repo root).
+
+Every data path the app reads at import time is pointed at a small dataset written
+to a temp directory here, before any `app` module is imported, so tests never touch
+data/ (learned store, miss snapshots, journal, audit logs).
+"""
+import json, os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA = tempfile.mkdtemp(prefix="akashic-tests-")
+
+SNOMED = {
+    "watery eyes": {"code": "231834007", "display": "Epiphora",
+                    "aliases": ["tearing", "watering eyes", "eye watering"]},
+    "heart attack": {"code": "22298006", "display": "Myocardial infarction",
+                     "aliases": ["myocardial infarction", "mi"]},
+    "headache": {"code": "25064002", "display": "Headache", "aliases": ["head pain"]},
+    "fever": {"code": "386661006", "display": "Fever", "aliases": ["pyrexia"]},
+    "chest pain": {"code": "29857009", "display": "Chest pain", "aliases": []},
+}
+LOINC_ALIASES = {"hgb": "hemoglobin", "sodium level": "sodium"}
+LOINC_CANONICAL = {"hemoglobin": "718-7", "sodium": "2951-2", "potassium": "2823-3"}
+LOINC_DISPLAYS = {"718-7": "Hemoglobin [Mass/volume] in Blood", "2951-2": "Sodium [Moles/volume] in Serum or Plasma"}
+
+
+def _write(name, obj):
+    path = os.path.join(DATA, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    return path
+
+
+ENV = {
+    "SNOMED_JSON": _write("snomed.json", SNOMED),
+    "LOINC_ALIASES_JSON": _write("loinc_aliases.json", LOINC_ALIASES),
+    "LOINC_CANONICAL_JSON": _write("loinc_canonical.json", LOINC_CANONICAL),
+    "LOINC_JSON": _write("loinc.json", LOINC_DISPLAYS),
+    "RXNORM_JSON": os.path.join(DATA, "rxnorm.json"),
+    "CVX_JSON": os.path.join(DATA, "cvx.json"),
+    "SNOMED_ISA": os.path.join(DATA, "snomed_isa.json"),
+    "DATASET_JOURNAL": os.path.join(DATA, "dataset_journal.jsonl"),
+    "LEARNED_JSON": os.path.join(DATA, "layman_learned.json"),
+    "LEARNED_LOG_DIR": os.path.join(DATA, "logs", "learned"),
+    "LEARNED_POLL_MS": "0",
+    "MISS_TRACKER_DIR": os.path.join(DATA, "logs", "misses"),
+    "MISS_TRACKER_PERSIST_S": "0",
+    "TENANTS_DIR": os.path.join(DATA, "tenants"),
+    "DATA_DIR": DATA,
+    "ADMIN_TOKEN": "test-admin",
+    "LOOKUP_CACHE_L2": "",
+    "ADMISSION_ENABLED": "0",
+}
+os.environ.update(ENV)
@@ -4,11 +4,12 @@ from urllib import request, error
 
 BASE_URL = os.environ.get("AKASHIC_BASE_URL", "http://127.0.0.1:8000")
 SEEDS = Path("data/seeds.jsonl")
+BATCH_SIZE = int(os.environ.get("SEED_BATCH_SIZE", "1000"))
 
-def post_commit(payload: dict) -> dict:
+def post_batch(items: list) -> dict:
     req = request.Request(
-        f"{BASE_URL}/api/commit_selection",
-        data=json.dumps(payload).encode("utf-8"),
+        f"{BASE_URL}/api/commit_selection/batch",
+        data=json.dumps({"items": items, "dry_run": False}).encode("utf-8"),
         headers={"Content-Type": "application/json"},
         method="POST",
     )
@@ -21,33 +22,16 @@ def main():
         sys.exit(1)
 
     inserted = updated = noops = errors = 0
+    pending = []  # (lineno, payload)
 
-    with SEEDS.open("r", encoding="utf-8") as f:
-        for lineno, line in enumerate(f, 1):
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            try:
-                item = json.loads(line)
-                term = (item.get("term") or "").strip()
-                code = str(item.get("code") or "").strip()
-                display = (item.get("display") or "").strip()
-                lay_text = (item.get("lay_text") or term)
-
-                if not term or not code or not display:
-                    print(f"[line {lineno}] SKIP (missing fields): {line}")
-                    continue
-
-                payload = {
-                    "term": term,
-                    "code": code,
-                    "display": display,
-                    "lay_text": lay_text,
-                    "dry_run": False,
-                    "include_technical": False,
-                }
-                res = post_commit(payload)
-                action = res.get("action", "unknown")
+    def flush():
+        nonlocal inserted, updated, noops, errors
+        if not pending:
+            return
+        try:
+            res = post_batch([p for _, p in pending])
+            for (lineno, payload), item in zip(pending, res.get("items", [])):
+                action = item.get("action", "unknown")
                 if action == "insert":
                     inserted += 1
                 elif action == "update":
@@ -56,17 +40,47 @@ def main():
                     noops += 1
                 else:
                     errors += 1
-                print(f"[line {lineno}] {term} → {code}  action={action}")
+                print(f"[line {lineno}] {payload['term']} → {payload['code']}  action={action}")
+        except error.HTTPError as e:
+            body = e.read().decode("utf-8", errors="ignore")
+            print(f"[lines {pending[0][0]}-{pending[-1][0]}] ERROR HTTP {e.code}\n{body}")
+            errors += len(pending)
+        except Exception as e:
+            print(f"[lines {pending[0][0]}-{pending[-1][0]}] ERROR {e}")
+            errors += len(pending)
+        pending.clear()
 
-            except error.HTTPError as e:
-                body = e.read().decode("utf-8", errors="ignore")
-                print(f"[line {lineno}] ERROR HTTP {e.code} for {line}\n{body}")
-                errors += 1
+    with SEEDS.open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item = json.loads(line)
             except Exception as e:
                 print(f"[line {lineno}] ERROR {e} for {line}")
                 errors += 1
+                continue
+            term = (item.get("term") or "").strip()
+            code = str(item.get("code") or "").strip()
+            display = (item.get("display") or "").strip()
+            lay_text = (item.get("lay_text") or term)
+
+            if not term or not code or not display:
+                print(f"[line {lineno}] SKIP (missing fields): {line}")
+                continue
+
+            pending.append((lineno, {
+                "term": term,
+                "code": code,
+                "display": display,
+                "lay_text": lay_text,
+            }))
+            if len(pending) >= BATCH_SIZE:
+                flush()
+    flush()
 
     print(f"\nSummary: insert={inserted} update={updated} noop={noops} errors={errors}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,8 +1,11 @@
-import json, sys, os
+import json, sys, os, time
 from datetime import datetime, timezone
 from pathlib import Path
 import urllib.request
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.utils.audit_log import iter_events  # noqa: E402
+
 BASE_URL = os.environ.get("AKASHIC_BASE_URL", "http://127.0.0.1:8000")
 PAYLOAD_PATH = Path("data/payload.json")  # per your rule
 LOG_DIR = Path("data/logs/learned")
@@ -17,24 +20,10 @@ def post_commit(payload: dict):
     with urllib.request.urlopen(req) as resp:
         return json.loads(resp.read().decode("utf-8"))
 
-def today_log_path():
-    # timezone-aware UTC date
-    return LOG_DIR / (datetime.now(timezone.utc).date().isoformat() + ".log.jsonl")
-
 def tail_log_for_term(term: str, max_lines=10):
-    p = today_log_path()
-    if not p.exists():
-        return []
-    out = []
-    with p.open("r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                j = json.loads(line)
-                if (j.get("term") or "").strip().lower() == term.strip().lower():
-                    out.append(j)
-            except json.JSONDecodeError:
-                pass
-    return out[-max_lines:]
+    # today's segments (UTC); the server flushes its audit buffer every AUDIT_LOG_FLUSH_MS
+    since = datetime.now(timezone.utc).date().isoformat()
+    return list(iter_events(str(LOG_DIR), term=term, since=since))[-max_lines:]
 
 def main():
     if not PAYLOAD_PATH.exists():
@@ -67,6 +56,7 @@ def main():
         print("Commit #3 (alt):", {"ok": r3.get("ok"), "preview": r3.get("preview"), "action": r3.get("action")})
 
     # Show today's log entries for term
+    time.sleep(float(os.environ.get("AUDIT_LOG_FLUSH_MS", "1000")) / 1000 + 0.2)
     logs = tail_log_for_term(term)
     print(f"Today’s log entries for '{term}': {len(logs)}")
     for j in logs:
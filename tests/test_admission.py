@@ -0,0 +1,109 @@
+import asyncio, json
+
+import pytest
+
+from app.middleware import admission
+from app.middleware.admission import AdmissionControlMiddleware, RouteClass, _Shed, classify
+
+
+def test_classify_routes():
+    assert classify("/lookup") == "lookup"
+    assert classify("/api/commit_selection") == "write"
+    assert classify("/api/commit_selection/batch") == "batch"
+    assert classify("/api/export/valueset") == "batch"
+    assert classify("/api/learned") == "lookup"
+    assert classify("/api/learned/unlearn") == "batch"
+    assert classify("/api/metrics") is None
+    assert classify("/lookupx") is None
+
+
+def test_waiters_are_admitted_fifo_on_release():
+    async def main():
+        rc = RouteClass("t", limit=1, queue=4, budget_ms=5000, tenant_limit=0)
+        await rc.acquire(None)
+        order = []
+
+        async def wait(i):
+            await rc.acquire(None)
+            order.append(i)
+        tasks = [asyncio.ensure_future(wait(i)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert rc.snapshot()["queue_depth"] == 3
+        for _ in range(3):
+            rc.release(None, 0.01)
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order, rc
+    order, rc = asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert rc.active == 1 and rc.admitted == 4
+
+
+def test_shedding_reasons():
+    async def main():
+        full = RouteClass("t", limit=1, queue=0, budget_ms=1000, tenant_limit=0)
+        await full.acquire(None)
+        with pytest.raises(_Shed) as e:
+            await full.acquire(None)
+        assert (e.value.status, full.shed_queue_full) == (503, 1)
+
+        slow = RouteClass("t", limit=1, queue=10, budget_ms=100, tenant_limit=0)
+        slow.ewma_service_s = 1.0  # one queued request already costs ~1 s
+        await slow.acquire(None)
+        with pytest.raises(_Shed):
+            await slow.acquire(None)
+        assert slow.shed_budget == 1
+
+        timeout = RouteClass("t", limit=1, queue=10, budget_ms=50, tenant_limit=0)
+        await timeout.acquire(None)
+        with pytest.raises(_Shed):
+            await timeout.acquire(None)
+        assert timeout.timed_out == 1 and not timeout.waiters
+
+        quota = RouteClass("t", limit=5, queue=10, budget_ms=1000, tenant_limit=1)
+        await quota.acquire("acme")
+        with pytest.raises(_Shed) as e:
+            await quota.acquire("acme")
+        assert e.value.status == 429
+        await quota.acquire("other")
+        quota.release("acme", 0.0)
+        await quota.acquire("acme")
+    asyncio.run(main())
+
+
+def test_middleware_rejects_with_retry_after(monkeypatch):
+    monkeypatch.setenv("ADMISSION_ENABLED", "1")
+    monkeypatch.setenv("ADMISSION_WRITE_CONCURRENCY", "1")
+    monkeypatch.setenv("ADMISSION_WRITE_QUEUE", "0")
+    monkeypatch.setattr(admission, "_instance", None)
+    gate = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    mw = AdmissionControlMiddleware(app)
+
+    async def call(path):
+        sent = []
+
+        async def send(msg):
+            sent.append(msg)
+        await mw({"type": "http", "path": path, "headers": [], "query_string": b""}, None, send)
+        return sent
+
+    async def main():
+        first = asyncio.ensure_future(call("/api/commit_selection"))
+        await asyncio.sleep(0)
+        shed = await call("/api/commit_selection")
+        bypass = asyncio.ensure_future(call("/api/metrics"))
+        gate.set()
+        return await first, shed, await bypass
+    first, shed, bypass = asyncio.run(main())
+    assert first[0]["status"] == 200 and bypass[0]["status"] == 200
+    assert shed[0]["status"] == 503
+    assert (b"retry-after", b"1") in shed[0]["headers"]
+    assert json.loads(shed[1]["body"])["error"] == "write queue full"
+    snap = admission.admission_metrics()["classes"]["write"]
+    assert snap["shed"]["queue_full"] == 1 and snap["active"] == 0
@@ -0,0 +1,80 @@
+import os, subprocess, sys, time
+
+import pytest
+
+from app.utils.audit_log import AuditLog, Bloom, index_path, iter_events, list_segments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _row(i, term):
+    return {"ts": f"2026-10-19T00:00:{i:02d}Z", "action": "api_learn", "term": term}
+
+
+def _wait_sealed(directory, n, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sealed = [p for _, p in list_segments(directory) if p.endswith(".gz")]
+        if len(sealed) >= n and all(os.path.exists(index_path(p)) for p in sealed):
+            return sealed
+        time.sleep(0.02)
+    raise AssertionError("segments were not sealed")
+
+
+def test_bloom_has_no_false_negatives():
+    b = Bloom.for_count(100)
+    terms = [f"term {i}" for i in range(100)]
+    for t in terms:
+        b.add(t)
+    assert all(t in b for t in terms)
+    assert all(t in Bloom.from_dict(b.to_dict()) for t in terms)
+
+
+def test_rotation_seals_and_bloom_skips_segments(tmp_path):
+    log = AuditLog(str(tmp_path), fsync="batch", rotate_bytes=1)
+    for i, term in enumerate(["headache", "fever", "chest pain"]):
+        log.append(_row(i, term))  # each append rotates the previous segment out
+    log.close()
+    sealed = _wait_sealed(str(tmp_path), 3)
+    assert not [p for _, p in list_segments(str(tmp_path)) if p.endswith(".jsonl")]  # plain copies removed
+    assert log.counters["rotations"] == 2
+    stats = {}
+    rows = list(iter_events(str(tmp_path), term="Fever", stats=stats))
+    assert [r["term"] for r in rows] == ["fever"]
+    assert stats["segments"] == len(sealed) == 3
+    assert stats["read"] == 1 and stats["skipped"] == 2
+    assert len(list(iter_events(str(tmp_path), since="2026-10-19T00:00:01Z"))) == 2
+
+
+def test_batch_mode_is_on_disk_when_append_returns(tmp_path):
+    log = AuditLog(str(tmp_path), fsync="batch")
+    log.append_many([_row(0, "a"), _row(1, "b")])
+    assert log.stats()["pending"] == 0
+    assert log.counters["fsyncs"] == 1
+    assert os.path.getsize(list_segments(str(tmp_path))[0][1]) > 0
+    log.close()
+
+
+def test_interval_mode_buffers_until_flush(tmp_path):
+    log = AuditLog(str(tmp_path), fsync="interval", flush_s=60)
+    log.append(_row(0, "a"))
+    assert log.stats()["pending"] == 1
+    assert [r["term"] for r in iter_events(str(tmp_path))] == []  # still buffered: nothing on disk yet
+    log.flush()
+    assert log.stats()["pending"] == 0
+    assert [r["term"] for r in iter_events(str(tmp_path))] == ["a"]
+    log.close()
+
+
+def test_unknown_fsync_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        AuditLog(str(tmp_path), fsync="sometimes")
+
+
+def test_mangum_handler_defaults_to_batch():
+    pytest.importorskip("mangum")
+    env = {k: v for k, v in os.environ.items() if k != "AUDIT_LOG_FSYNC"}
+    out = subprocess.run(
+        [sys.executable, "-c", "import app.aws_handler\nfrom app.utils import audit_log\nprint(audit_log._FSYNC)"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert out.stdout.strip().splitlines()[-1] == "batch", out.stderr
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.candidates import CandidatePipeline, term_variants
+from app.resolver import lookup_response
+from app.utils import lookup_cache
+from app.utils.lookup_cache import LookupCache
+
+
+def _pipeline(term, **kw):
+    return CandidatePipeline(term, ("snomed", "loinc"), **kw)
+
+
+def test_term_variants():
+    assert term_variants("headaches") == ["headache"]
+    assert term_variants("watery, eyes") == ["watery eyes", "watery eye", "eyes watery"]
+    assert term_variants("fever") == []
+
+
+def test_exact_hit_settles_inline_only_when_top_k_is_guaranteed():
+    p = _pipeline("headache", top_k=1)
+    assert p.run(cheap_only=True) is True  # heap full at 100: no fuzzy scan can displace it
+    assert p.stopped_early
+    assert [(c.code, c.source, c.score) for c in p.ranked()] == [("25064002", "exact", 100)]
+    p = _pipeline("headache", top_k=5)
+    assert p.run(cheap_only=True) is False  # four open slots: fuzzy still runs
+
+
+def test_exact_query_is_as_broad_as_a_misspelt_one():
+    exact = lookup_response("chest pain", top_k=5, score_cutoff=60)
+    typo = lookup_response("chest pian", top_k=5, score_cutoff=60)
+    assert exact["results"][0]["source"] == "exact"
+    assert exact["count"] == typo["count"] > 1
+    assert {r["snomed"] for r in exact["results"]} == {r["snomed"] for r in typo["results"]}
+
+
+def test_miss_needs_the_expensive_pass():
+    p = _pipeline("headahce", top_k=5)
+    assert p.run(cheap_only=True) is False
+    assert p.run() is True
+    top = p.ranked()[0]
+    assert (top.code, top.source) == ("25064002", "fuzzy")
+    assert top.score < 100
+
+
+def test_variant_outranks_fuzzy_and_exact_outranks_variant():
+    p = _pipeline("headaches", top_k=5)
+    p.run()
+    top = p.ranked()[0]
+    assert (top.code, top.source, top.score) == ("25064002", "variants", 95)
+    assert not p.exact_hit()
+
+
+def test_learned_selection_ranks_first():
+    from app.learning import learn_selection
+    learn_selection("the spins", "404640003", "Dizziness", None, context="hpi.symptom")
+    body = lookup_response("the spins", context="hpi.symptom")
+    assert body["results"][0]["snomed"] == "404640003"
+    assert body["results"][0]["source"] == "learned"
+
+
+def test_loinc_exact_code_rides_along_with_the_top_result():
+    body = lookup_response("hgb", include_technical=True)
+    assert body["results"][0]["loinc"] == "718-7"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(lookup_cache, "_cache", LookupCache(l1_size=100))
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+def test_stream_lines_go_through_the_lookup_cache(client):
+    body = "\n".join(json.dumps({"query": q, "id": i}) for i, q in enumerate(["headache", "headahce", "headache"]))
+    r = client.post("/api/translate/stream", content=body.encode())
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    results = [row for row in rows if row["type"] == "result"]
+    assert [row["id"] for row in results] == [0, 1, 2]
+    assert all(row["results"][0]["snomed"] == "25064002" for row in results)
+    stats = lookup_cache.get_lookup_cache().stats()["l1"]
+    assert stats["size"] == 2 and stats["hits"] == 1
+    assert rows[-1] == {"type": "summary", "lines": 3, "processed": 3, "errors": 0}
@@ -0,0 +1,31 @@
+import json
+
+from app.cli import main, map_chunk
+from app.resolver import lookup_response
+
+
+def test_map_matches_lookup_for_fuzzy_and_variant_terms():
+    rows = map_chunk(["headahce", "Headaches", "zzzz"])
+    for row, q in zip(rows, ["headahce", "headaches", "zzzz"]):
+        top = lookup_response(q)["results"][0]
+        assert (row["snomed"], row["score"], row["source"]) == (top["snomed"], top["score"], top["source"])
+    assert rows[0]["snomed"] == "25064002" and rows[0]["source"] == "fuzzy"
+    assert rows[0]["snomed_display"] == "Headache"
+    assert rows[1]["source"] == "variants"
+    assert rows[2]["count"] == 0 and rows[2]["snomed"] is None
+
+
+def test_map_passes_lookup_options():
+    assert map_chunk(["hgb"], options={"include_technical": True})[0]["loinc"] == "718-7"
+    strict = map_chunk(["headahce"], options={"score_cutoff": 100})[0]
+    assert strict["snomed"] is None
+
+
+def test_map_command_writes_ndjson(tmp_path, capsys):
+    src = tmp_path / "terms.txt"
+    src.write_text("head pain\nfevr\n")
+    out = tmp_path / "out.ndjson"
+    assert main(["map", "-i", str(src), "-o", str(out), "--jobs", "1", "-q"]) == 0
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [(r["line"], r["snomed"]) for r in rows] == [(1, "25064002"), (2, "386661006")]
+    assert json.loads(capsys.readouterr().err.splitlines()[-1])["matched"] == 2
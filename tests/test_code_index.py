@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data.code_index import (LOINC_SYSTEM, SNOMED_SYSTEM, get_loinc_code_index, lookup_code,
+                                 resolve_system, validate_code)
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    return TestClient(app)
+
+
+def test_resolve_system_aliases():
+    assert resolve_system("SNOMED") == SNOMED_SYSTEM
+    assert resolve_system("http://snomed.info/sct/") == SNOMED_SYSTEM
+    assert resolve_system("loinc") == LOINC_SYSTEM
+    assert resolve_system("icd10") is None
+
+
+def test_reverse_indexes():
+    rec = lookup_code("sct", "231834007")
+    assert (rec["display"], rec["term"]) == ("Epiphora", "watery eyes")
+    assert "tearing" in rec["aliases"]
+    assert lookup_code("snomed", " 25064002 ")["term"] == "headache"
+    assert lookup_code("snomed", "0000") is None
+    assert lookup_code("icd10", "25064002") is None
+    loinc = get_loinc_code_index()
+    assert loinc["718-7"]["display"] == "Hemoglobin [Mass/volume] in Blood"
+    assert loinc["718-7"]["aliases"] == ["hgb"]
+    assert loinc["2823-3"]["display"] == "potassium"  # no display row: canonical key
+
+
+def test_validate_code_display_rules():
+    assert validate_code("snomed", "25064002")["result"] is True
+    assert validate_code("snomed", "25064002", "head pain")["result"] is True  # alias
+    assert validate_code("snomed", "25064002", "HEADACHE")["result"] is True
+    bad = validate_code("snomed", "25064002", "fever")
+    assert bad["result"] is False and "does not match" in bad["message"]
+    assert "Unknown code system" in validate_code("icd10", "x")["message"]
+    assert "Unknown code" in validate_code("loinc", "1-1")["message"]
+
+
+def test_fhir_lookup(client):
+    r = client.get("/fhir/CodeSystem/$lookup", params={"system": SNOMED_SYSTEM, "code": "25064002"})
+    assert r.status_code == 200
+    params = r.json()["parameter"]
+    assert {"name": "display", "valueString": "Headache"} in params
+    values = [p["part"][1]["valueString"] for p in params if p["name"] == "designation"]
+    assert values == ["headache", "head pain"]
+    assert client.get("/fhir/CodeSystem/$lookup", params={"system": "sct", "code": "1"}).status_code == 404
+    r = client.get("/fhir/CodeSystem/$lookup", params={"system": "icd10", "code": "1"})
+    assert r.status_code == 400 and r.json()["resourceType"] == "OperationOutcome"
+
+
+def test_fhir_validate_code_and_batch(client):
+    r = client.get("/fhir/CodeSystem/$validate-code",
+                   params={"system": "loinc", "code": "718-7", "display": "hgb"})
+    assert r.json()["parameter"][0] == {"name": "result", "valueBoolean": True}
+    r = client.post("/api/codes/validate", json={"system": "snomed", "codes": [
+        {"code": "386661006"}, {"code": "999"}, {"code": "2951-2", "system": "loinc", "display": "sodium"}]})
+    body = r.json()
+    assert (body["count"], body["valid"], body["invalid"]) == (3, 2, 1)
+    assert [x["result"] for x in body["results"]] == [True, False, True]
@@ -0,0 +1,55 @@
+import json
+
+from app.data.code_systems import CodeSystem, CodeSystemRegistry, allowed_systems, get_registry
+
+
+def _registry(idle_s=0.0):
+    built, dropped = [], []
+
+    def build(paths):
+        built.append(paths)
+        return {"aspirin": {"code": "1191", "display": "Aspirin"}}
+
+    reg = CodeSystemRegistry(idle_s=idle_s)
+    reg.register(CodeSystem("rx", "urn:rx", {"RX_TEST_JSON": "rx.json"}, build,
+                            lambda idx, term, ov: idx.get(term), unload=lambda: dropped.append(1)))
+    return reg, built, dropped
+
+
+def test_index_is_built_lazily_once():
+    reg, built, _ = _registry()
+    assert not reg.loaded("rx")
+    assert reg.resolve("rx", "aspirin") == {"code": "1191", "display": "Aspirin"}
+    assert reg.resolve("rx", "ibuprofen") is None
+    assert built == [{"RX_TEST_JSON": "rx.json"}]
+    assert reg.stats()["systems"]["rx"]["loads"] == 1
+    assert reg.generation == 1
+
+
+def test_idle_systems_unload_and_reload():
+    reg, built, dropped = _registry(idle_s=10)
+    reg.index("rx")
+    t = reg._last_used["rx"]
+    assert reg.sweep(now=t + 5) == []
+    assert reg.sweep(now=t + 11) == ["rx"]
+    assert not reg.loaded("rx") and dropped == [1]
+    reg.index("rx")
+    assert len(built) == 2
+    st = reg.stats()["systems"]["rx"]
+    assert (st["loads"], st["unloads"], st["loaded"]) == (2, 1, True)
+    assert reg.generation == 3  # build, unload, build: cached lookups see a new data version
+
+
+def test_builtin_concept_file_systems(tmp_path, monkeypatch):
+    path = tmp_path / "rxnorm.json"
+    path.write_text(json.dumps({"aspirin": {"code": "1191", "display": "Aspirin", "aliases": ["asa"]}}))
+    monkeypatch.setenv("RXNORM_JSON", str(path))
+    reg = get_registry()
+    reg.unload("rxnorm")
+    try:
+        assert reg.resolve("rxnorm", "asa") == {"code": "1191", "display": "Aspirin"}
+        assert reg.resolve("cvx", "anything") is None  # missing file: empty index
+    finally:
+        reg.unload("rxnorm")
+    assert reg.names()[:2] == ["snomed", "loinc"]
+    assert set(allowed_systems()) <= set(reg.names())
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.learning import learned_path, load_learned
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    return TestClient(app)
+
+
+def _item(term, code="404640003", display="Dizziness", **kw):
+    return {"term": term, "code": code, "display": display, "context": "batch.test", **kw}
+
+
+def _post(client, items, dry_run=False):
+    return client.post("/api/commit_selection/batch", json={"items": items, "dry_run": dry_run})
+
+
+def _stat():
+    try:
+        st = os.stat(learned_path())
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+
+def test_dry_run_reports_actions_and_writes_nothing(client):
+    before = _stat()
+    r = _post(client, [_item("giddy"), _item("giddy")], dry_run=True)
+    assert r.status_code == 200
+    assert [x["action"] for x in r.json()["items"]] == ["insert", "noop"]
+    assert _stat() == before
+    assert "batch.test::giddy" not in load_learned()
+
+
+def test_insert_update_noop_in_one_write(client):
+    r = _post(client, [_item("swimmy head"), _item("reeling")])
+    assert [x["action"] for x in r.json()["items"]] == ["insert", "insert"]
+    r = _post(client, [_item("swimmy head"), _item("reeling", code="399153001", display="Vertigo")])
+    body = r.json()
+    assert [x["action"] for x in body["items"]] == ["noop", "update"]
+    assert (body["insert"], body["update"], body["noop"]) == (0, 1, 1)
+    assert load_learned()["batch.test::reeling"]["snomed_code"] == "399153001"
+
+
+def test_invalid_items_are_reported_and_valid_ones_applied(client):
+    r = _post(client, [_item("woozy"), _item(" "), _item("x", code="abc"), _item("y", display=None),
+                       _item("lightheaded")])
+    assert r.status_code == 200
+    body = r.json()
+    assert [(x["index"], x["action"]) for x in body["items"]] == [
+        (0, "insert"), (1, "error"), (2, "error"), (3, "error"), (4, "insert")]
+    assert body["items"][1]["errors"] == ["term is required"]
+    assert "display is required" in body["items"][3]["errors"]
+    assert (body["count"], body["insert"], body["error"]) == (5, 2, 3)
+    learned = load_learned()
+    assert "batch.test::woozy" in learned and "batch.test::lightheaded" in learned
+
+
+def test_strict_batch_is_all_or_nothing(client):
+    before = _stat()
+    r = client.post("/api/commit_selection/batch", json={
+        "items": [_item("fine"), _item(" "), _item("z", code=None)], "strict": True})
+    assert r.status_code == 400
+    body = r.json()
+    assert body["items"] == [1, 2]
+    assert body["errors"][0] == {"index": 1, "errors": ["term is required"]}
+    assert _stat() == before  # nothing applied, not even the valid item
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app.learning import learn_selections
+from app.utils import fhir_export
+from app.utils.fhir_export import decode_cursor, encode_cursor, iter_resources, stream_bundle
+
+
+def _learn(*extra):
+    rows = [("the spins", "404640003", "Dizziness", "hpi.symptom"),
+            ("woozy", "404640003", "Dizziness", "hpi.symptom"),
+            ("runny eyes", "231834007", "Epiphora", "ros.eyes")] + list(extra)
+    learn_selections([{"term": t, "snomed_code": c, "snomed_display": d, "context": ctx}
+                      for t, c, d, ctx in rows])
+
+
+def _pages(kind, limit, context=None):
+    cursor, out = None, []
+    while True:
+        page = list(iter_resources(kind, context=context, cursor=cursor, limit=limit))
+        out.append([r for r, _ in page if r is not None])
+        cursor = page[-1][1]
+        if cursor is None:
+            return out
+
+
+def _codes(pages):
+    return [e["code"] for page in pages for res in page for g in res["group"] for e in g["element"]]
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    c = encode_cursor("learned", "ros.eyes::runny eyes")
+    assert "=" not in c
+    assert decode_cursor(c) == ("learned", "ros.eyes::runny eyes")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        iter_resources("conceptmap", cursor=encode_cursor("nope", "x"))
+    with pytest.raises(ValueError):
+        iter_resources("codesystem")
+
+
+def test_pages_cover_everything_once():
+    _learn()
+    whole = _codes(_pages("conceptmap", 0))
+    paged = _pages("conceptmap", 2)
+    assert len(paged) > 2
+    assert all(sum(len(g["element"]) for r in p for g in r["group"]) <= 2 for p in paged)
+    assert _codes(paged) == whole
+    assert {"the spins", "woozy", "runny eyes", "headache", "hgb"} <= set(whole)
+
+
+def test_context_filters_learned_rows_as_a_key_range():
+    _learn()
+    pages = _pages("valueset", 1, context="hpi.symptom")
+    learned = [c for p in pages for r in p if "learned" in r["id"] for inc in r["compose"]["include"]
+               for c in inc["concept"]]
+    assert [c["code"] for c in learned] == ["404640003"]
+    assert sorted(d["value"] for d in learned[0]["designation"]) == ["the spins", "woozy"]
+
+
+def test_learned_rows_build_once_per_snapshot(monkeypatch):
+    _learn()
+    calls = []
+    for name in ("_learned_keys", "_learned_codes"):
+        real = getattr(fhir_export, name)
+        monkeypatch.setattr(fhir_export, name, lambda data, real=real: calls.append(1) or real(data))
+    monkeypatch.setattr(fhir_export, "_versioned_cache", {})
+    _pages("valueset", 1)
+    _pages("conceptmap", 1)
+    assert len(calls) == 2  # one build per source, not one per page
+    _learn(("lightheaded", "404640003", "Dizziness", "hpi.symptom"))  # new snapshot
+    _pages("valueset", 1)
+    assert len(calls) == 3
+
+
+def test_ndjson_bundle_carries_next_link():
+    parts = list(stream_bundle(iter_resources("conceptmap", limit=1), "ndjson", lambda c: f"?cursor={c}"))
+    tail = json.loads(parts[-1])
+    assert tail["resourceType"] == "Bundle"
+    assert tail["link"][0]["url"].startswith("?cursor=")
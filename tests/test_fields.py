@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.resolver import MINIMAL_FIELDS, lookup_response, parse_fields
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    return TestClient(app)
+
+
+def test_parse_fields():
+    assert parse_fields() is None
+    assert parse_fields(fmt="full") is None
+    assert parse_fields(fmt="minimal") == MINIMAL_FIELDS
+    assert parse_fields(" snomed, score ,query") == frozenset({"snomed", "score", "query"})
+    with pytest.raises(ValueError, match="unknown fields: bogus"):
+        parse_fields("snomed,bogus")
+    with pytest.raises(ValueError):
+        parse_fields(fmt="tiny")
+
+
+def test_sparse_body_matches_the_full_one():
+    full = lookup_response("headahce")
+    sparse = lookup_response("headahce", fields=frozenset({"snomed", "score", "source", "query"}))
+    assert set(sparse) == {"query", "count", "results"}
+    assert sparse["count"] == full["count"]
+    for s, f in zip(sparse["results"], full["results"]):
+        assert s == {k: f[k] for k in ("snomed", "score", "source")}
+
+
+def test_minimal_keeps_cross_system_exact_codes():
+    body = lookup_response("hgb", include_technical=True, fields=MINIMAL_FIELDS)
+    assert body["results"][0]["loinc"] == "718-7"
+    assert set(body["results"][0]) == MINIMAL_FIELDS
+
+
+def test_miss_has_one_empty_result_with_only_the_fields():
+    body = lookup_response("qqqqqq", fields=frozenset({"snomed", "score"}))
+    assert body == {"count": 0, "results": [{"snomed": None, "score": 0}]}
+
+
+def test_lookup_endpoint_fields(client):
+    r = client.get("/lookup", params={"query": "fever", "format": "minimal"})
+    assert r.json() == {"count": 1, "results": [{"snomed": "386661006", "loinc": None, "score": 100}]}
+    r = client.get("/lookup", params={"query": "fever", "fields": "nope"})
+    assert r.status_code == 400 and "unknown fields" in r.json()["error"]
@@ -0,0 +1,68 @@
+import asyncio, threading, time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import resolver
+from app.data.code_systems import CodeSystem, CodeSystemRegistry
+from app.utils.io_executor import run_cpu, run_io
+
+
+def test_run_io_runs_on_the_io_pool():
+    name = asyncio.run(run_io(lambda: threading.current_thread().name))
+    assert name.startswith("akashic-io")
+
+
+def test_fuzzy_lookups_run_on_the_cpu_pool(monkeypatch):
+    from app.utils import lookup_cache
+    monkeypatch.setattr(lookup_cache, "_cache", lookup_cache.LookupCache(l1_size=0))
+    threads = []
+    real = resolver.lookup_response
+
+    def spy(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return real(*args, **kwargs)
+    monkeypatch.setattr(resolver, "lookup_response", spy)
+    body = asyncio.run(resolver.coalesced_lookup("headahce"))  # typo: needs the fuzzy scan
+    assert body["results"][0]["snomed"] == "25064002"
+    assert len(threads) == 1 and threads[0].startswith("akashic-cpu")
+    assert asyncio.run(run_cpu(lambda: threading.current_thread().name)).startswith("akashic-cpu")
+
+
+@pytest.fixture
+def slow_registry(monkeypatch):
+    builds = []
+
+    def build(paths):
+        builds.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return {"slow": {"code": "1", "display": "Slow"}}
+
+    reg = CodeSystemRegistry()
+    reg.register(CodeSystem("slow", "urn:slow", {}, build, lambda idx, term, ov: idx.get(term)))
+    monkeypatch.setattr(resolver, "get_registry", lambda: reg)
+    return reg, builds
+
+
+def test_ensure_indexes_builds_once_off_the_loop(slow_registry):
+    reg, builds = slow_registry
+
+    async def main():
+        loop_thread = threading.current_thread().name
+        await asyncio.gather(*(resolver.ensure_indexes(("slow",)) for _ in range(5)))
+        return loop_thread
+    loop_thread = asyncio.run(main())
+    assert len(builds) == 1
+    assert builds[0] != loop_thread and builds[0].startswith("akashic-io")
+    assert resolver.indexes_loaded(("slow",))
+    asyncio.run(resolver.ensure_indexes(("slow",)))  # warm: no second build
+    assert len(builds) == 1
+
+
+def test_async_lookup_matches_lookup_response():
+    from app.main import app
+    with TestClient(app) as client:
+        body = client.get("/lookup", params={"query": "head pain"}).json()
+    expected = resolver.lookup_response("head pain")
+    assert body["results"][0]["snomed"] == expected["results"][0]["snomed"] == "25064002"
+    assert body["count"] == expected["count"]
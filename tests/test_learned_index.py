@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.learned_index import LearnedIndex, decode_cursor, encode_cursor
+from app.learning import learn_selections, learned_snapshot
+
+ADMIN = {"X-Admin-Token": "test-admin"}
+
+
+def _entry(code, ts):
+    return {"snomed_code": code, "updated_utc": ts}
+
+
+def _index():
+    return LearnedIndex({
+        "a::one": _entry("1", "2026-01-01"),
+        "a::two": _entry("2", "2026-01-02"),
+        "b::three": _entry("1", "2026-01-03"),
+        "a::four": _entry("1", "2026-01-04"),
+        "b::five": _entry("2", "2026-01-05"),
+    })
+
+
+def test_cursor_round_trip():
+    pos = ("2026-01-01T00:00:00Z", "hpi.symptom::the spins")
+    assert decode_cursor(encode_cursor(pos)) == pos
+    for bad in ("%%%", "WzFd", ""):  # WzFd is base64 for [1]
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_filters_since_and_pages():
+    idx = _index()
+    assert idx.query(context="a", code="1") == (["a::one", "a::four"], None)
+    assert idx.query(since="2026-01-03")[0] == ["b::three", "a::four", "b::five"]
+    keys, last = idx.query(limit=2)
+    assert keys == ["a::one", "a::two"] and last == ("2026-01-02", "a::two")
+    assert idx.query(after=last, limit=2)[0] == ["b::three", "a::four"]
+    assert idx.query(context="A ", limit=10)[0] == ["a::one", "a::two", "a::four"]
+
+
+def test_updates_keep_pages_stable():
+    idx = _index()
+    _, last = idx.query(limit=2)
+    idx.update("a::zero", _entry("1", "2025-12-31"))  # before the cursor: never shifts the next page
+    idx.update("a::two", _entry("3", "2026-02-01"))   # changed: moves past the cursor, listed again
+    idx.update("b::three", None)
+    assert idx.query(after=last)[0] == ["a::four", "b::five", "a::two"]
+    assert idx.query(code="3")[0] == ["a::two"]
+    assert idx.stats()["entries"] == 5 and idx.stats()["updates"] == 3
+
+
+def test_learned_endpoints_page_and_bulk_unlearn():
+    learn_selections([{"term": f"idx term {i}", "snomed_code": "404640003" if i % 2 else "399153001",
+                       "snomed_display": "x", "context": "idx.test"} for i in range(5)])
+    from app.main import app
+    client = TestClient(app)
+    seen, cursor = [], None
+    while True:
+        body = client.get("/api/learned", params={"context": "idx.test", "limit": 2,
+                                                  **({"cursor": cursor} if cursor else {})}).json()
+        seen += [it["key"] for it in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"idx.test::idx term {i}" for i in range(5)]
+    assert client.get("/api/learned", params={"cursor": "nope"}).status_code == 400
+
+    url = "/api/learned/unlearn"
+    assert client.post(url, json={"context": "idx.test"}).status_code in (401, 403)
+    assert client.post(url, json={}, headers=ADMIN).status_code == 400  # no selector
+    dry = client.post(url, json={"context": "idx.test", "code": "404640003", "dry_run": True}, headers=ADMIN).json()
+    assert dry["count"] == 2 and "idx.test::idx term 1" in learned_snapshot()
+    out = client.post(url, json={"context": "idx.test", "code": "404640003",
+                                 "keys": ["idx.test::idx term 0", "missing::key"]}, headers=ADMIN).json()
+    assert out["count"] == 3
+    left = client.get("/api/learned", params={"context": "idx.test"}).json()["items"]
+    assert sorted(it["key"] for it in left) == ["idx.test::idx term 2", "idx.test::idx term 4"]
@@ -0,0 +1,63 @@
+import json, os, subprocess, sys, time
+
+from app.data import live_index
+from app.data.journal import append_ops, journal_path, validate_op
+from app.data.snomed_loader import get_snomed_db
+from app.resolver import lookup_response
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _upsert(term, code):
+    return {"op": "snomed.upsert_concept", "term": term, "code": code, "display": term.title()}
+
+
+def test_apply_ops_is_live_and_counted():
+    before = live_index.journal_status()["pending_ops"]
+    out = live_index.apply_ops([_upsert("tummy ache", "21522001"),
+                                {"op": "snomed.add_alias", "alias": "belly ache", "term": "tummy ache"}])
+    assert out["applied"] == 2
+    assert lookup_response("belly ache")["results"][0]["snomed"] == "21522001"
+    assert live_index.journal_status()["pending_ops"] == before + 2
+
+
+def test_sync_counts_only_new_ops_from_other_workers():
+    live_index.sync_journal()
+    before = live_index.journal_status()["pending_ops"]
+    # another worker appends directly to the shared journal
+    append_ops([validate_op(_upsert("sore tummy", "21522001"))])
+    live_index.sync_journal()
+    assert live_index.journal_status()["pending_ops"] == before + 1
+    assert "sore tummy" in get_snomed_db()[0]
+    live_index.sync_journal()  # nothing new: no recount, no change
+    assert live_index.journal_status()["pending_ops"] == before + 1
+
+
+def test_fold_writes_base_files_and_empties_the_journal():
+    live_index.apply_ops([_upsert("bellyache", "21522001")])
+    out = live_index.fold_journal()
+    assert out["folded"] >= 1
+    assert os.path.getsize(journal_path()) == 0
+    assert live_index.journal_status()["pending_ops"] == 0
+    with open(os.environ["SNOMED_JSON"], encoding="utf-8") as f:
+        assert json.load(f)["bellyache"]["code"] == "21522001"
+    assert lookup_response("bellyache")["results"][0]["snomed"] == "21522001"
+
+
+def test_apply_ops_waits_for_another_process_holding_the_journal_lock():
+    holder = subprocess.Popen(
+        [sys.executable, "-c",
+         "import sys, time\n"
+         "from app.data.journal import journal_lock\n"
+         "with journal_lock():\n"
+         "    print('locked', flush=True)\n"
+         "    time.sleep(0.5)\n"],
+        cwd=ROOT, env=dict(os.environ), stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        t0 = time.monotonic()
+        live_index.apply_ops([_upsert("stomach upset", "21522001")])
+        assert time.monotonic() - t0 >= 0.3
+    finally:
+        holder.wait(5)
+    assert "stomach upset" in get_snomed_db()[0]
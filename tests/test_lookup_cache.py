@@ -0,0 +1,116 @@
+import asyncio, os
+
+import pytest
+
+from app.utils import lookup_cache, miss_tracker
+from app.utils.lookup_cache import DiskBackend, LookupCache, L2Unavailable, dataset_fingerprint
+
+
+@pytest.fixture
+def fresh(monkeypatch, tmp_path):
+    """A private lookup cache and miss tracker for one test."""
+    cache = LookupCache(l1_size=100)
+    tracker = miss_tracker.MissTracker(directory=str(tmp_path / "misses"), persist_s=0)
+    monkeypatch.setattr(lookup_cache, "_cache", cache)
+    monkeypatch.setattr(miss_tracker, "_tracker", tracker)
+    return cache, tracker
+
+
+def _lookup_many(query, n, **kwargs):
+    from app.resolver import coalesced_lookup, ensure_indexes
+
+    async def main():
+        await ensure_indexes()
+        return await asyncio.gather(*(coalesced_lookup(query, top_k=5, **kwargs) for _ in range(n)))
+    return asyncio.run(main())
+
+
+def test_concurrent_identical_misses_compute_once_and_count_each(fresh):
+    cache, tracker = fresh
+    bodies = _lookup_many("headahce", 3)  # typo: fuzzy path, not an exact hit
+    assert all(b == bodies[0] for b in bodies)
+    assert bodies[0]["results"][0]["snomed"] == "25064002"
+    assert tracker.sketch.counts == {"global::headahce": [3, 0]}  # as three sequential misses
+    assert cache.stats()["l1"]["size"] == 1
+
+
+def test_l1_hit_still_counts_the_miss(fresh):
+    cache, tracker = fresh
+    _lookup_many("headahce", 1)
+    _lookup_many("headahce", 1)
+    assert cache.l1.hits == 1
+    assert tracker.sketch.counts["global::headahce"][0] == 2
+
+
+def test_l1_evicts_least_recently_used():
+    cache = LookupCache(l1_size=2)
+    cache.put_l1("a", {"n": 1}, False)
+    cache.put_l1("b", {"n": 2}, False)
+    assert cache.get_l1("a") is not None  # a is now most recent
+    cache.put_l1("c", {"n": 3}, True)
+    assert cache.get_l1("b") is None
+    assert cache.get_l1("c") == ({"n": 3}, True)
+    assert cache.evictions == 1
+
+
+def test_disk_l2_round_trip_and_expiry(tmp_path):
+    cache = LookupCache(l1_size=0, backend=DiskBackend(str(tmp_path)), ttl_s=60)
+    cache.put_l2("k", {"ok": True}, True)
+    assert cache.get_l2("k") == ({"ok": True}, True)
+    assert cache.get_l2("other") is None
+    backend = DiskBackend(str(tmp_path))
+    path = backend._path("k")
+    with open(path, "rb") as f:
+        raw = f.read()
+    with open(path, "wb") as f:
+        f.write(b"1\n" + raw.partition(b"\n")[2])  # expired in 1970
+    assert cache.get_l2("k") is None
+    assert not os.path.exists(path)
+
+
+class _Down:
+    name = "down"
+
+    def get(self, key):
+        raise L2Unavailable("refused")
+
+    def set(self, key, value, ttl_s):
+        raise L2Unavailable("refused")
+
+
+def test_l2_errors_fall_through_and_back_off():
+    cache = LookupCache(l1_size=0, backend=_Down(), retry_s=60)
+    assert cache.get_l2("k") is None
+    assert cache.l2.errors == 1
+    assert not cache.l2_available()
+    assert cache.get_l2("k") is None  # skipped during the retry interval
+    assert cache.l2.errors == 1
+
+
+def test_fingerprint_sees_same_size_edit_in_the_middle(tmp_path):
+    p = tmp_path / "snomed.json"
+    body = b"x" * 200000
+    p.write_bytes(body)
+    journal = (str(tmp_path / "journal.jsonl"), 0)
+    before = dataset_fingerprint([str(p)], journal, "b")
+    p.write_bytes(body[:100000] + b"y" + body[100001:])  # same size, middle byte
+    os.utime(p, ns=(1, 1))  # and an mtime that differs from the memoized one
+    assert dataset_fingerprint([str(p)], journal, "b") != before
+
+
+def test_fingerprint_honours_explicit_version(monkeypatch, tmp_path):
+    monkeypatch.setattr(lookup_cache, "_DATASET_VERSION", "2026.10")
+    journal = (str(tmp_path / "journal.jsonl"), 0)
+    a = dataset_fingerprint([str(tmp_path / "missing.json")], journal, "b")
+    (tmp_path / "missing.json").write_text("{}")
+    assert dataset_fingerprint([str(tmp_path / "missing.json")], journal, "b") == a
+
+
+def test_explicit_version_still_tracks_the_journal(monkeypatch, tmp_path):
+    monkeypatch.setattr(lookup_cache, "_DATASET_VERSION", "2026.10")
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"op": "add"}\n')
+    a = dataset_fingerprint([], (str(path), path.stat().st_size), "b")
+    with open(path, "a") as f:
+        f.write('{"op": "alias"}\n')
+    assert dataset_fingerprint([], (str(path), path.stat().st_size), "b") != a
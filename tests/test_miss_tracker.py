@@ -0,0 +1,57 @@
+import json, os, socket, subprocess, sys
+
+from app.utils.miss_tracker import MissTracker, SpaceSaving
+
+
+def test_space_saving_keeps_heavy_hitters_within_capacity():
+    s = SpaceSaving(4)
+    for i in range(200):
+        s.offer("hot")
+        s.offer(f"cold{i}")
+    assert len(s.counts) == 4
+    assert s.total == 400
+    key, count, error = s.top(1)[0]
+    assert key == "hot"
+    assert count - error <= 200 <= count
+
+
+def test_space_saving_merge_and_round_trip():
+    a, b = SpaceSaving(3), SpaceSaving(3)
+    for k in "aaab":
+        a.offer(k)
+    for k in "aacc":
+        b.offer(k)
+    m = a.merge(b)
+    assert m.total == 8
+    assert m.counts["a"] == [5, 0]
+    assert SpaceSaving.from_dict(json.loads(json.dumps(m.to_dict()))).counts == m.counts
+
+
+def _dead_pid():
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    return p.pid
+
+
+def _snapshot(directory, name, counts):
+    s = SpaceSaving(10)
+    for k, n in counts.items():
+        s.offer(k, n)
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        json.dump(s.to_dict(), f)
+
+
+def test_persist_adopts_dead_snapshots_and_keeps_live_ones(tmp_path):
+    host = socket.gethostname()
+    dead = f"{host}-{_dead_pid()}.json"
+    live = f"{host}-{os.getppid()}.json"
+    other_host = "elsewhere-1.json"
+    for name in (dead, live, other_host):
+        _snapshot(tmp_path, name, {"global::headahce": 2})
+    t = MissTracker(directory=str(tmp_path), persist_s=0)
+    t.record("fevr")
+    t.persist()
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(t.path), live, other_host])
+    assert t.sketch.counts["global::headahce"][0] == 2  # adopted, not lost
+    top = {i["term"]: i["count"] for i in t.top()["items"]}
+    assert top == {"headahce": 6, "fevr": 1}  # adopted once, never double counted
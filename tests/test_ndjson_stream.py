@@ -0,0 +1,87 @@
+import asyncio, json
+
+from app.utils.ndjson_stream import iter_lines, parse_line, translate_ndjson
+
+
+async def _chunks(*parts):
+    for p in parts:
+        yield p
+
+
+def _collect(agen):
+    async def main():
+        return [x async for x in agen]
+    return asyncio.run(main())
+
+
+async def _echo(query, **kw):
+    if query == "boom":
+        raise RuntimeError("resolver failed")
+    return {"query": query, **kw}
+
+
+def _run(body, **kw):
+    out = b"".join(_collect(translate_ndjson(_chunks(*body), _echo, **kw)))
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def test_iter_lines_splits_across_chunks_and_drops_long_lines():
+    lines = _collect(iter_lines(_chunks(b"ab", b"c\nde", b"f\n", b"x" * 20, b"\ntail"), max_line=8))
+    assert lines == [b"abc", b"def", None, b"tail"]
+
+
+def test_parse_line_forms():
+    assert parse_line(b"head pain") == ({"query": "head pain"}, None)
+    assert parse_line(b'"fever"') == ({"query": "fever"}, None)
+    assert parse_line(b'{"term": "fever", "id": 7}')[0] == {"term": "fever", "id": 7, "query": "fever"}
+    assert parse_line(b"   ") == (None, None)
+    assert parse_line(b'{"id": 1}') == (None, "missing query")
+    assert parse_line(b'"  "') == (None, "missing query")
+    assert parse_line(b"[1]") == ({"query": "[1]"}, None)  # only { and " lines are JSON
+    assert parse_line(b'{"query": ')[1].startswith("invalid JSON")
+    assert parse_line(b'{"query": "hgb", "include_technical": true}')[0]["include_technical"] is True
+    assert parse_line(b'{"query": "hgb", "include_technical": "false"}') == (
+        None, "include_technical must be true or false")
+
+
+def test_translate_reports_results_errors_and_summary():
+    rows = _run([b'{"query": "fever", "id": "a", "top_k": 3, "score_cutoff": "x"}\n',
+                 b"\n{bad\nboom\nheadache"], progress_every=0)
+    assert rows[0] == {"type": "result", "line": 1, "id": "a", "query": "fever", "domain": "auto",
+                       "include_technical": False, "context": None, "top_k": 3}  # non-int option dropped
+    assert rows[1]["type"] == "error" and rows[1]["line"] == 3
+    assert rows[2] == {"type": "error", "line": 4, "error": "resolver failed"}
+    assert rows[3]["query"] == "headache"
+    assert rows[-1] == {"type": "summary", "lines": 5, "processed": 2, "errors": 2}
+
+
+def test_progress_and_skip():
+    rows = _run([b"a\nb\nc\nd\n"], skip=1, progress_every=2)
+    assert [r["type"] for r in rows] == ["result", "result", "progress", "result", "summary"]
+    assert rows[2] == {"type": "progress", "line": 3, "processed": 2, "errors": 0}
+    assert rows[0]["line"] == 2
+
+
+def test_byte_budget_truncates_with_a_resume_point():
+    body = "".join(f"q{i}\n" for i in range(50)).encode()
+    rows = _run([body], max_bytes=400, progress_every=0)
+    summary = rows[-1]
+    assert summary["truncated"] is True
+    done = [r for r in rows if r["type"] == "result"]
+    assert summary["next_skip"] == len(done) == done[-1]["line"]
+    rest = _run([body], skip=summary["next_skip"], progress_every=0)
+    assert rest[0]["query"] == f"q{summary['next_skip']}"
+
+
+def test_oversized_row_is_an_error_not_a_resume_loop():
+    rows = _run([b"x" * 300 + b"\nq1\n"], max_bytes=200, progress_every=0)
+    assert rows[0] == {"type": "error", "line": 1, "error": "result exceeds 200 bytes"}
+    assert rows[1]["query"] == "q1"
+    assert rows[-1] == {"type": "summary", "lines": 2, "processed": 1, "errors": 1}
+
+
+def test_a_resumed_stream_always_sends_one_line():
+    rows = _run([b"q0\nq1\n"], max_bytes=120, progress_every=0)
+    assert rows[-1]["truncated"] is True and rows[-1]["next_skip"] == 1
+    rest = _run([b"q0\nq1\n"], skip=1, max_bytes=120, progress_every=0)
+    assert rest[0]["line"] == 2
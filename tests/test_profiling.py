@@ -0,0 +1,81 @@
+import threading, time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.utils import profiling
+from app.utils.profiling import StageTimer, cprofile_call, sample_stacks
+
+ADMIN = {"X-Admin-Token": "test-admin"}
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+    return TestClient(app)
+
+
+def test_stage_timer_reports_each_mark():
+    t = StageTimer()
+    t.mark("a")
+    time.sleep(0.002)
+    t.mark("b")
+    r = t.report()
+    assert [s["stage"] for s in r["stages"]] == ["a", "b"]
+    assert r["stages"][1]["us"] >= 1000
+    assert r["total_us"] >= sum(s["us"] for s in r["stages"])
+
+
+def test_cprofile_call_returns_the_result():
+    result, report = cprofile_call(sorted, [3, 1, 2])
+    assert result == [1, 2, 3]
+    assert report["mode"] == "cprofile" and "function calls" in report["stats"]
+
+
+def test_sampler_sees_other_threads_and_is_exclusive():
+    stop = threading.Event()
+
+    def busy_worker_loop():
+        while not stop.is_set():
+            time.sleep(0.001)
+    t = threading.Thread(target=busy_worker_loop, name="busy")
+    t.start()
+    try:
+        assert profiling._SAMPLER_LOCK.acquire()
+        assert sample_stacks(0.01) is None  # another run in progress
+        profiling._SAMPLER_LOCK.release()
+        out = sample_stacks(0.05, 0.005)
+    finally:
+        stop.set()
+        t.join()
+    line = next(l for l in out.splitlines() if l.startswith("busy;"))
+    assert "busy_worker_loop" in line
+    assert int(line.rsplit(" ", 1)[1]) >= 1
+
+
+def test_lookup_profile_needs_admin_and_adds_stages(client):
+    assert client.get("/lookup", params={"query": "fever", "profile": "1"}).status_code == 403
+    r = client.get("/lookup", params={"query": "fever", "profile": "1"}, headers=ADMIN)
+    body = r.json()
+    assert body["results"][0]["snomed"] == "386661006"
+    stages = [s["stage"] for s in body["profile"]["stages"]]
+    assert stages[:2] == ["ensure_indexes", "tenant_overlay"] and stages[-1] == "assemble"
+    r = client.get("/lookup", params={"query": "fever", "profile": "cprofile"}, headers=ADMIN)
+    assert r.json()["profile"]["mode"] == "cprofile"
+    assert client.get("/lookup", params={"query": "fever", "profile": "x"}, headers=ADMIN).status_code == 400
+    assert "profile" not in client.get("/lookup", params={"query": "fever"}).json()
+
+
+def test_profiled_lookups_run_off_the_event_loop(client, monkeypatch):
+    from app import main
+    threads = []
+    real = main.lookup_response
+
+    def spy(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return real(*args, **kwargs)
+    monkeypatch.setattr(main, "lookup_response", spy)
+    for mode in ("1", "cprofile"):
+        r = client.get("/lookup", params={"query": "fever", "profile": mode}, headers=ADMIN)
+        assert r.json()["results"][0]["snomed"] == "386661006"
+    assert len(threads) == 2 and all(t.startswith("akashic-cpu") for t in threads)
@@ -0,0 +1,76 @@
+import gzip, json, os
+
+from app.replay import (_percentiles, classify, dedupe_queries, iter_log_records, lookup_key, replay,
+                        snapshot_env)
+
+SCT = "http://snomed.info/sct"
+
+
+def _log(path, rows):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write("not json\n")
+        for r in rows:
+            f.write("INFO access " + json.dumps({"method": "GET", "path": "/lookup", "status": 200, **r}) + "\n")
+
+
+def test_lookup_key_normalizes_parameters():
+    assert lookup_key("query=+Fever&domain=auto&top_k=3&include_technical=true") == \
+        (("include_technical", True), ("query", "fever"), ("top_k", 3))
+    assert lookup_key("query=fever&top_k=x&context=HPI.Symptom") == (("context", "hpi.symptom"), ("query", "fever"))
+    assert lookup_key("domain=lab") is None
+
+
+def test_dedupe_counts_equal_lookups_together(tmp_path):
+    path = tmp_path / "a.log.gz"
+    _log(path, [{"query": "query=fever"}, {"query": "query=FEVER "}, {"query": "query=fever&top_k=2"},
+                {"query": "query=fever", "status": 503}, {"query": ""},
+                {"query": "query=fever", "path": "/api/metrics"}])
+    counts, stats = dedupe_queries(iter_log_records([str(path)]))
+    assert counts[(("query", "fever"),)] == 2
+    assert counts[(("query", "fever"), ("top_k", 2))] == 1
+    assert stats == {"records": 6, "lookups": 3, "skipped": 2}
+
+
+def test_classify_and_percentiles():
+    a, b = ((SCT, "1"),), ((SCT, "2"),)
+    assert [classify(a, a), classify((), a), classify(a, ()), classify(a, b)] == ["same", "gained", "lost", "changed"]
+    p = _percentiles([(1000, 98), (50000, 2)])
+    assert p["p50"] == 1.0 and p["p99"] == 50.0
+
+
+def test_snapshot_env_from_dir_and_manifest(tmp_path):
+    (tmp_path / "snomed.json").write_text("{}")
+    env = snapshot_env(str(tmp_path))
+    assert env["SNOMED_JSON"] == str(tmp_path / "snomed.json")
+    assert env["DATASET_JOURNAL"] == str(tmp_path / "dataset_journal.jsonl")
+    assert "LOINC_JSON" not in env  # falls back to the current configuration
+    (tmp_path / "manifest.json").write_text(json.dumps({"files": {"SNOMED_JSON": "snomed.json"}}))
+    assert snapshot_env(str(tmp_path / "manifest.json"))["SNOMED_JSON"] == str(tmp_path / "snomed.json")
+    assert snapshot_env(None) == {}
+
+
+def test_replay_reports_traffic_weighted_changes(tmp_path):
+    with open(os.environ["SNOMED_JSON"], encoding="utf-8") as f:
+        base = json.load(f)
+    nxt = dict(base)
+    nxt["fever"] = {**base["fever"], "code": "999999999"}
+    nxt["hiccups"] = {"code": "65958008", "display": "Hiccoughs", "aliases": []}
+    del nxt["chest pain"]
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "snomed.json").write_text(json.dumps(nxt))
+    log = tmp_path / "access.log"
+    _log(log, [{"query": "query=fever"}] * 3 + [
+        {"query": "query=hiccups"},
+        {"query": "query=chest pain&score_cutoff=100"},  # no fuzzy fallback: lost outright
+        {"query": "query=headache"},
+    ])
+    out = tmp_path / "diff.ndjson"
+    with open(out, "w", encoding="utf-8") as f:
+        report = replay([str(log)], None, str(tmp_path / "b"), jobs=1, diff_out=f)
+    d = report["diff"]
+    assert report["logs"]["distinct"] == 4
+    assert (d["changed"]["traffic"], d["gained"]["traffic"], d["lost"]["traffic"], d["same"]["traffic"]) == (3, 1, 1, 1)
+    assert d["changed"]["traffic_pct"] == 50.0
+    assert d["top"]["changed"][0]["query"] == "fever"
+    assert len(out.read_text().splitlines()) == 3
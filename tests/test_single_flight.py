@@ -0,0 +1,63 @@
+import asyncio, threading, time
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_do_runs_once_for_concurrent_threads():
+    sf = SingleFlight("t")
+    calls = []
+    gate = threading.Event()
+
+    def work():
+        calls.append(1)
+        gate.wait(2)
+        return "v"
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(sf.do("k", work))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert out == ["v"] * 5
+    assert len(calls) == 1
+    assert sf.stats() == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_do_shares_the_exception_and_forgets_the_key():
+    sf = SingleFlight("t")
+    with pytest.raises(ValueError):
+        sf.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert sf.do("k", lambda: 1) == 1  # nothing cached after completion
+
+
+def test_do_async_reports_leader_and_followers():
+    sf = SingleFlight("t")
+    runs = []
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def work():
+            runs.append(1)
+            await gate.wait()
+            return {"x": 1}
+
+        tasks = [asyncio.ensure_future(sf.do_async("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # a different key in flight at the same time must not affect "k"'s leader
+        other = asyncio.ensure_future(sf.do_async("other", work))
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks), await other
+
+    results, other = asyncio.run(main())
+    assert [shared for _, shared in results] == [False, True, True]
+    assert all(body == {"x": 1} for body, _ in results)
+    assert other == ({"x": 1}, False)
+    assert len(runs) == 2
+    assert sf.stats()["in_flight"] == 0
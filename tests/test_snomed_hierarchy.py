@@ -0,0 +1,83 @@
+import json, random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import snomed_hierarchy
+from app.data.snomed_hierarchy import SnomedHierarchy, read_json_isa, read_rf2_isa
+
+
+def _brute_descendants(edges, code):
+    children = {}
+    for c, p in edges:
+        children.setdefault(p, set()).add(c)
+    out, stack = set(), [code]
+    while stack:
+        for c in children.get(stack.pop(), ()):
+            if c not in out:
+                out.add(c)
+                stack.append(c)
+    return out
+
+
+def test_interval_closure_matches_brute_force_on_a_random_dag():
+    rng = random.Random(5)
+    nodes = [str(i) for i in range(120)]
+    edges = [(nodes[c], nodes[p]) for c in range(1, 120) for p in rng.sample(range(c), min(c, rng.randint(1, 3)))]
+    h = SnomedHierarchy(edges)
+    for a in nodes[:40]:
+        want = _brute_descendants(edges, a)
+        assert set(h.descendants(a)) == want
+        assert h.descendant_count(a) == len(want)
+        for b in rng.sample(nodes, 20):
+            assert h.subsumes(a, b) == (a == b or b in want)
+    assert set(h.ancestors("119")) == {a for a in nodes if "119" in _brute_descendants(edges, a)}
+    assert h.stats()["concepts"] == 120
+
+
+def test_cycles_do_not_break_the_build():
+    h = SnomedHierarchy([("a", "b"), ("b", "c"), ("c", "a"), ("d", "a")])
+    assert h.subsumes("a", "d")  # closure across the cycle itself is best effort (SNOMED is a DAG)
+    assert set(h.ancestors("d")) == {"a", "b", "c"}
+    assert "zz" not in h and not h.subsumes("a", "zz")
+
+
+def test_rf2_latest_effective_time_wins(tmp_path):
+    p = tmp_path / "rel.txt"
+    header = "id\teffectiveTime\tactive\tmoduleId\tsourceId\tdestinationId\trelationshipGroup\ttypeId\n"
+    rows = ["1\t20200101\t1\tm\t25064002\t22253000\t0\t116680003",
+            "1\t20230101\t0\tm\t25064002\t22253000\t0\t116680003",  # retired later
+            "2\t20200101\t1\tm\t25064002\t118234003\t0\t116680003",
+            "3\t20200101\t1\tm\t25064002\t999\t0\t363698007"]  # not is-a
+    p.write_text(header + "\n".join(rows) + "\n")
+    assert read_rf2_isa(str(p)) == [("25064002", "118234003")]
+
+
+@pytest.mark.parametrize("raw", [[["b", "a"]], [{"child": "b", "parent": "a"}], {"b": ["a"]}, {"b": "a"}])
+def test_json_edge_formats(tmp_path, raw):
+    p = tmp_path / "isa.json"
+    p.write_text(json.dumps(raw))
+    assert read_json_isa(str(p)) == [("b", "a")]
+
+
+@pytest.fixture
+def loaded(monkeypatch, tmp_path):
+    p = tmp_path / "isa.json"
+    p.write_text(json.dumps({"25064002": ["22253000"], "29857009": ["22253000"], "22253000": ["404684003"]}))
+    monkeypatch.setenv("SNOMED_ISA", str(p))
+    snomed_hierarchy.get_snomed_hierarchy.cache_clear()
+    yield
+    snomed_hierarchy.get_snomed_hierarchy.cache_clear()
+
+
+def test_endpoints_accept_codes_and_lay_terms(loaded):
+    from app.main import app
+    client = TestClient(app)
+    r = client.get("/fhir/CodeSystem/$subsumes", params={"codeA": "22253000", "codeB": "head pain"})
+    assert r.json()["parameter"] == [{"name": "outcome", "valueCode": "subsumes"}]
+    r = client.get("/fhir/CodeSystem/$subsumes", params={"codeA": "headache", "codeB": "chest pain"})
+    assert r.json()["parameter"][0]["valueCode"] == "not-subsumed"
+    body = client.get("/api/snomed/hierarchy/descendants", params={"code": "404684003", "limit": 2}).json()
+    assert body["count"] == 3 and body["truncated"] is True and len(body["descendants"]) == 2
+    body = client.get("/api/snomed/hierarchy/ancestors", params={"code": "25064002"}).json()
+    assert body["ancestors"] == ["22253000", "404684003"]
@@ -0,0 +1,49 @@
+import json, os, random, sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from gen_synthetic import generate, loinc_code  # noqa: E402
+from loadtest import Workload, Zipf, data_env, vocabulary  # noqa: E402
+
+
+def test_loinc_check_digit():
+    assert [loinc_code(n) for n in (718, 2951, 2823)] == ["718-7", "2951-2", "2823-3"]
+
+
+def test_generate_is_seeded_and_consistent(tmp_path):
+    a = generate(str(tmp_path / "a"), aliases=300, per_concept=4, loinc_keys=10, loinc_alias_ratio=2.0,
+                 learned=6, seed=7)
+    b = generate(str(tmp_path / "b"), aliases=300, per_concept=4, loinc_keys=10, loinc_alias_ratio=2.0,
+                 learned=6, seed=7)
+    snomed = json.loads((tmp_path / "a" / "snomed.json").read_text())
+    assert (tmp_path / "a" / "snomed.json").read_text() == (tmp_path / "b" / "snomed.json").read_text()
+    assert len(snomed) == a["snomed_concepts"] == b["snomed_concepts"] == 60
+    assert sum(1 + len(e["aliases"]) for e in snomed.values()) == a["snomed_terms"]
+    canon = json.loads((tmp_path / "a" / "loinc_canonical.json").read_text())
+    aliases = json.loads((tmp_path / "a" / "loinc_aliases.json").read_text())
+    assert len(canon) == 10 and len(aliases) == 20 and set(aliases.values()) <= set(canon)
+    learned = json.loads((tmp_path / "a" / "layman_learned.json").read_text())
+    codes = {e["code"] for e in snomed.values()}
+    assert len(learned) == 6 and all(e["snomed_code"] in codes for e in learned.values())
+    assert data_env(str(tmp_path / "a"))["SNOMED_JSON"] == a["files"]["SNOMED_JSON"]
+
+
+def test_zipf_favours_low_ranks():
+    z, rng = Zipf(1000, 1.1), random.Random(1)
+    counts = Counter(z.sample(rng) for _ in range(20000))
+    assert counts[0] > counts[1] > counts[10] > counts[500]
+    assert max(counts) < 1000
+
+
+def test_workload_mix(tmp_path):
+    generate(str(tmp_path), aliases=100, per_concept=3, loinc_keys=5, loinc_alias_ratio=1.0, learned=0, seed=3)
+    terms, entries = vocabulary(data_env(str(tmp_path)), seed=3)
+    rng = random.Random(0)
+    reads = Workload(terms, entries, 1.0, write_ratio=0.0, miss_ratio=0.0)
+    assert {reads.next(rng)[0] for _ in range(50)} == {"lookup"}
+    misses = Workload(terms, entries, 1.0, write_ratio=0.0, miss_ratio=1.0)
+    assert all("unknown" in misses.next(rng)[2] for _ in range(20))
+    writes = Workload(terms, entries, 1.0, write_ratio=1.0, miss_ratio=0.0)
+    kind, method, path, body = writes.next(rng)
+    assert (kind, method, path) == ("commit", "POST", "/api/commit_selection")
+    assert {"term", "code", "display", "context"} <= set(json.loads(body))
@@ -0,0 +1,88 @@
+import json, os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import tenants
+from app.data.tenants import TenantCache
+
+
+@pytest.fixture
+def tenants_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(tenants, "_TENANTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _tenant(root, tid, snomed):
+    d = root / tid
+    d.mkdir(exist_ok=True)
+    (d / "snomed.json").write_text(json.dumps(snomed))
+    return d
+
+
+def test_overlay_falls_through_to_base(tenants_dir):
+    _tenant(tenants_dir, "acme", {"the spins": {"code": "404640003", "display": "Dizziness"}})
+    ov = TenantCache().get("acme")
+    assert ov.snomed_entry("the spins")["code"] == "404640003"
+    assert ov.snomed_entry("headache")["code"] == "25064002"  # base
+    assert ov.loinc_code(ov.loinc_key("hgb")) == "718-7"
+
+
+def test_lru_evicts_cold_overlays_over_budget(tenants_dir):
+    for tid in ("a", "b", "c"):
+        _tenant(tenants_dir, tid, {f"term {tid}": {"code": "1", "display": "x"}})
+    one = tenants._read_overlay("a").nbytes
+    cache = TenantCache(budget_bytes=int(one * 2.5))
+    cache.get("a"), cache.get("b")
+    cache.peek("a")  # a is now most recent
+    cache.get("c")
+    assert cache.peek("b") == (False, None)
+    assert cache.peek("a")[0] and cache.peek("c")[0]
+    assert cache.evictions == 1
+
+
+def test_missing_tenants_are_capped(tenants_dir):
+    cache = TenantCache(missing_max=3)
+    for i in range(10):
+        assert cache.get(f"ghost{i}") is None
+    st = cache.stats()
+    assert st["missing_cached"] == 3 and st["tenants_cached"] == 3
+    assert cache.peek("ghost9") == (True, None)
+    assert cache.peek("ghost0") == (False, None)
+
+
+def test_directory_created_later_is_picked_up_after_recheck(tenants_dir):
+    cache = TenantCache(recheck_s=0)
+    assert cache.get("late") is None
+    _tenant(tenants_dir, "late", {"the spins": {"code": "404640003", "display": "Dizziness"}})
+    assert cache.get("late").snomed_entry("the spins")["code"] == "404640003"
+    assert cache.stats()["missing_cached"] == 0
+
+
+def test_edited_overlay_reloads_unchanged_one_does_not(tenants_dir):
+    d = _tenant(tenants_dir, "acme", {"the spins": {"code": "404640003", "display": "Dizziness"}})
+    cache = TenantCache(recheck_s=0)
+    first = cache.get("acme")
+    assert cache.get("acme") is first  # same stamp: revalidated, not reread
+    (d / "snomed.json").write_text(json.dumps({"the spins": {"code": "399153001", "display": "Vertigo"}}))
+    os.utime(d / "snomed.json", ns=(1, 1))
+    second = cache.get("acme")
+    assert second is not first
+    assert second.snomed_entry("the spins")["code"] == "399153001"
+    assert cache.reloads == 1
+
+
+def test_admin_invalidate_endpoint(tenants_dir, monkeypatch):
+    cache = TenantCache()
+    monkeypatch.setattr(tenants, "_cache", cache)
+    _tenant(tenants_dir, "acme", {})
+    cache.get("acme"), cache.get("ghost")
+    from app.main import app
+    client = TestClient(app)
+    assert client.post("/api/admin/tenants/invalidate?tenant=acme").status_code in (401, 403)
+    h = {"X-Admin-Token": "test-admin"}
+    r = client.post("/api/admin/tenants/invalidate?tenant=ACME", headers=h)
+    assert r.json() == {"ok": True, "tenant": "acme", "dropped": 1}
+    assert client.post("/api/admin/tenants/invalidate?tenant=../x", headers=h).status_code == 400
+    assert client.post("/api/admin/tenants/invalidate", headers=h).json()["dropped"] == 1
+    assert cache.stats()["tenants_cached"] == 0